@@ -0,0 +1,699 @@
+"""Asyncio serving mode.
+
+Exposes the same routes as ``stackoverflow_scraper`` on an ASGI app (Quart),
+with every upstream fetch done through a non-blocking ``httpx.AsyncClient``.
+While a request waits on stackoverflow.com the event loop keeps serving other
+API calls, so one process can have hundreds of scrapes in flight.
+
+The HTML parsing is shared with the sync app; only the fetching differs. Work
+that would block the event loop (parsing, and the SQLite post store and disk
+cache) runs on threads or in the parse pool. With ``SCRAPER_PREFETCH`` set,
+the prefetch thread of ``stackoverflow_scraper`` runs here too and warms the
+cache both apps read; otherwise that app and its thread pools are not loaded.
+
+Run with any ASGI server, e.g.::
+
+    uvicorn async_scraper:app --port $STACKOVERFLOW_API_PORT
+"""
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from quart import Quart, Response, jsonify, request
+from quart.json.provider import DefaultJSONProvider
+from werkzeug.http import generate_etag
+
+import http_client
+import metrics
+from budget import (DeadlineExceeded, RequestBudget, current_budget, record_timeout, route_deadline,
+                    time_left, timed_out, wait_for, within_budget)
+from cache import cached, cached_iter, default_cache
+from extractors import (extract_answers, extract_collective_tags, extract_collectives, extract_external_links,
+                        extract_question_answers, extract_question_details, extract_question_page,
+                        extract_question_summaries)
+from parsing import StreamScanner, in_parse_worker, run_parser_async
+from prefetch import PREFETCH_TARGETS, Prefetcher
+from scraping import (BATCH_WORKERS, COLLECTIVE_PAGE_HEADERS, COLLECTIVE_TAG_PAGE_WINDOW, MAX_IDS, NDJSON_MIMETYPE,
+                      PARTIAL_LINE, STREAM_CHUNK_SIZE, STREAM_EARLY_STOP, TIMELINE_END, USER_IDS_END, IdListConverter,
+                      apply_user_ids, cache_page, cached_page, complete_question, parse_question_query,
+                      parse_timeline_dates, parse_user_ids, plan_enrichments, questions_args, questions_listing_url)
+from rate_limit import upstream_controller
+from store import default_store, filter_questions, reuse_enrichments
+from users import AsyncUserResolver
+from models import Answer, Collective, ModelJSONProvider, Question, last_modified
+
+# Prefetching refreshes the cache through the sync app's scrapers, so that
+# module (which starts its thread pools and the prefetch thread) is only
+# loaded when there is something to prefetch
+if PREFETCH_TARGETS and not in_parse_worker():
+    from stackoverflow_scraper import prefetcher
+else:
+    prefetcher = Prefetcher([])
+
+
+class JSONProvider(ModelJSONProvider, DefaultJSONProvider):
+    """Quart's JSON provider, writing the scraped models directly."""
+
+
+app = Quart(__name__)
+app.json = JSONProvider(app)
+app.url_map.converters['ids'] = IdListConverter
+
+_client: Optional[httpx.AsyncClient] = None
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+async def trace_connections(event: str, info: Dict[str, Any]):
+    if event == 'connection.connect_tcp.complete':
+        http_client.count_connection()
+
+
+async def count_request(request: httpx.Request):
+    http_client.count_request()
+    request.extensions['trace'] = trace_connections
+
+
+async def count_response(response: httpx.Response):
+    http_client.count_response(str(response.request.url), response.status_code, response.headers)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled async client, creating it on first use.
+
+    Its requests, responses and new connections are counted by the same hooks
+    as ``http_client``'s."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=http_client.DEFAULT_HEADERS,
+            limits=httpx.Limits(max_connections=http_client.POOL_CONNECTIONS * http_client.POOL_MAXSIZE,
+                                max_keepalive_connections=http_client.POOL_MAXSIZE),
+            follow_redirects=True,
+            timeout=None,
+            event_hooks={'request': [count_request], 'response': [count_response]},
+        )
+    return _client
+
+
+@app.after_serving
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def host_slot(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(http_client.MAX_PER_HOST)
+    return slot
+
+
+async def start_try(url: str) -> float:
+    """Take a rate-limit token for ``url`` and return the timeout of the try
+    (see ``http_client.request_timeout``); raises ``httpx.TimeoutException``
+    once the API request's deadline leaves no time for it."""
+    if await upstream_controller.acquire_async(url, time_left()):
+        seconds = time_left()
+        if seconds is None:
+            return http_client.UPSTREAM_TIMEOUT
+        if seconds > 0:
+            return min(seconds, http_client.UPSTREAM_TIMEOUT)
+    record_timeout()
+    raise httpx.TimeoutException("deadline exceeded")
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    """Non-blocking GET, limited to ``http_client.MAX_PER_HOST`` in flight per host,
+    paced by the upstream rate controller and retried like ``http_client.get``."""
+    with metrics.timed('fetch'):
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = await start_try(url)
+            try:
+                async with host_slot(url):
+                    response = await get_client().get(url, timeout=timeout, **kwargs)
+            except httpx.TransportError:
+                http_client.count_error(url)
+                delay = upstream_controller.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = upstream_controller.retry_delay(attempt, response.status_code,
+                                                        response.headers.get('Retry-After'))
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+
+
+async def read_stream(url: str, *markers: bytes, raise_for_status: bool = False) -> Tuple[int, bytes]:
+    """Stream ``url`` until ``markers`` have been seen, then drop the rest of the body.
+
+    Returns the status code and the bytes read; see ``stackoverflow_scraper.read_stream``.
+    With ``raise_for_status`` an error status raises ``httpx.HTTPStatusError`` instead.
+    """
+    with metrics.timed('fetch'):
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = await start_try(url)
+            try:
+                async with host_slot(url):
+                    async with get_client().stream('GET', url, timeout=timeout) as response:
+                        delay = upstream_controller.retry_delay(attempt, response.status_code,
+                                                                response.headers.get('Retry-After'))
+                        if delay is None:
+                            if raise_for_status:
+                                response.raise_for_status()
+                            scanner = StreamScanner(*markers)
+                            chunks = response.aiter_bytes(STREAM_CHUNK_SIZE)
+                            async for chunk in chunks:
+                                if scanner.feed(chunk):
+                                    break
+                            if not STREAM_EARLY_STOP:
+                                async for _ in chunks:
+                                    pass
+                            return response.status_code, scanner.data
+            except httpx.TransportError:
+                http_client.count_error(url)
+                delay = upstream_controller.retry_delay(attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+
+async def fetch_html(url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> str:
+    html, fresh, conditions = await default_cache.offload(cached_page, url)
+    if fresh:
+        return html
+    response = await get(url, headers={**(headers or {}), **conditions}, **kwargs)
+    if response.status_code == 304 and conditions:
+        conditions = http_client.validators(response.headers) or conditions
+    else:
+        response.raise_for_status()  # Raises an HTTPStatusError if the response was unsuccessful
+        html = response.text
+        conditions = http_client.validators(response.headers)
+    await default_cache.offload(cache_page, url, html, conditions)
+    return html
+
+
+async def fetch_user_ids(user_link: str) -> Tuple[Optional[str], Optional[str]]:
+    status, body = await read_stream(f"https://stackoverflow.com{user_link}", *USER_IDS_END)
+    if status == 200:
+        return parse_user_ids(body)
+    return None, None
+
+
+user_resolver = AsyncUserResolver(fetch_user_ids)
+
+
+async def fetch_timeline_dates(question_id: int) -> Dict[str, Any]:
+    # an error page has no dates; raising keeps the question from being stored without them
+    _, body = await read_stream(f"https://stackoverflow.com/posts/{question_id}/timeline", *TIMELINE_END,
+                                raise_for_status=True)
+    return parse_timeline_dates(body)
+
+
+async def fetch_question_details(question_url: str) -> Tuple[Optional[int], Dict[str, Any]]:
+    response = await get(question_url)
+    response.raise_for_status()
+    return await run_parser_async(extract_question_details, response.text)
+
+
+async def _none():
+    return None
+
+
+# Error Handlers
+@app.errorhandler(404)
+async def resource_not_found(e):
+    return jsonify(error=str(e)), 404
+
+
+@app.errorhandler(405)
+async def method_not_allowed(e):
+    return jsonify(error=str(e)), 405
+
+
+@app.before_request
+async def start_request_metrics():
+    metrics.current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+
+
+@app.before_request
+async def start_request_budget():
+    try:
+        deadline = route_deadline(request.path, request.args.get('timeout'))
+    except ValueError as e:
+        current_budget.set(RequestBudget())
+        return jsonify({"error": str(e)}), 400
+    current_budget.set(RequestBudget(deadline=deadline))
+
+
+@app.after_request
+async def add_budget_headers(response):
+    budget = current_budget.get()
+    # a streamed body is produced after the headers are sent, so its counts aren't known yet
+    if budget is not None and response.mimetype != NDJSON_MIMETYPE:
+        response.headers.update(budget.headers())
+    return response
+
+
+def deadline_exceeded():
+    return jsonify({"error": "Deadline exceeded"}), 504
+
+
+def not_found(message: str):
+    """404 with ``message``, or 504 when the deadline passed before anything was scraped."""
+    if timed_out():
+        return deadline_exceeded()
+    return jsonify({"error": message}), 404
+
+
+def wants_stream() -> bool:
+    """Streaming mode is asked for with ``?stream=1`` or ``Accept: application/x-ndjson``."""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+async def conditional_response(payload: Any, modified: Optional[int] = None) -> Response:
+    """JSON response with an ETag and Last-Modified date, or an empty 304 when
+    the request's validators still match; see ``stackoverflow_scraper``."""
+    response = jsonify(payload)
+    # the sync app's ETag (Quart's add_etag hashes with MD5 instead)
+    response.set_etag(generate_etag(await response.get_data()))
+    if modified is not None:
+        response.last_modified = modified
+    return await response.make_conditional(request)
+
+
+async def ndjson_response(items: AsyncIterator[Any], empty_ok: bool = False) -> Optional[Response]:
+    """Stream ``items`` as newline-delimited JSON, one line per item as it is
+    produced, and ``PARTIAL_LINE`` last if the results are partial.
+
+    The first item is awaited here, so errors before it still reach the route's
+    error handling; with no items at all this returns None unless ``empty_ok``.
+    """
+    first = await anext(items, None)
+    if first is None and not empty_ok:
+        return None
+
+    async def lines():
+        try:
+            if first is not None:
+                yield app.json.dumps(first) + '\n'
+                async for item in items:
+                    yield app.json.dumps(item) + '\n'
+            if not within_budget():
+                yield app.json.dumps(PARTIAL_LINE) + '\n'
+        finally:
+            await items.aclose()
+
+    return Response(lines(), mimetype=NDJSON_MIMETYPE)
+
+
+async def from_list(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+async def in_order(coroutines: List[Awaitable[Any]]) -> AsyncIterator[Any]:
+    """Run ``coroutines`` concurrently and yield their results in the given order.
+
+    Whatever has not finished when the consumer stops is cancelled.
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/stats', methods=['GET'])
+async def get_stats():
+    return jsonify({"http": http_client.get_stats(), "cache": await default_cache.offload(default_cache.get_stats),
+                    "store": await asyncio.to_thread(default_store.get_stats),
+                    "rate_limit": upstream_controller.get_stats()})
+
+
+@app.route('/prefetch', methods=['GET'])
+async def get_prefetch_state():
+    return jsonify(prefetcher.get_state())
+
+
+@app.route('/collectives', methods=['GET'])
+async def get_collectives():
+    try:
+        if wants_stream():
+            return await ndjson_response(iter_collectives(), empty_ok=True)
+        return jsonify(await scrape_collectives())
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+async def scrape_collectives() -> List[Collective]:
+    return [collective async for collective in iter_collectives()]
+
+
+@cached_iter('collectives', should_cache=lambda collectives: bool(collectives) and within_budget())
+async def iter_collectives() -> AsyncIterator[Collective]:
+    collectives = await run_parser_async(extract_collectives,
+                                         await fetch_html("https://stackoverflow.com/collectives-all"))
+
+    async def crawl(collective):
+        full_link = f"https://stackoverflow.com{collective['link']}"
+        results = await asyncio.gather(wait_for(get_collective_tags(full_link)),
+                                       wait_for(get_external_links(full_link)), return_exceptions=True)
+        # crawls cut off at the deadline leave their field empty
+        for field, result in zip(('tags', 'external_links'), results):
+            if isinstance(result, DeadlineExceeded):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            collective[field] = result
+        return collective
+
+    async for collective in in_order([crawl(collective) for collective in collectives]):
+        yield collective
+
+
+async def get_collective_tags(base_url: str) -> List[str]:
+    tags = []
+    page = 1
+    while True:
+        # Request the next few pages at once; the crawl ends at the first empty page
+        window = [asyncio.ensure_future(fetch_collective_tags_page(base_url, page + i))
+                  for i in range(COLLECTIVE_TAG_PAGE_WINDOW)]
+        for task in window:
+            try:
+                page_tags = await task
+            except httpx.HTTPError:
+                page_tags = []
+
+            if not page_tags:
+                for pending in window:
+                    pending.cancel()
+                return tags
+
+            tags.extend(page_tags)
+
+        page += COLLECTIVE_TAG_PAGE_WINDOW
+
+
+async def fetch_collective_tags_page(base_url: str, page: int) -> List[str]:
+    return await run_parser_async(extract_collective_tags,
+                                  await fetch_html(f"{base_url}?tab=tags&page={page}&pagesize=30"))
+
+
+async def get_external_links(url: str) -> List[Dict[str, str]]:
+    try:
+        html = await fetch_html(url, headers=COLLECTIVE_PAGE_HEADERS)
+        return await run_parser_async(extract_external_links, html, url)
+    except httpx.HTTPError as e:
+        logging.warning(f"Error fetching external links for {url}: {str(e)}")
+        return []
+
+
+@app.route('/questions', methods=['GET'])
+async def get_questions():
+    try:
+        try:
+            page, pagesize, tags = questions_args(request.args)
+            query = parse_question_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if query is not None:
+            questions = await asyncio.to_thread(default_store.query_questions, tags, page=page, pagesize=pagesize,
+                                                **query)
+            if questions is None:
+                # the listing page is not stored: sort and filter it as scraped
+                questions = filter_questions(await get_detailed_questions(page, pagesize, tags), **query)
+            if not questions:
+                return not_found("No questions found")
+            return await ndjson_response(from_list(questions)) if wants_stream() else jsonify(questions)
+
+        if wants_stream():
+            response = await ndjson_response(iter_detailed_questions(page, pagesize, tags))
+            if response is None:
+                return not_found("No questions found or error occurred during scraping")
+            return response
+
+        questions = await get_detailed_questions(page, pagesize, tags)
+
+        if not questions:
+            return not_found("No questions found or error occurred during scraping")
+
+        return jsonify(questions)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+async def get_detailed_questions(page: int = 1, pagesize: int = 30, tags: List[str] = None) -> List[Question]:
+    return [question async for question in iter_detailed_questions(page, pagesize, tags)]
+
+
+@cached_iter('questions', should_cache=lambda questions: bool(questions) and within_budget())
+async def iter_detailed_questions(page: int = 1, pagesize: int = 30,
+                                  tags: List[str] = None) -> AsyncIterator[Question]:
+    budget = current_budget.get() or RequestBudget()
+    try:
+        url, tag_list = questions_listing_url(page, pagesize, tags)
+        budget.plan()  # the listing page itself is always fetched
+        entries = await run_parser_async(extract_question_summaries, await fetch_html(url), tag_list)
+    except httpx.HTTPError as e:
+        logging.warning(f"Error fetching page {page}: {str(e)}")
+        return
+
+    # Questions with no activity since they were stored keep their stored enrichments
+    stored = await asyncio.to_thread(default_store.reuse_questions, entries)
+    # Fully enriched questions, stored with the activity marker they were listed with
+    to_store = []
+
+    async def enrich(entry, plan):
+        question_id = entry['question']['question_id']
+        if question_id in stored:
+            reuse_enrichments(entry['question'], stored[question_id])
+            return complete_question(entry, None, None, None)
+        results = await asyncio.gather(
+            wait_for(user_resolver.resolve(entry['user_link'])) if plan['user'] else _none(),
+            wait_for(fetch_timeline_dates(question_id)) if plan['timeline'] else _none(),
+            wait_for(fetch_question_details(entry['accepted_url'])) if plan['details'] else _none(),
+            return_exceptions=True,
+        )
+        # A failed enrichment (or one cancelled at the deadline) only loses its
+        # own fields, never the rest of the page
+        for what, result in zip(("user profile", "timeline", "accepted answer"), results):
+            if isinstance(result, Exception):
+                logging.warning(f"Failed to fetch {what} for question {question_id}: {str(result)}")
+        user_ids, dates, details = (None if isinstance(r, Exception) else r for r in results)
+        accepted_answer_id, page_dates = details or (None, None)
+        question = complete_question(entry, user_ids, dates if plan['timeline'] else page_dates, accepted_answer_id)
+        if plan['complete'] and all(result is not None for planned, result in
+                                    zip((plan['user'], plan['timeline'], plan['details']), (user_ids, dates, details))
+                                    if planned):
+            to_store.append((question, entry['summary_date']))
+        return question
+
+    plans = iter(plan_enrichments([entry for entry in entries
+                                   if entry['question']['question_id'] not in stored], budget))
+    # Whether every listed question was stored (or reused) by the end of the listing
+    complete = False
+    try:
+        async for question in in_order([enrich(entry, None if entry['question']['question_id'] in stored
+                                               else next(plans)) for entry in entries]):
+            yield question
+        reused = [entry['question'] for entry in entries if entry['question']['question_id'] in stored]
+        complete = len(reused) + len(to_store) == len(entries)
+    finally:
+        await asyncio.to_thread(default_store.put_questions, to_store)
+        if complete:
+            await asyncio.to_thread(default_store.put_listing, tag_list, page, pagesize,
+                                    reused + [question for question, _ in to_store])
+
+
+@app.route('/questions/<int:question_id>', methods=['GET'])
+async def get_question_by_id_route(question_id: int):
+    question = await get_question_by_id(question_id)
+    if question:
+        return await conditional_response(question, last_modified(question))
+    return not_found("Question not found")
+
+
+@cached('question', key=lambda question_id: str(question_id))
+async def get_question_by_id(question_id: int) -> Optional[Question]:
+    question = await asyncio.to_thread(default_store.get_page, 'question', question_id)
+    if question is not None:
+        return question
+    url = f"https://stackoverflow.com/questions/{question_id}"
+    try:
+        html = await fetch_html(url)
+    except httpx.HTTPError as e:
+        logging.warning(f"Error fetching question {question_id}: {str(e)}")
+        return None
+    question = await run_parser_async(extract_question_page, html, question_id, url)
+    await asyncio.to_thread(default_store.put_page, 'question', question_id, question)
+    return question
+
+
+@app.route('/answers/<int:answer_id>', methods=['GET'])
+async def get_answer_by_id_route(answer_id: int):
+    answers = await get_answer_by_id(answer_id)
+    if answers:
+        return jsonify(answers), 200
+    return not_found("Answer not found")
+
+
+@cached('answer', key=lambda answer_id: str(answer_id), should_cache=lambda answers: bool(answers) and within_budget())
+async def get_answer_by_id(answer_id: int) -> Optional[List[Answer]]:
+    try:
+        html = await fetch_html(f"https://stackoverflow.com/a/{answer_id}")
+        parsed = await run_parser_async(extract_answers, html)
+        user_ids = await user_resolver.resolve_many(user_href for _, user_href in parsed if user_href)
+    except httpx.HTTPError:
+        return None
+
+    answers = []
+    for answer, user_href in parsed:
+        if user_href:
+            apply_user_ids(answer['owner'], user_ids[user_href])
+        answers.append(answer)
+
+    # /a/<id> of any answer on this page returns the same page
+    for answer in answers:
+        if answer['answer_id'] and answer['answer_id'] != str(answer_id) and within_budget():
+            await default_cache.offload(default_cache.set, 'answer', answer['answer_id'], answers)
+
+    return answers
+
+
+@app.route('/questions/<int:question_id>/answers', methods=['GET'])
+async def get_answers_for_question(question_id: int):
+    payload, status = await scrape_answers_for_question(question_id)
+    if status == 500 and timed_out():
+        return deadline_exceeded()
+    if status == 200:
+        return await conditional_response(payload, last_modified(payload))
+    return jsonify(payload), status
+
+
+@cached('question_answers', key=lambda question_id: str(question_id),
+        should_cache=lambda result: result[1] == 200 and within_budget())
+async def scrape_answers_for_question(question_id: int) -> Tuple[Dict[str, Any], int]:
+    """Scrape the answers of a question, returning (payload, HTTP status)."""
+    stored = await asyncio.to_thread(default_store.get_page, 'question_answers', question_id)
+    if stored is not None:
+        return stored, 200
+    try:
+        html = await fetch_html(f"https://stackoverflow.com/questions/{question_id}")
+        extracted = await run_parser_async(extract_question_answers, html, question_id)
+        if extracted is None:
+            logging.warning("Question not found")
+            return {"error": "Question not found"}, 404
+        question, parsed = extracted
+
+        async def build(answer, user_href):
+            if user_href:
+                try:
+                    apply_user_ids(answer['owner'], await wait_for(user_resolver.resolve(user_href)))
+                except DeadlineExceeded:
+                    pass  # past the deadline an answer keeps what its page shows
+            return answer
+
+        results = await asyncio.gather(*(build(answer, user_href) for answer, user_href in parsed),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.error(f"Error processing an answer: {str(result)}", exc_info=result)
+            else:
+                question['answers'].append(result)
+
+        if within_budget():
+            await asyncio.to_thread(default_store.put_page, 'question_answers', question_id, question)
+            await asyncio.to_thread(default_store.put_answers, question_id, question['answers'])
+        return question, 200
+
+    except httpx.HTTPError as e:
+        logging.error(f"Request error: {str(e)}", exc_info=True)
+        return {"error": f"Error fetching answers: {str(e)}"}, 500
+    except Exception as e:
+        logging.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return {"error": "An unexpected error occurred"}, 500
+
+
+def too_many_ids():
+    return jsonify({"error": f"At most {MAX_IDS} ids can be requested at once"}), 400
+
+
+@app.route('/questions/<ids:question_ids>', methods=['GET'])
+async def get_questions_by_ids_route(question_ids: List[int]):
+    if len(question_ids) > MAX_IDS:
+        return too_many_ids()
+    questions = await asyncio.gather(*(get_question_by_id(question_id) for question_id in dict.fromkeys(question_ids)))
+    questions = [question for question in questions if question]
+    if not questions:
+        return not_found("Questions not found")
+    return jsonify(questions), 200
+
+
+@app.route('/questions/<ids:question_ids>/answers', methods=['GET'])
+async def get_answers_for_questions(question_ids: List[int]):
+    if len(question_ids) > MAX_IDS:
+        return too_many_ids()
+    results = await asyncio.gather(*(scrape_answers_for_question(question_id)
+                                     for question_id in dict.fromkeys(question_ids)))
+    questions = [payload for payload, status in results if status == 200]
+    if not questions:
+        if timed_out():
+            return deadline_exceeded()
+        return jsonify(results[0][0]), results[0][1]
+    return jsonify(questions), 200
+
+
+@app.route('/answers/<ids:answer_ids>', methods=['GET'])
+async def get_answers_by_ids_route(answer_ids: List[int]):
+    if len(answer_ids) > MAX_IDS:
+        return too_many_ids()
+    answers = await get_answers_by_ids(answer_ids)
+    if not answers:
+        return not_found("Answers not found")
+    return jsonify(answers), 200
+
+
+async def get_answers_by_ids(answer_ids: List[int]) -> List[Answer]:
+    """See ``stackoverflow_scraper.get_answers_by_ids``."""
+    found: Dict[str, Answer] = {}
+    slots = asyncio.Semaphore(BATCH_WORKERS)
+
+    async def lookup(answer_id: int):
+        async with slots:
+            # an earlier page may already have brought this answer in
+            if str(answer_id) in found:
+                return
+            for answer in await get_answer_by_id(answer_id) or []:
+                found.setdefault(answer['answer_id'], answer)
+
+    ids = list(dict.fromkeys(answer_ids))
+    await asyncio.gather(*(lookup(answer_id) for answer_id in ids))
+    return [found[str(answer_id)] for answer_id in ids if str(answer_id) in found]
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('STACKOVERFLOW_API_PORT', 23467))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,66 @@
+"""Per-page extraction cost: building the (selective) tree vs reading the records off it.
+
+For every page type the scraper reads, times ``parsing.make_soup`` with the
+page's strainer and, separately, the extractor run on the finished tree::
+
+    python -m benchmarks.bench_extractors --iterations 50
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import parsing
+import extractors
+from benchmarks import fixtures
+
+QUESTION_ID = 1002
+
+
+def _cases() -> Dict[str, Tuple[str, Any, Callable[[Any], object]]]:
+    question_html = fixtures.question_page(QUESTION_ID, answers=5)
+    return {
+        "listing (50 questions)": (fixtures.listing(range(1000, 1050)), extractors.LISTING_PAGE_ONLY,
+                                   lambda soup: extractors.parse_question_summaries(soup, [])),
+        "question page": (question_html, extractors.QUESTION_PAGE_ONLY,
+                          lambda soup: extractors.parse_question_page(soup, QUESTION_ID, "")),
+        "answers (/a/<id>)": (question_html, extractors.QUESTION_PAGE_ONLY, extractors.parse_answers),
+        "answers (/questions/<id>/answers)": (question_html, extractors.QUESTION_PAGE_ONLY,
+                                              lambda soup: extractors.parse_question_answers(soup, QUESTION_ID)),
+        "question details": (question_html, extractors.QUESTION_DETAILS_ONLY, extractors.parse_question_details),
+        "collectives": (fixtures.collectives_page(["google-cloud", "aws", "nlp", "azure", "php", "go"]),
+                        extractors.COLLECTIVES_PAGE_ONLY, extractors.parse_collectives),
+        "collective tags": (fixtures.collective_page("aws", page=1), extractors.COLLECTIVE_TAGS_ONLY,
+                            extractors.parse_collective_tags),
+        "external links": (fixtures.collective_page("aws"), extractors.EXTERNAL_LINKS_ONLY,
+                           lambda soup: extractors.parse_external_links(soup, "")),
+    }
+
+
+def measure(func: Callable[[], object], iterations: int) -> float:
+    """Median CPU milliseconds of one call."""
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time()
+        func()
+        timings.append(time.process_time() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"parser: {parsing.PARSER}, selective: {parsing.SELECTIVE}")
+    print(f"{'page':<36}{'size':>8}{'tree':>11}{'extract':>11}{'extract share':>15}")
+    for label, (html, strainer, extract) in _cases().items():
+        tree = measure(lambda: parsing.make_soup(html, strainer), args.iterations)
+        soup = parsing.make_soup(html, strainer)
+        extraction = measure(lambda: extract(soup), args.iterations)
+        print(f"{label:<36}{len(html) // 1024:>6}KB{tree:>8.2f} ms{extraction:>8.2f} ms"
+              f"{extraction / (tree + extraction):>14.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Encode time of the largest API responses, per JSON backend.
+
+Scrapes a 100-question ``/questions`` page, a question's answers and the
+``/collectives`` list through ``benchmarks.upstream.FakeUpstream`` (recorded
+pages with ``--recordings DIR``, the synthetic pages otherwise) and times
+writing each one as a response body:
+
+- ``dicts``: ``json.dumps`` of the nested dicts with datetime dates formatted
+  by Flask, as responses were written before models and epoch dates
+- ``json``: ``models.ModelEncoder``
+- ``orjson``: the orjson backend, when it is installed
+
+::
+
+    python -m benchmarks.bench_json --iterations 200
+    python -m benchmarks.bench_json --recordings pages/
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+from flask.json.provider import DefaultJSONProvider
+
+SEPARATORS = (',', ':')
+DATE_FIELDS = {'creation_date', 'closed_date', 'last_edit_date', 'last_activity', 'last_activity_date', 'locked_date'}
+
+
+def before(value: Any) -> Any:
+    """``value`` as the scraper returned it before: dicts, with datetime dates."""
+    from models import Model
+
+    if isinstance(value, Model):
+        return {name: datetime.fromtimestamp(item, timezone.utc).replace(tzinfo=None)
+                if name in DATE_FIELDS and isinstance(item, int) else before(item)
+                for name, item in value.items()}
+    if isinstance(value, list):
+        return [before(item) for item in value]
+    return value
+
+
+def _payloads(recordings: str) -> Dict[str, Any]:
+    from benchmarks.upstream import FakeUpstream, redirect
+    import stackoverflow_scraper
+
+    with FakeUpstream(recordings=recordings) as upstream, contextlib.redirect_stdout(io.StringIO()):
+        redirect(upstream.url)
+        return {
+            "/questions (100)": stackoverflow_scraper.get_detailed_questions(1, 100),
+            "/questions/<id>/answers": stackoverflow_scraper.scrape_answers_for_question(1002)[0],
+            "/collectives": stackoverflow_scraper.scrape_collectives(),
+        }
+
+
+def measure(func: Callable[[], object], iterations: int) -> float:
+    """Median milliseconds of one call."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--recordings', help='directory of pages saved with `benchmarks.upstream record`')
+    args = parser.parse_args()
+
+    # The scraper reads its configuration at import time
+    os.environ.update(SCRAPER_CACHE_BACKEND='none', SCRAPER_STORE_PATH='', SCRAPER_UPSTREAM_RATE='0',
+                      SCRAPER_PREFETCH='')
+    import json
+
+    import models
+
+    default = DefaultJSONProvider.default
+    encoder = models.ModelEncoder(default, separators=SEPARATORS)
+    print(f"{'payload':<26}{'size':>8}{'dicts':>11}{'json':>11}{'orjson':>11}")
+    for label, payload in _payloads(args.recordings).items():
+        dicts = before(payload)
+        body = encoder.encode(payload)
+        timings = [
+            measure(lambda: json.dumps(dicts, default=default, sort_keys=True, separators=SEPARATORS),
+                    args.iterations),
+            measure(lambda: encoder.encode(payload), args.iterations),
+        ]
+        if models.JSON_BACKEND == 'orjson':
+            options = models.ORJSON_OPTIONS | models.orjson.OPT_SORT_KEYS
+            timings.append(measure(lambda: models.orjson.dumps(payload, default=models.model_default(default),
+                                                               option=options), args.iterations))
+        print(f"{label:<26}{len(body) // 1024:>6}KB" + "".join(f"{timing:>8.2f} ms" for timing in timings))
+    if models.JSON_BACKEND != 'orjson':
+        print("orjson: not installed (or SCRAPER_JSON_BACKEND=json)")
+
+
+if __name__ == '__main__':
+    main()
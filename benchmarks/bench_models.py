@@ -0,0 +1,124 @@
+"""Cached payloads as ``models`` vs the nested dicts they replace.
+
+For a /questions page, a question's answers and the collectives list, built
+from the synthetic pages, reports the pickled size of the cache entry, the
+memory of one unpickled copy (what a cache hit materialises), the time to
+unpickle it and the time to write its JSON response: ``json.dumps`` of the
+dicts vs ``models.ModelEncoder`` (the ``json`` backend), and ``orjson`` of
+either form when it is installed (the models through ``models.model_default``,
+as the ``orjson`` backend writes them)::
+
+    python -m benchmarks.bench_models --iterations 200
+"""
+import argparse
+import json
+import pickle
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from flask.json.provider import DefaultJSONProvider
+
+import extractors
+from benchmarks import fixtures
+from models import ExternalLink, Model, ModelEncoder, model_default
+
+try:
+    import orjson
+    # as ``models.ModelJSONProvider`` sorts and passes models and dates to ``default``
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS
+except ImportError:
+    orjson = None
+
+SEPARATORS = (',', ':')
+
+
+def plain(value: Any) -> Any:
+    """``value`` with every model replaced by its dict form."""
+    if isinstance(value, Model):
+        return {name: plain(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+
+def _payloads() -> Dict[str, Any]:
+    questions = [entry['question'] for entry in
+                 extractors.extract_question_summaries(fixtures.listing(range(1000, 1100)), [])]
+    for question in questions:
+        # what the profile, timeline and question page fetches add
+        question.owner.account_id = question.owner.user_id + 1
+        question.update(creation_date=1714557600, last_edit_date=1714640400,
+                        closed_date=None, last_activity=None, locked=None, protected=None,
+                        accepted_answer_id=question.question_id * 10)
+
+    question, answers = extractors.extract_question_answers(fixtures.question_page(1002, answers=30), 1002)
+    question.answers = [answer for answer, _ in answers]
+
+    collectives = extractors.parse_collectives(extractors.make_soup(
+        fixtures.collectives_page([f"collective-{i}" for i in range(50)]), extractors.COLLECTIVES_PAGE_ONLY))
+    for collective in collectives:
+        collective.tags = [f"{collective.slug}-tag-{i}" for i in range(40)]
+        collective.external_links = [ExternalLink(type=link_type, link=f"https://example.com/{link_type}")
+                                     for link_type in extractors.EXTERNAL_LINK_TYPES]
+
+    return {
+        "/questions (100 questions)": questions,
+        "/questions/<id>/answers (30)": question,
+        "/collectives (50, 40 tags)": collectives,
+    }
+
+
+def measure(func: Callable[[], object], iterations: int) -> float:
+    """Median milliseconds of one call."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def loaded_size(data: bytes) -> int:
+    """Bytes allocated by unpickling ``data``."""
+    tracemalloc.start()
+    value = pickle.loads(data)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    encoder = ModelEncoder(DefaultJSONProvider.default, separators=SEPARATORS)
+    print(f"{'payload':<32}{'form':>8}{'pickled':>10}{'in memory':>11}{'unpickle':>11}{'json':>11}"
+          + (f"{'orjson':>11}" if orjson else ''))
+    for label, payload in _payloads().items():
+        dicts = plain(payload)
+        if encoder.encode(payload) != json.dumps(dicts, default=DefaultJSONProvider.default, sort_keys=True,
+                                                 separators=SEPARATORS):
+            raise AssertionError(f"{label}: ModelEncoder and json.dumps disagree")
+        forms = {
+            "dicts": (dicts, lambda: json.dumps(dicts, default=DefaultJSONProvider.default, sort_keys=True,
+                                                separators=SEPARATORS)),
+            "models": (payload, lambda: encoder.encode(payload)),
+        }
+        for form, (value, encode) in forms.items():
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            unpickle = measure(lambda: pickle.loads(data), args.iterations)
+            line = (f"{label:<32}{form:>8}{len(data) // 1024:>8}KB{loaded_size(data) // 1024:>9}KB"
+                    f"{unpickle:>8.2f} ms{measure(encode, args.iterations):>8.2f} ms")
+            if orjson:
+                default = model_default(DefaultJSONProvider.default)
+                encode = lambda: orjson.dumps(value, default=default, option=ORJSON_OPTIONS)  # noqa: E731
+                line += f"{measure(encode, args.iterations):>8.2f} ms"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""CPU cost of parsing + extracting each page type, per parser configuration.
+
+Compares the original setup (``html.parser``, full tree) with ``lxml`` on the
+full tree and ``lxml`` restricted to the parts each extractor reads::
+
+    python -m benchmarks.bench_parsing --iterations 20
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+
+import extractors
+import parsing
+from benchmarks import fixtures
+
+CONFIGS: List[Tuple[str, str, bool]] = [
+    ("html.parser, full tree", "html.parser", False),
+    ("lxml, full tree", "lxml", False),
+    ("lxml, selective", "lxml", True),
+]
+
+
+def _cases() -> Dict[str, Tuple[str, Callable[[str], object]]]:
+    question_html = fixtures.question_page(1002, answers=5)
+    return {
+        "listing (50 questions)": (
+            fixtures.listing(range(1000, 1050)),
+            lambda html: extractors.extract_question_summaries(html, []),
+        ),
+        "question page": (
+            question_html,
+            lambda html: extractors.extract_question_page(html, 1002, ""),
+        ),
+        "answers on question page": (
+            question_html,
+            extractors.extract_answers,
+        ),
+        "accepted answer id": (question_html, extractors.extract_accepted_answer_id),
+        "collectives": (
+            fixtures.collectives_page(["google-cloud", "aws", "nlp", "azure", "php", "go"]),
+            lambda html: extractors.parse_collectives(parsing.make_soup(html, extractors.COLLECTIVES_PAGE_ONLY)),
+        ),
+    }
+
+
+def measure(func: Callable[[str], object], html: str, iterations: int) -> float:
+    """Median CPU milliseconds of one call."""
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time()
+        func(html)
+        timings.append(time.process_time() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    saved = parsing.PARSER, parsing.SELECTIVE
+    names = [name for name, _, _ in CONFIGS]
+    print(f"{'page':<28}{'size':>9}" + "".join(f"{name:>26}" for name in names))
+    try:
+        for label, (html, func) in _cases().items():
+            row = []
+            for _, backend, selective in CONFIGS:
+                parsing.PARSER, parsing.SELECTIVE = backend, selective
+                row.append(measure(func, html, args.iterations))
+            cells = "".join(f"{ms:>17.2f} ms" + (f" ({row[0] / ms:.1f}x)" if i else " " * 7)
+                            for i, ms in enumerate(row))
+            print(f"{label:<28}{len(html) // 1024:>7}KB{cells}")
+    finally:
+        parsing.PARSER, parsing.SELECTIVE = saved
+
+
+if __name__ == '__main__':
+    main()
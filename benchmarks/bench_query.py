@@ -0,0 +1,97 @@
+"""Latency of /questions filter/sort queries answered from the post store.
+
+Fills an in-memory ``store.PostStore`` with synthetic listing records and the
+first listing pages of each tag set, and times ``query_questions`` (one
+listing page, filtered and sorted) for the StackExchange ``sort``/``min``/
+``max``/``fromdate``/``todate``/``tags`` combinations::
+
+    python -m benchmarks.bench_query --questions 20000 --iterations 200
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from store import PostStore
+
+TAGS = ['python', 'javascript', 'java', 'c#', 'php', 'android', 'html', 'jquery', 'c++', 'css',
+        'ios', 'sql', 'mysql', 'r', 'reactjs', 'node.js', 'arrays', 'c', 'asp.net', 'json']
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+DAY = 86400
+# Listing pages stored per tag set
+LISTED_PAGES = 10
+
+
+def synthetic_questions(count: int, seed: int = 0) -> List[Tuple[Dict[str, Any], str]]:
+    rng = random.Random(seed)
+    questions = []
+    for question_id in range(1, count + 1):
+        created = START + timedelta(seconds=rng.randrange(4 * 365 * DAY))
+        active = created + timedelta(seconds=rng.randrange(90 * DAY))
+        marker = active.strftime("%Y-%m-%d %H:%M:%SZ")
+        questions.append(({
+            'question_id': question_id,
+            'title': f"Question {question_id}",
+            'tags': rng.sample(TAGS, rng.randint(1, 4)),
+            'owner': {'user_id': rng.randrange(1, 5000)},
+            'score': int(rng.paretovariate(1.5)) - 1,
+            'answer_count': rng.randrange(6),
+            'view_count': rng.randrange(10, 50000),
+            'creation_date': int(created.timestamp()),
+            'last_activity': int(active.timestamp()),
+        }, marker))
+    return questions
+
+
+def _epoch(days: int) -> int:
+    return int((START + timedelta(days=days)).timestamp())
+
+
+QUERIES = {
+    "sort=activity": {},
+    "sort=votes": {'sort': 'votes'},
+    "sort=creation&order=asc": {'sort': 'creation', 'order': 'asc'},
+    "sort=votes&min=5": {'sort': 'votes', 'min': 5},
+    "fromdate/todate (1 month)": {'fromdate': _epoch(400), 'todate': _epoch(430)},
+    "tags=python": {'tags': ['python']},
+    "tags=python;sql&sort=votes": {'tags': ['python', 'sql'], 'sort': 'votes'},
+    "tags=python&fromdate&page=5": {'tags': ['python'], 'fromdate': _epoch(700), 'page': 5},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--questions', type=int, default=20000, help='stored questions')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--pagesize', type=int, default=30)
+    args = parser.parse_args()
+
+    store = PostStore(':memory:')
+    start = time.perf_counter()
+    questions = synthetic_questions(args.questions)
+    store.put_questions(questions)
+    print(f"stored {args.questions} questions in {time.perf_counter() - start:.2f}s")
+    # the first listing pages of each queried tag set are stored, most recently active first
+    for tags in {tuple(query.get('tags', ())) for query in QUERIES.values()}:
+        listed = sorted((question for question, _ in questions if set(tags) <= set(question['tags'])),
+                        key=lambda question: question['last_activity'], reverse=True)
+        for page in range(1, LISTED_PAGES + 1):
+            store.put_listing(tags, page, args.pagesize, listed[(page - 1) * args.pagesize:page * args.pagesize])
+
+    print(f"{'query':<32}{'median':>12}{'p95':>12}{'rows':>6}")
+    for label, query in QUERIES.items():
+        query = {'pagesize': args.pagesize, **query}
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            rows = store.query_questions(**query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        print(f"{label:<32}{statistics.median(timings) * 1000:>10.3f}ms{p95 * 1000:>10.3f}ms{len(rows):>6}")
+
+
+if __name__ == '__main__':
+    main()
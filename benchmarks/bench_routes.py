@@ -0,0 +1,165 @@
+"""End-to-end latency of the Flask routes against a local fake upstream.
+
+Each route is called ``--requests`` times from ``--concurrency`` client
+threads through Flask's test client, with every stackoverflow.com request
+answered by ``benchmarks.upstream.FakeUpstream``. Reports p50/p95/p99 latency,
+throughput, upstream requests per API call (by URL class) and the peak Python
+memory of one call::
+
+    python -m benchmarks.bench_routes --requests 20 --concurrency 4 --latency 0.05
+    python -m benchmarks.bench_routes --json baseline.json
+    python -m benchmarks.bench_routes --compare baseline.json   # exits 1 on a regression
+
+The response cache and the post store are disabled unless ``--cache`` is
+given (otherwise every call after the first would be served locally; with it
+the store is kept in memory for the run), and the upstream rate limiter is
+off unless ``--upstream-rate`` is set, so the numbers measure the scraper
+itself; request-count regressions still show up in the upstream column.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+ROUTES = {
+    'questions': '/questions?pagesize=30',
+    'question': '/questions/1002',
+    'question_answers': '/questions/1002/answers',
+    'answer': '/answers/10020',
+    'collectives': '/collectives',
+}
+# Allowed growth over a --compare baseline before a metric counts as a regression
+LATENCY_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def run_route(app, upstream, path: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    clients = threading.local()
+
+    def call(_) -> float:
+        client = getattr(clients, 'client', None)
+        if client is None:
+            client = clients.client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        return elapsed
+
+    call(None)  # warm up connections and imports
+    upstream.reset()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(call, range(requests)))
+        wall = time.perf_counter() - start
+    counts = upstream.counts()
+
+    tracemalloc.start()
+    call(None)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = counts.pop('errors', 0)
+    return {
+        'path': path,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'throughput': requests / wall,
+        'upstream_per_call': sum(counts.values()) / requests,
+        'upstream_by_class': {name: count / requests for name, count in sorted(counts.items())},
+        'upstream_errors_per_call': errors / requests,
+        'peak_mb': peak / (1024 * 1024),
+    }
+
+
+def regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    found = []
+    for route, result in results.items():
+        base = baseline.get(route)
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + LATENCY_TOLERANCE):
+            found.append(f"{route}: p95 {base['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+        if result['upstream_per_call'] > base['upstream_per_call'] + 0.5:
+            found.append(f"{route}: upstream requests/call {base['upstream_per_call']:.1f} -> "
+                         f"{result['upstream_per_call']:.1f}")
+        if result['peak_mb'] > base['peak_mb'] * (1 + MEMORY_TOLERANCE):
+            found.append(f"{route}: peak memory {base['peak_mb']:.1f}MB -> {result['peak_mb']:.1f}MB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--routes', nargs='+', choices=sorted(ROUTES), default=list(ROUTES))
+    parser.add_argument('--requests', type=int, default=20, help='timed calls per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads')
+    parser.add_argument('--latency', type=float, default=0.02, help='upstream response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random upstream delay, up to this')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream responses that fail')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--recordings', help='directory of pages saved with `benchmarks.upstream record`')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache and post store enabled')
+    parser.add_argument('--upstream-rate', help='SCRAPER_UPSTREAM_RATE to run with (default: no limit)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline written by --json; exit 1 if a route regressed')
+    args = parser.parse_args()
+
+    # The scraper reads its configuration at import time
+    if not args.cache:
+        os.environ['SCRAPER_CACHE_BACKEND'] = 'none'
+    os.environ['SCRAPER_STORE_PATH'] = ':memory:' if args.cache else ''
+    os.environ['SCRAPER_UPSTREAM_RATE'] = args.upstream_rate or '0'
+    from benchmarks.upstream import FakeUpstream, redirect
+    import stackoverflow_scraper
+
+    upstream = FakeUpstream(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            error_status=args.error_status, recordings=args.recordings)
+    results = {}
+    with upstream:
+        redirect(upstream.url)
+        print(f"upstream latency {args.latency * 1000:.0f}ms (+{args.jitter * 1000:.0f}ms jitter), "
+              f"error rate {args.error_rate:.0%}, {args.requests} calls x {args.concurrency} threads per route")
+        print(f"{'route':<18}{'p50':>10}{'p95':>10}{'p99':>10}{'calls/s':>10}{'upstream':>10}{'peak':>10}")
+        for route in args.routes:
+            # the scraper still prints debug output; keep it out of the table
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run_route(stackoverflow_scraper.app, upstream, ROUTES[route],
+                                   args.requests, args.concurrency)
+            results[route] = result
+            print(f"{route:<18}{result['p50_ms']:>8.1f}ms{result['p95_ms']:>8.1f}ms{result['p99_ms']:>8.1f}ms"
+                  f"{result['throughput']:>10.1f}{result['upstream_per_call']:>10.1f}{result['peak_mb']:>8.1f}MB")
+            by_class = ", ".join(f"{name} {count:g}" for name, count in result['upstream_by_class'].items())
+            print(f"{'':<18}upstream/call: {by_class}")
+    print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024}MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f))
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
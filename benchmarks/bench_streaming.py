@@ -0,0 +1,93 @@
+"""DOM vs streaming extraction for profile ids and timeline dates.
+
+The DOM path is how these lookups used to work: download the whole page, parse
+it with lxml (restricted to the relevant elements) and walk the tree. The
+streaming path feeds the body in network-sized chunks to ``StreamScanner``,
+stops at the end marker and matches the raw bytes::
+
+    python -m benchmarks.bench_streaming --iterations 50
+"""
+import argparse
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import parsing
+import scraping
+from models import epoch
+from benchmarks import fixtures
+from benchmarks.bench_parsing import measure
+
+
+def dom_user_ids(html: str):
+    soup = parsing.make_soup(html, parsing.only(tags=["script"]))
+    for script in soup.find_all("script"):
+        content = script.string
+        if content and "accountId" in content:
+            account_id = re.search(r'accountId:\s*(\d+)', content)
+            user_id = re.search(r'userId:\s*(\d+)', content)
+            return (account_id.group(1) if account_id else None,
+                    user_id.group(1) if user_id else None)
+    return None, None
+
+
+def dom_timeline_dates(html: str):
+    dates = {}
+    soup = parsing.make_soup(html, parsing.only(classes=["event-rows"]))
+    for entry in soup.find_all("tr", class_="event-rows"):
+        field = scraping.TIMELINE_DATE_FIELDS.get(entry.get("data-eventtype", "").encode())
+        date = entry.find("span", class_="relativetime")
+        if field and date and "title" in date.attrs:
+            dates[field] = epoch(datetime.strptime(date["title"], "%Y-%m-%d %H:%M:%SZ"))
+    return dates
+
+
+def streamed(parse: Callable[[bytes], object], markers: Tuple[bytes, ...], chunk_size: int):
+    def run(body: bytes):
+        scanner = parsing.StreamScanner(*markers)
+        for start in range(0, len(body), chunk_size):
+            if scanner.feed(body[start:start + chunk_size]):
+                break
+        return parse(scanner.data)
+    return run
+
+
+def bytes_read(body: bytes, markers: Tuple[bytes, ...], chunk_size: int) -> int:
+    scanner = parsing.StreamScanner(*markers)
+    for start in range(0, len(body), chunk_size):
+        if scanner.feed(body[start:start + chunk_size]):
+            return start + chunk_size
+    return len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=scraping.STREAM_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    cases: Dict[str, Tuple[str, Callable, Callable, Tuple[bytes, ...]]] = {
+        "user profile": (fixtures.user_page(1003), dom_user_ids, scraping.parse_user_ids,
+                         scraping.USER_IDS_END),
+        "timeline": (fixtures.timeline(1002), dom_timeline_dates, scraping.parse_timeline_dates,
+                     scraping.TIMELINE_END),
+    }
+    print(f"{'page':<16}{'size':>9}{'DOM':>12}{'streaming':>22}{'body read':>16}")
+    for label, (html, dom, parse, markers) in cases.items():
+        body = html.encode()
+        run = streamed(parse, markers, args.chunk_size)
+        assert run(body) == dom(html), label
+        dom_ms = measure(dom, html, args.iterations)
+        stream_ms = measure(run, body, args.iterations)
+        read = min(bytes_read(body, markers, args.chunk_size), len(body))
+        rows: List[str] = [
+            f"{label:<16}{len(body) // 1024:>7}KB",
+            f"{dom_ms:>9.2f} ms",
+            f"{stream_ms:>12.2f} ms ({dom_ms / stream_ms:.0f}x)",
+            f"{read // 1024:>8}KB ({read * 100 // len(body)}%)",
+        ]
+        print("".join(rows))
+
+
+if __name__ == '__main__':
+    main()
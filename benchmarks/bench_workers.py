@@ -0,0 +1,169 @@
+"""Throughput of ``serve.py`` by number of worker processes.
+
+For each ``--workers`` count the launcher is started on a free port with every
+worker's stackoverflow.com requests sent to ``benchmarks.upstream.FakeUpstream``,
+and ``--concurrency`` client threads call ``--path`` over real HTTP for
+``--duration`` seconds. Reports requests per second, p50/p95 latency and
+failed calls; ``--reload`` sends the launcher a SIGHUP halfway through, which
+should replace the workers without failing a single call::
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --concurrency 16
+    python -m benchmarks.bench_workers --app sync --workers 4 --reload
+
+The response cache and the post store are disabled unless ``--cache`` is
+given, so every call is scraped (and parsed) again.
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.bench_routes import percentile
+
+READY_TIMEOUT = 60
+
+
+def __getattr__(name: str) -> Any:
+    """``async_app`` and ``sync_app``, which worker processes load (see
+    ``app_for``): the app, with its requests sent to BENCH_UPSTREAM."""
+    if name not in ('async_app', 'sync_app'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from benchmarks.upstream import redirect, redirect_async
+
+    redirect(os.environ['BENCH_UPSTREAM'])
+    if name == 'async_app':
+        redirect_async(os.environ['BENCH_UPSTREAM'])
+        from async_scraper import app
+    else:
+        from stackoverflow_scraper import app
+    return app
+
+
+def app_for(name: str) -> List[str]:
+    """``serve.py`` arguments running the ``name`` app through this module."""
+    if name == 'async':
+        return ['--app', 'benchmarks.bench_workers:async_app', '--interface', 'asgi3']
+    return ['--app', 'benchmarks.bench_workers:sync_app', '--interface', 'wsgi']
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def call(port: int, path: str) -> int:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def wait_ready(port: int, server: subprocess.Popen):
+    deadline = time.time() + READY_TIMEOUT
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {server.returncode}")
+        try:
+            if call(port, '/stats') == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"serve.py not ready after {READY_TIMEOUT}s")
+
+
+def run(args, workers: int, upstream_url: str) -> Dict[str, Any]:
+    port = free_port()
+    env = dict(os.environ, BENCH_UPSTREAM=upstream_url,
+               SCRAPER_UPSTREAM_RATE='0', SCRAPER_PREFETCH='')
+    if not args.cache:
+        env.update(SCRAPER_CACHE_BACKEND='none', SCRAPER_STORE_PATH='')
+    server = subprocess.Popen([sys.executable, 'serve.py', '--workers', str(workers), '--port', str(port),
+                               '--host', '127.0.0.1', *app_for(args.app)],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, server)
+        call(port, args.path)  # warm the workers' imports and connection pools
+
+        latencies: List[float] = []
+        failures = 0
+        lock = threading.Lock()
+        stop = time.perf_counter() + args.duration
+
+        def client():
+            nonlocal failures
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    ok = call(port, args.path) == 200
+                except OSError:
+                    ok = False
+                with lock:
+                    if ok:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        failures += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            clients = [pool.submit(client) for _ in range(args.concurrency)]
+            if args.reload:
+                time.sleep(args.duration / 2)
+                server.send_signal(signal.SIGHUP)
+            for future in clients:
+                future.result()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "workers": workers,
+        "calls": len(latencies),
+        "failed": failures,
+        "per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else 0.0,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--app', choices=['async', 'sync'], default='async')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--path', default='/questions?pagesize=30')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per worker count')
+    parser.add_argument('--latency', type=float, default=0.02, help='upstream response delay in seconds')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache and post store enabled')
+    parser.add_argument('--reload', action='store_true', help='SIGHUP the launcher halfway through each run')
+    args = parser.parse_args()
+
+    from benchmarks.upstream import FakeUpstream
+
+    print(f"cores: {os.cpu_count()}  app: {args.app}  path: {args.path}")
+    print(f"{'workers':>8}{'req/s':>10}{'scaling':>9}{'p50':>11}{'p95':>11}{'calls':>7}{'failed':>7}")
+    with FakeUpstream(latency=args.latency) as upstream:
+        baseline = None
+        # scaling is relative to the per-worker throughput of the fewest workers
+        for workers in sorted(set(args.workers)):
+            result = run(args, workers, upstream.url)
+            baseline = baseline or result['per_second'] / workers
+            scaling = result['per_second'] / baseline if baseline else 0.0
+            print(f"{workers:>8}{result['per_second']:>10.1f}{scaling:>8.2f}x{result['p50_ms']:>9.0f}ms"
+                  f"{result['p95_ms']:>9.0f}ms{result['calls']:>7}{result['failed']:>7}")
+
+
+if __name__ == '__main__':
+    main()
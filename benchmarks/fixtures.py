@@ -0,0 +1,137 @@
+"""Synthetic stackoverflow.com pages for offline benchmarks.
+
+Each function renders a page with the markup the scraper's extractors target
+(listing summaries, question page, timeline, user profile, collectives),
+wrapped in the page chrome a real page carries: a large <head> with inline
+scripts and styles, top bar, left navigation, right sidebar and footer. Sizes
+are in the same range as live pages, so parse-time numbers are comparable.
+"""
+from typing import Iterable
+
+_SCRIPT = "StackExchange.ready(function(){ StackExchange.using('gps', function(){ /* tracking */ }); });\n" * 120
+_STYLE = ".s-btn{display:inline-block}.s-card{border:1px solid}.fc-black-500{color:#000}\n" * 200
+_NAV = "".join(f'<li class="ps-relative"><a href="/nav/{i}" class="pl8 js-gps-track nav-links--link">Link {i}</a></li>'
+               for i in range(60))
+_SIDEBAR = "".join(f'<li class="d-flex"><div class="favicon favicon-site{i}"></div><a href="https://site{i}.stackexchange.com/questions/{i}" '
+                   f'class="js-gps-track question-hyperlink mb0">Hot network question number {i} about something</a></li>'
+                   for i in range(120))
+_FOOTER = "".join(f'<li class="-item"><a href="/footer/{i}" class="-link js-gps-track">Footer link {i}</a></li>' for i in range(80))
+
+
+def _page(title: str, main: str, header: str = "") -> str:
+    return f'''<!DOCTYPE html><html itemscope itemtype="https://schema.org/QAPage" class="html__responsive"><head>
+<title>{title} - Stack Overflow</title><style>{_STYLE}</style><script>{_SCRIPT}</script>
+<script>StackExchange.init({{"locale":"en","serverTime":1714557600,"routeName":"Questions/Show"}});</script></head>
+<body class="question-page unified-theme"><header class="s-topbar ps-fixed t0 l0 js-top-bar"><div class="s-topbar--container">
+<a href="/" class="s-topbar--logo js-gps-track"><span class="-img _glyph">Stack Overflow</span></a></div></header>
+<div class="container"><div id="left-sidebar" class="left-sidebar js-pinned-left-sidebar ps-relative"><nav><ol class="nav-links">{_NAV}</ol></nav></div>
+<div id="content" class="snippet-hidden">{header}<div id="mainbar" role="main">{main}</div>
+<div id="sidebar" class="show-votes" role="complementary"><div id="hot-network-questions" class="module tex2jax_ignore"><ul>{_SIDEBAR}</ul></div></div>
+</div></div><footer id="footer" class="site-footer js-footer"><ul class="-list">{_FOOTER}</ul></footer></body></html>'''
+
+
+def question_summary(question_id: int, user_id: int, accepted: bool) -> str:
+    accepted_class = ' has-answers has-accepted-answer' if accepted else ''
+    return f'''<div id="question-summary-{question_id}" class="s-post-summary js-post-summary" data-post-id="{question_id}" data-post-type-id="1">
+<div class="s-post-summary--stats js-post-summary-stats">
+<div class="s-post-summary--stats-item s-post-summary--stats-item__emphasized" title="Score of 3"><span class="s-post-summary--stats-item-number">3</span><span class="s-post-summary--stats-item-unit">votes</span></div>
+<div class="s-post-summary--stats-item{accepted_class}" title="2 answers"><span class="s-post-summary--stats-item-number">2</span><span class="s-post-summary--stats-item-unit">answers</span></div>
+<div class="s-post-summary--stats-item" title="1,234 views"><span class="s-post-summary--stats-item-number">1.2k</span><span class="s-post-summary--stats-item-unit">views</span></div>
+</div>
+<div class="s-post-summary--content">
+<h3 class="s-post-summary--content-title"><a href="/questions/{question_id}/how-do-i-do-thing-{question_id}" class="s-link">How do I do thing number {question_id}?</a></h3>
+<div class="s-post-summary--content-excerpt">I am trying to do a thing and it does not work. Here is what I tried so far and the error I get back from the library.</div>
+<div class="s-post-summary--meta"><div class="s-post-summary--meta-tags d-inline-block tags js-tags"><ul class="ml0 list-ls-none js-post-tag-list-wrapper d-inline">
+<li class="d-inline mr4 js-post-tag-list-item"><a href="/questions/tagged/python" class="post-tag flex--item mt0 js-tagname-python" rel="tag">python</a></li>
+<li class="d-inline mr4 js-post-tag-list-item"><a href="/questions/tagged/flask" class="post-tag flex--item mt0 js-tagname-flask" rel="tag">flask</a></li></ul></div>
+<div class="s-user-card s-user-card__minimal"><a href="/users/{user_id}/user{user_id}" class="s-avatar s-avatar__16 s-user-card--avatar"><div class="gravatar-wrapper-16"><img src="https://i.sstatic.net/u{user_id}.png" alt="user{user_id}'s user avatar" width="16" height="16" class="s-avatar--image"></div></a>
+<div class="s-user-card--info"><div class="s-user-card--link d-flex gs4"><a href="/users/{user_id}/user{user_id}" class="flex--item">user{user_id}</a></div>
+<ul class="s-user-card--awards"><li class="s-user-card--rep"><span class="todo-no-class-here" title="reputation score " dir="ltr">1,024</span></li></ul></div>
+<time class="s-user-card--time">asked <span title="2024-05-01 10:00:00Z" class="relativetime">May 1, 2024 at 10:00</span></time></div></div></div></div>
+'''
+
+
+def listing(question_ids: Iterable[int]) -> str:
+    summaries = "".join(question_summary(q, 1000 + q % 7, q % 2 == 0) for q in question_ids)
+    return _page("Newest Questions", f'<div id="questions" class="flush-left">{summaries}</div>')
+
+
+def user_page(user_id: int) -> str:
+    main = f'''<div id="mainbar-full" class="user-show-new"><div class="md:fd-column d-flex gs24"><div class="flex--item">
+<div class="fs-headline2 fw-bold">user{user_id}</div></div></div>{"<p class='mb8'>Top posts and activity of this user.</p>" * 150}
+<script>StackExchange.ready(function() {{ StackExchange.user.init({{ userId: {user_id}, accountId: {user_id * 10} }}); }});</script></div>'''
+    return _page(f"User user{user_id}", main)
+
+
+def timeline(question_id: int) -> str:
+    rows = [
+        ("history", "2024-05-02 11:00:00Z"),
+        ("question", "2024-05-01 10:00:00Z"),
+        ("edit", "2024-05-03 12:00:00Z"),
+    ] + [("comment", f"2024-05-0{4 + i % 5} 09:00:00Z") for i in range(20)]
+    body = "".join(f'<tr class="event-rows" data-eventtype="{kind}"><td class="ws-nowrap creation-date">'
+                   f'<span title="{date}" class="relativetime">{date[:10]}</span></td><td class="event-type"><span class="event-type">{kind}</span></td>'
+                   f'<td class="event-verb">details</td><td><a href="/users/1/u">user</a></td><td class="event-comment"><span>comment text</span></td></tr>'
+                   for kind, date in rows)
+    return _page(f"Timeline for question {question_id}",
+                 f'<table class="s-table s-table__bx-simple"><tbody>{body}</tbody></table>')
+
+
+def answer(answer_id: int, user_id: int, accepted: bool) -> str:
+    accepted_class = ' accepted-answer js-accepted-answer' if accepted else ''
+    body = "<p>Here is how you can do it. You need to call the function with the right arguments.</p><pre class='lang-py s-code-block'><code>result = do_thing(x, y)\n</code></pre>" * 6
+    return f'''<div id="answer-{answer_id}" class="answer js-answer{accepted_class}" data-answerid="{answer_id}" data-parentid="1" data-score="5" data-position-on-page="1" itemprop="{"acceptedAnswer" if accepted else "suggestedAnswer"}" itemscope itemtype="https://schema.org/Answer">
+<div class="post-layout"><div class="votecell post-layout--left"><div class="js-voting-container d-flex jc-center fd-column ai-center gs4 fc-black-300">
+<div class="js-vote-count flex--item d-flex fd-column ai-center fc-theme-body-font fw-bold fs-subheading py4" itemprop="upvoteCount" data-value="5">5</div></div></div>
+<div class="answercell post-layout--right"><div class="s-prose js-post-body" itemprop="text">{body}</div>
+<div class="mt24"><div class="d-flex fw-wrap ai-start jc-end gs8 gsy"><time itemprop="dateCreated" datetime="2024-05-01T12:00:00"></time>
+<div class="post-signature flex--item fl0"><div class="user-info">
+<div class="user-action-time">answered <span title="2024-05-01 12:00:00Z" class="relativetime">May 1, 2024 at 12:00</span></div>
+<div class="user-gravatar32"><a href="/users/{user_id}/user{user_id}"><div class="gravatar-wrapper-32"><img src="https://i.sstatic.net/u{user_id}.png" alt="user{user_id}'s user avatar" width="32" height="32" class="bar-sm"></div></a></div>
+<div class="user-details" itemprop="author" itemscope itemtype="http://schema.org/Person"><a href="/users/{user_id}/user{user_id}">user{user_id}</a>
+<div class="-flair"><span class="reputation-score" title="reputation score " dir="ltr">2,345</span></div></div></div></div></div></div>
+<div class="post-layout--right js-post-comments-component"><div class="comments js-comments-container"><ul class="comments-list js-comments-list">
+{"<li class='comment js-comment'><div class='comment-body'><span class='comment-copy'>Thanks, this worked for me.</span></div></li>" * 3}</ul></div></div></div></div>
+'''
+
+
+def question_page(question_id: int, answers: int = 3) -> str:
+    answer_html = "".join(answer(question_id * 10 + i, 2000 + i, question_id % 2 == 0 and i == 0) for i in range(answers))
+    header = f'''<div id="question-header" class="d-flex sm:fd-column"><h1 itemprop="name" class="fs-headline1 ow-break-word mb8 flex--item fl1"><a href="/questions/{question_id}/how-do-i-do-thing" class="question-hyperlink">How do I do thing number {question_id}?</a></h1></div>
+<div class="d-flex fw-wrap pb8 mb16 bb bc-black-075"><div class="flex--item ws-nowrap mr16 mb8" title="2024-05-01 10:00:00Z"><span class="fc-black-400 mr2">Asked</span><time itemprop="dateCreated" datetime="2024-05-01T10:00:00">May 1, 2024</time></div>
+<div class="flex--item ws-nowrap mr16 mb8"><span class="fc-black-400 mr2">Modified</span><a href="?lastactivity" class="s-link s-link__inherit" title="2024-05-03 12:00:00Z">May 3, 2024</a></div>
+<div class="flex--item ws-nowrap mb8" title="Viewed 1,234 times"><span class="fc-black-400 mr2">Viewed</span>1234 times</div></div>'''
+    body = "<p>I am trying to do a thing and it does not work.</p><pre class='lang-py s-code-block'><code>do_thing(x)\nTraceback (most recent call last): ...\n</code></pre>" * 8
+    main = f'''<div class="question js-question" data-questionid="{question_id}" data-position-on-page="0" id="question">
+<div class="post-layout"><div class="votecell post-layout--left"><div class="js-voting-container d-flex jc-center fd-column ai-center gs4 fc-black-300">
+<div class="js-vote-count flex--item d-flex fd-column ai-center fc-theme-body-font fw-bold fs-subheading py4" itemprop="upvoteCount" data-value="3">3</div></div></div>
+<div class="postcell post-layout--right"><div class="s-prose js-post-body" itemprop="text">{body}</div>
+<div class="mt24 mb12"><div class="post-taglist d-flex gs4 gsy fd-column"><div class="d-flex ps-relative fw-wrap"><ul class="ml0 list-ls-none js-post-tag-list-wrapper d-inline">
+<li class="d-inline mr4 js-post-tag-list-item"><a href="/questions/tagged/python" class="post-tag flex--item mt0 js-tagname-python" rel="tag">python</a></li>
+<li class="d-inline mr4 js-post-tag-list-item"><a href="/questions/tagged/flask" class="post-tag flex--item mt0 js-tagname-flask" rel="tag">flask</a></li></ul></div></div></div>
+<div class="mb0"><div class="mt16 d-flex gs8 gsy fw-wrap jc-end ai-start pt4 mb16"><div class="flex--item mr16 fl1 w96"><div class="js-post-menu pt2" data-post-id="{question_id}">
+<div class="d-flex gs8 s-anchors s-anchors__muted fw-wrap"><div class="flex--item"><a href="/q/{question_id}" rel="nofollow" class="js-share-link js-gps-track" data-se-share-sheet-license-name="CC BY-SA 4.0">Share</a></div></div></div></div>
+<div class="post-signature owner flex--item"><div class="user-info user-hover"><div class="user-action-time">asked <span title="2024-05-01 10:00:00Z" class="relativetime">May 1, 2024 at 10:00</span></div>
+<div class="user-gravatar32"><a href="/users/1003/user1003"><div class="gravatar-wrapper-32"><img src="https://i.sstatic.net/u1003.png" alt="user1003's user avatar" width="32" height="32" class="bar-sm"></div></a></div>
+<div class="user-details" itemprop="author"><a href="/users/1003/user1003">user1003</a><div class="-flair"><span class="reputation-score" title="reputation score " dir="ltr">1,024</span></div></div></div></div>
+<div class="post-signature flex--item"><div class="user-info"><div class="user-action-time">edited <span title="2024-05-03 12:00:00Z" class="relativetime">May 3, 2024 at 12:00</span></div>
+<div class="user-details"><a href="/users/1004/user1004">user1004</a></div></div></div></div></div></div></div></div>
+<div id="answers"><div id="answers-header"><div class="answers-subheader d-flex ai-center mb8"><div class="flex--item fl1"><h2 class="mb0" data-answercount="{answers}">{answers} Answers<span style="display:none;" itemprop="answerCount">{answers}</span></h2></div></div></div>
+{answer_html}</div>'''
+    return _page(f"How do I do thing number {question_id}?", main, header)
+
+
+def collectives_page(slugs: Iterable[str]) -> str:
+    cards = "".join(f'''<div class="flex--item s-card bs-sm mb12 py16 fc-black-500"><div class="d-flex ai-center mb12"><a href="/collectives/{slug}" class="js-gps-track">{slug.title()} Collective</a></div>
+<span class="fs-body1 v-truncate2 ow-break-word">A collective for developers working with {slug}.</span></div>''' for slug in slugs)
+    return _page("All Collectives", f'<div class="d-flex fw-wrap">{cards}</div>')
+
+
+def collective_page(slug: str, page: int = 0, tag_pages: int = 3) -> str:
+    """A collective's page; ``page`` >= 1 renders its ?tab=tags listing, empty past ``tag_pages``."""
+    links = '''<div class="s-select"><select><optgroup label="External links"><option data-url="https://cloud.example.org">Website</option>
+<option data-url="https://support.example.org">Support</option><option data-url="https://twitter.com/example">Twitter</option></optgroup></select></div>'''
+    tags = ""
+    if 1 <= page <= tag_pages:
+        tags = "".join(f'<div class="s-card"><a class="s-tag post-tag" href="/questions/tagged/{slug}-{page}-{i}">{slug}-{page}-{i}</a></div>' for i in range(30))
+    return _page(f"{slug} Collective", f'{links}<div class="d-flex fw-wrap">{tags}</div>')
@@ -0,0 +1,270 @@
+"""Local stand-in for stackoverflow.com.
+
+``FakeUpstream`` serves pages in a background process: recorded HTML from a
+directory when one is given, otherwise the synthetic pages in ``fixtures``.
+Every response can be delayed (``latency`` plus up to ``jitter`` seconds) and
+a fraction of them replaced by an error status, to see how the scraper behaves
+under a slow or flaky upstream. ``redirect`` points the shared
+``http_client.session`` at it (``redirect_async`` the asyncio app's client),
+so the scraper runs unmodified.
+
+Pages can be recorded for later offline runs with::
+
+    python -m benchmarks.upstream record DIR https://stackoverflow.com/questions/11227809 ...
+
+A recording is looked up by path and query string; requests with no recording
+fall back to the synthetic pages.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+import http_client
+from benchmarks import fixtures
+# the scraper's rate controller classes URLs the same way; used for the per-class request counts
+from rate_limit import URL_CLASSES
+
+ORIGIN = "https://stackoverflow.com"
+
+COLLECTIVE_SLUGS = ['google-cloud', 'aws', 'nlp']
+
+
+def recording_name(path_and_query: str) -> str:
+    return quote(path_and_query, safe='') + '.html'
+
+
+def classify(path: str) -> Tuple[str, Optional[re.Match]]:
+    for name, pattern in URL_CLASSES:
+        match = pattern.match(path)
+        if match:
+            return name, match
+    return 'other', None
+
+
+def synthetic_page(url_class: str, match: Optional[re.Match], query: Dict[str, list]) -> Optional[str]:
+    if url_class == 'listing':
+        page = int(query.get('page', ['1'])[0])
+        size = int(query.get('pagesize', ['30'])[0])
+        return fixtures.listing(range(page * 1000, page * 1000 + size))
+    if url_class == 'user':
+        return fixtures.user_page(int(match[1]))
+    if url_class == 'timeline':
+        return fixtures.timeline(int(match[1]))
+    if url_class == 'question':
+        return fixtures.question_page(int(match[1]))
+    if url_class == 'answer':
+        # answer ids are question_id * 10 + position
+        return fixtures.question_page(int(match[1]) // 10)
+    if url_class == 'collectives':
+        return fixtures.collectives_page(COLLECTIVE_SLUGS)
+    if url_class == 'collective':
+        page = int(query.get('page', ['0'])[0]) if 'tab' in query else 0
+        return fixtures.collective_page(match[1], page)
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: "_Server"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == '/_upstream/stats':
+            return self._send(200, json.dumps(self.server.snapshot()), 'application/json')
+        if parts.path == '/_upstream/reset':
+            self.server.reset()
+            return self._send(200, '{}', 'application/json')
+
+        url_class, match = classify(parts.path)
+        self.server.count(url_class)
+        options = self.server.options
+        time.sleep(options['latency'] + self.server.random.uniform(0, options['jitter']))
+        if self.server.random.random() < options['error_rate']:
+            self.server.count('errors')
+            return self._send(options['error_status'], '', 'text/html',
+                              {'Retry-After': '1'} if options['error_status'] == 429 else None)
+
+        body = self._recorded(self.path) or synthetic_page(url_class, match, parse_qs(parts.query))
+        if body is None:
+            return self._send(404, '', 'text/html')
+        self._send(200, body, 'text/html; charset=utf-8')
+
+    def _recorded(self, path_and_query: str) -> Optional[str]:
+        directory = self.server.options['recordings']
+        if not directory:
+            return None
+        path = os.path.join(directory, recording_name(path_and_query))
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def _send(self, status: int, body: str, content_type: str, headers: Optional[Dict[str, str]] = None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options: Dict):
+        super().__init__(address, _Handler)
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def handle_error(self, request, client_address):
+        # the scraper hangs up mid-body on purpose when it streams a page
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _serve(port_queue, options: Dict):
+    server = _Server(('127.0.0.1', 0), options)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeUpstream:
+    """Fake stackoverflow.com running in a child process (so it does not
+    compete with the scraper for the GIL or show up in its memory)."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, recordings: Optional[str] = None, seed: int = 0):
+        self.options = {
+            'latency': latency,
+            'jitter': jitter,
+            'error_rate': error_rate,
+            'error_status': error_status,
+            'recordings': recordings,
+            'seed': seed,
+        }
+        self.url = None
+        self._process = None
+
+    def start(self) -> "FakeUpstream":
+        context = multiprocessing.get_context('spawn')
+        port_queue = context.Queue()
+        self._process = context.Process(target=_serve, args=(port_queue, self.options), daemon=True)
+        self._process.start()
+        self.url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self) -> "FakeUpstream":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # control requests bypass http_client so they do not show up in its stats
+    def counts(self) -> Dict[str, int]:
+        with urllib.request.urlopen(f"{self.url}/_upstream/stats") as response:
+            return json.load(response)
+
+    def reset(self):
+        urllib.request.urlopen(f"{self.url}/_upstream/reset").close()
+
+
+class RedirectAdapter(http_client.PooledAdapter):
+    """Sends requests for ``ORIGIN`` to ``target`` instead."""
+
+    def __init__(self, target: str, **kwargs):
+        super().__init__(**kwargs)
+        self.target = target
+
+    def send(self, request, **kwargs):
+        request.url = self.target + request.url[len(ORIGIN):]
+        return super().send(request, **kwargs)
+
+
+def redirect(target: str):
+    """Route every ``http_client`` request for stackoverflow.com to ``target``."""
+    http_client.session.mount(ORIGIN, RedirectAdapter(target, pool_connections=http_client.POOL_CONNECTIONS,
+                                                      pool_maxsize=http_client.POOL_MAXSIZE))
+
+
+def redirect_async(target: str):
+    """``redirect`` for the ``httpx`` client of ``async_scraper``."""
+    import async_scraper
+
+    parts = urlsplit(target)
+
+    async def rewrite(request):
+        if request.url.host == urlsplit(ORIGIN).hostname:
+            request.url = request.url.copy_with(scheme=parts.scheme, host=parts.hostname, port=parts.port)
+
+    get_client = async_scraper.get_client
+
+    def redirected_client():
+        client = get_client()
+        hooks = client.event_hooks['request']
+        if rewrite not in hooks:
+            hooks.insert(0, rewrite)
+        return client
+    async_scraper.get_client = redirected_client
+
+
+def record(directory: str, urls):
+    """Save live pages so the fake upstream can serve them offline."""
+    os.makedirs(directory, exist_ok=True)
+    for url in urls:
+        parts = urlsplit(url)
+        path_and_query = parts.path + (f"?{parts.query}" if parts.query else "")
+        response = http_client.get(url)
+        response.raise_for_status()
+        with open(os.path.join(directory, recording_name(path_and_query)), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"recorded {url} ({len(response.content) // 1024}KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='save live pages for offline runs')
+    record_parser.add_argument('directory')
+    record_parser.add_argument('urls', nargs='+')
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.directory, args.urls)
+
+
+if __name__ == '__main__':
+    main()
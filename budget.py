@@ -0,0 +1,212 @@
+"""Per-API-request accounting of upstream requests.
+
+Each API request gets a ``RequestBudget`` held in the ``current_budget``
+context variable. Routes that fan out plan their fetches against it
+(``plan``), so one API call can never schedule more than
+``SCRAPER_REQUEST_BUDGET`` upstream requests, and ``http_client`` records
+every request actually sent. Both numbers are returned to the client as
+response headers.
+
+The budget also caps how long one API request may spend waiting to retry
+failed upstream requests (``SCRAPER_RETRY_BUDGET`` seconds), so a throttled
+upstream cannot stall a worker indefinitely.
+
+An API request may also carry a deadline. Upstream fetches made for it use
+the time left as their timeout and are not started once it has passed, and
+waits on sub-fetches running elsewhere (``wait_result``, ``wait_for``) give up
+at it, so the request answers with what it has instead of timing out. Such a
+partial response is marked with ``X-Partial-Results`` and never cached.
+
+Work handed to a thread pool only sees the budget when the pool runs it in
+the submitter's context, which ``ContextThreadPoolExecutor`` does.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Dict, Optional
+
+REQUEST_BUDGET = int(os.getenv('SCRAPER_REQUEST_BUDGET', 120))
+RETRY_BUDGET = float(os.getenv('SCRAPER_RETRY_BUDGET', 10))
+# Seconds an API request may take, by default and per first path segment
+# (``questions``, ``answers``, ``collectives``); 0 means no deadline
+DEADLINE = float(os.getenv('SCRAPER_DEADLINE', 30))
+MAX_DEADLINE = float(os.getenv('SCRAPER_MAX_DEADLINE', 300))
+
+
+def _parse_deadlines(spec: str) -> Dict[str, float]:
+    deadlines = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            deadlines[name.strip()] = float(value)
+    return deadlines
+
+
+DEADLINES = _parse_deadlines(os.getenv('SCRAPER_DEADLINES', 'collectives=120'))
+
+
+def route_deadline(path: str, requested: Optional[str] = None) -> Optional[float]:
+    """Deadline in seconds for an API request to ``path``: the ``requested``
+    value (a ``timeout`` query parameter) up to ``MAX_DEADLINE``, else the
+    route's configured one. None when there is none; raises ValueError for a
+    requested value that is not a positive number."""
+    if requested:
+        try:
+            seconds = float(requested)
+        except ValueError:
+            raise ValueError("timeout must be a number of seconds") from None
+        if not seconds > 0:
+            raise ValueError("timeout must be positive")
+        return min(seconds, MAX_DEADLINE)
+    seconds = DEADLINES.get(path.strip('/').split('/')[0], DEADLINE)
+    return seconds or None
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class RequestBudget:
+    def __init__(self, limit: Optional[int] = None, deadline: Optional[float] = None):
+        self.limit = REQUEST_BUDGET if limit is None else limit
+        self.planned = 0
+        self.sent = 0
+        self.skipped = 0
+        self.retries = 0
+        self.retry_seconds = 0.0
+        self.timeout = deadline
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.timed_out = 0
+        self._lock = threading.Lock()
+
+    def plan(self, requests: int = 1) -> bool:
+        """Reserve ``requests`` upstream requests; False if that would exceed the limit."""
+        with self._lock:
+            if self.planned + requests > self.limit:
+                self.skipped += requests
+                return False
+            self.planned += requests
+            return True
+
+    def record(self):
+        with self._lock:
+            self.sent += 1
+
+    def time_left(self) -> Optional[float]:
+        """Seconds until the deadline (negative once it passed), None without one."""
+        return self.deadline - time.monotonic() if self.deadline is not None else None
+
+    def record_timeout(self):
+        """Count one fetch (or wait) given up because the deadline passed."""
+        with self._lock:
+            self.timed_out += 1
+
+    def allow_retry(self, delay: float) -> bool:
+        """Reserve ``delay`` seconds of retry waiting; False once ``RETRY_BUDGET``
+        would be exceeded or the retry could not start before the deadline."""
+        time_left = self.time_left()
+        with self._lock:
+            if time_left is not None and delay >= time_left:
+                # the failed fetch is given up because of the deadline
+                self.timed_out += 1
+                return False
+            if self.retry_seconds + delay > RETRY_BUDGET:
+                return False
+            self.retries += 1
+            self.retry_seconds += delay
+            return True
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"X-Upstream-Requests": str(self.sent)}
+        if self.planned or self.skipped:
+            headers["X-Upstream-Requests-Planned"] = str(self.planned)
+            headers["X-Upstream-Budget"] = str(self.limit)
+        if self.skipped:
+            headers["X-Upstream-Requests-Skipped"] = str(self.skipped)
+        if self.retries:
+            headers["X-Upstream-Retries"] = str(self.retries)
+        if self.timeout:
+            headers["X-Upstream-Deadline"] = f"{self.timeout:g}"
+        if self.timed_out:
+            headers["X-Upstream-Timed-Out"] = str(self.timed_out)
+        if self.skipped or self.timed_out:
+            headers["X-Partial-Results"] = "true"
+        return headers
+
+
+current_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar(
+    'current_budget', default=None)
+
+
+def within_budget() -> bool:
+    """False once the current request had to skip planned work or gave up on
+    some at its deadline; such partial results should not be cached."""
+    budget = current_budget.get()
+    return budget is None or not (budget.skipped or budget.timed_out)
+
+
+def timed_out() -> bool:
+    """Whether the current request gave up on anything at its deadline."""
+    budget = current_budget.get()
+    return budget is not None and budget.timed_out > 0
+
+
+def time_left() -> Optional[float]:
+    """Seconds left before the current request's deadline (None without one)."""
+    budget = current_budget.get()
+    return budget.time_left() if budget is not None else None
+
+
+def record_timeout():
+    budget = current_budget.get()
+    if budget is not None:
+        budget.record_timeout()
+
+
+def wait_result(future: Future) -> Any:
+    """``future.result()``, giving up at the current request's deadline with
+    ``DeadlineExceeded``. The future is left alone; it may be shared."""
+    seconds = time_left()
+    try:
+        return future.result(timeout=max(seconds, 0) if seconds is not None else None)
+    except FutureTimeoutError:
+        record_timeout()
+        raise DeadlineExceeded("deadline exceeded") from None
+
+
+async def wait_for(awaitable: Awaitable[Any]) -> Any:
+    """Await ``awaitable`` until the current request's deadline; past it the
+    awaitable is cancelled and ``DeadlineExceeded`` raised."""
+    seconds = time_left()
+    if seconds is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(seconds, 0))
+    except asyncio.TimeoutError:
+        record_timeout()
+        raise DeadlineExceeded("deadline exceeded") from None
+
+
+def record_request():
+    budget = current_budget.get()
+    if budget is not None:
+        budget.record()
+
+
+def allow_retry(delay: float) -> bool:
+    """Whether the current API request may wait ``delay`` seconds to retry;
+    outside of one, only retries longer than ``RETRY_BUDGET`` are refused."""
+    budget = current_budget.get()
+    if budget is None:
+        return delay <= RETRY_BUDGET
+    return budget.allow_retry(delay)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks run in a copy of the submitting context."""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,624 @@
+"""Response cache for scraped pages and parsed results.
+
+Entries live in namespaces (``page`` for raw HTML, one per endpoint for parsed
+results), each with its own TTL. Values are pickled, so cached results cannot
+be mutated by callers and their size is known for eviction.
+
+Configured from the environment:
+
+- ``SCRAPER_CACHE_BACKEND``: ``memory`` (default), ``disk`` or ``none``
+- ``SCRAPER_CACHE_PATH``: SQLite file used by the disk backend
+- ``SCRAPER_CACHE_MAX_ENTRIES`` / ``SCRAPER_CACHE_MAX_BYTES``: LRU bounds
+- ``SCRAPER_CACHE_TTLS``: per-namespace TTL overrides, e.g. ``question=600,page=30``
+- ``SCRAPER_CACHE_STALE``: seconds past its TTL an entry of a ``cached``
+  function is still served while it is refreshed in the background
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from budget import DeadlineExceeded, wait_for, wait_result
+
+# Seconds each namespace stays fresh
+DEFAULT_TTLS: Dict[str, float] = {
+    'page': 60,
+    'questions': 60,
+    'question': 300,
+    'answer': 300,
+    'question_answers': 300,
+    'collectives': 3600,
+    'user': 86400,
+}
+FALLBACK_TTL = 60
+
+_MISSING = object()
+
+
+def _parse_ttls(spec: str) -> Dict[str, float]:
+    ttls = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            ttls[name.strip()] = float(value)
+    return ttls
+
+
+class MemoryBackend:
+    """In-process LRU bounded by entry count and total pickled size."""
+    blocking = False
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, data: bytes, expires: float) -> int:
+        """Store an entry and return how many entries were evicted to fit it."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (data, expires)
+            self._size += len(data)
+            evicted = 0
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, (old_data, _) = self._entries.popitem(last=False)
+                self._size -= len(old_data)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size}
+
+
+class DiskBackend:
+    """SQLite-backed LRU; survives restarts and can be shared between processes."""
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 100000, max_bytes: int = 1024 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_entries ("
+                         "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                         "expires REAL NOT NULL, accessed REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        conn = self._connect()
+        row = conn.execute("SELECT data, expires FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            with conn:
+                conn.execute("UPDATE cache_entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def set(self, key: str, data: bytes, expires: float) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cache_entries (key, data, size, expires, accessed) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, data, len(data), expires, time.time()))
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+            evicted = 0
+            while count > 1 and (count > self.max_entries or size > self.max_bytes):
+                row = conn.execute("SELECT key, size FROM cache_entries WHERE key != ? "
+                                   "ORDER BY accessed LIMIT 1", (key,)).fetchone()
+                if row is None:
+                    break
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (row[0],))
+                count -= 1
+                size -= row[1]
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries")
+
+    def usage(self) -> Dict[str, int]:
+        count, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        return {"entries": count, "bytes": size}
+
+
+class Cache:
+    def __init__(self, backend, ttls: Optional[Dict[str, float]] = None, stale: float = 0):
+        self.backend = backend
+        self.stale = stale
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, namespace: str, name: str, amount: int = 1):
+        if not amount:
+            return
+        with self._stats_lock:
+            counts = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "evictions": 0,
+                                                        "expired": 0, "stale": 0})
+            counts[name] += amount
+
+    def ttl(self, namespace: str) -> float:
+        return self.ttls.get(namespace, FALLBACK_TTL)
+
+    def lookup(self, namespace: str, key: str, stale: Optional[float] = None) -> Tuple[Any, bool]:
+        """(value, fresh) for an entry. Entries expired less than ``stale``
+        seconds ago (the cache's own window by default) are returned with
+        fresh=False; missing ones as ``_MISSING``."""
+        entry = self.backend.get(f"{namespace}:{key}")
+        if entry is None:
+            self._count(namespace, "misses")
+            return _MISSING, False
+        data, expires = entry
+        now = time.time()
+        if expires >= now:
+            self._count(namespace, "hits")
+            return pickle.loads(data), True
+        self._count(namespace, "expired")
+        if expires + (self.stale if stale is None else stale) >= now:
+            self._count(namespace, "stale")
+            return pickle.loads(data), False
+        self._count(namespace, "misses")
+        return _MISSING, False
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        entry = self.backend.get(f"{namespace}:{key}")
+        if entry is None:
+            self._count(namespace, "misses")
+            return default
+        data, expires = entry
+        if expires < time.time():
+            self._count(namespace, "expired")
+            self._count(namespace, "misses")
+            return default
+        self._count(namespace, "hits")
+        return pickle.loads(data)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl(namespace) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._count(namespace, "evictions", self.backend.set(f"{namespace}:{key}", data, time.time() + ttl))
+
+    def delete(self, namespace: str, key: str):
+        self.backend.delete(f"{namespace}:{key}")
+
+    @property
+    def enabled(self) -> bool:
+        """False with the ``none`` backend; concurrent misses are then not
+        shared either."""
+        return not isinstance(self.backend, NullBackend)
+
+    async def offload(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """``fn(*args, **kwargs)``, a call that reads or writes this cache, from
+        the event loop: on a thread when the backend does file I/O (disk)."""
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            namespaces = {name: dict(counts) for name, counts in self._stats.items()}
+        for counts in namespaces.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_ratio"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return {"backend": type(self.backend).__name__, **self.backend.usage(), "namespaces": namespaces}
+
+    def collect_metrics(self) -> List[metrics.Family]:
+        stats = self.get_stats()
+        namespaces = sorted(stats['namespaces'].items())
+        families = [
+            (f'scraper_cache_{name}_total', 'counter', description,
+             [({'namespace': namespace}, counts[name]) for namespace, counts in namespaces])
+            for name, description in (('hits', "Cache lookups answered by a fresh entry"),
+                                      ('misses', "Cache lookups that found no usable entry"),
+                                      ('stale', "Expired entries served while they are refreshed"),
+                                      ('evictions', "Entries evicted to stay within the cache bounds"))
+        ]
+        families.append(('scraper_cache_hit_ratio', 'gauge', "Hits over hits and misses since start",
+                         [({'namespace': namespace}, counts['hit_ratio']) for namespace, counts in namespaces]))
+        families.append(('scraper_cache_bytes', 'gauge', "Size of the cached entries", [({}, stats['bytes'])]))
+        return families
+
+
+class NullBackend:
+    """Backend used when caching is disabled."""
+    blocking = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, data, expires):
+        return 0
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def usage(self):
+        return {"entries": 0, "bytes": 0}
+
+
+def make_key(*args, **kwargs) -> str:
+    parts = [repr(arg) for arg in args]
+    parts += [f"{name}={kwargs[name]!r}" for name in sorted(kwargs)]
+    return ','.join(parts)
+
+
+def _always(result: Any) -> bool:
+    return True
+
+
+class SingleFlight:
+    """One call per key at a time: concurrent callers with the same key wait
+    for the running call and share its result (or exception).
+
+    Only results passing ``shareable`` are handed over; for the others (a
+    partial scrape, say) the waiting callers run the call themselves, as do
+    callers whose own deadline passes while they wait. ``revalidate`` runs a
+    call in the background instead, unless one with the same key is already
+    running.
+    """
+
+    def __init__(self, workers: int = 4):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='revalidate')
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """The future of the call running for ``key``, and whether the caller
+        must run it (and then ``release`` it) itself."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def release(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def wait(self, future: Future) -> Any:
+        """The result released for ``future``, or ``_MISSING`` if there is none
+        to share or the caller's deadline passed first (its budget is then
+        marked timed out)."""
+        try:
+            return wait_result(future)
+        except DeadlineExceeded:
+            return _MISSING
+
+    def do(self, key: str, fn: Callable[[], Any], shareable: Callable[[Any], bool] = _always) -> Any:
+        future, leader = self.claim(key)
+        if not leader:
+            result = self.wait(future)
+            return fn() if result is _MISSING else result
+        try:
+            result = fn()
+        except BaseException as e:
+            self.release(key, future, error=e)
+            raise
+        self.release(key, future, result if shareable(result) else _MISSING)
+        return result
+
+    def revalidate(self, key: str, fn: Callable[[], Any], shareable: Callable[[Any], bool] = _always):
+        future, leader = self.claim(key)
+        if leader:
+            self._pool.submit(self._run_claimed, key, future, fn, shareable)
+
+    def _run_claimed(self, key: str, future: Future, fn: Callable[[], Any], shareable: Callable[[Any], bool]):
+        try:
+            result = fn()
+        except Exception as e:
+            logging.warning(f"Background refresh of {key} failed: {str(e)}")
+            self.release(key, future, error=e)
+            return
+        self.release(key, future, result if shareable(result) else _MISSING)
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of ``SingleFlight``, for the ASGI app's event loop.
+
+    A call that fails or is cancelled hands nothing over: the waiting callers
+    run it themselves.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        # background refreshes, referenced until they finish
+        self._tasks = set()
+
+    def claim(self, key: str) -> Tuple[asyncio.Future, bool]:
+        future = self._calls.get(key)
+        if future is not None:
+            return future, False
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        return future, True
+
+    def release(self, key: str, future: asyncio.Future, result: Any = None):
+        self._calls.pop(key, None)
+        if not future.done():
+            future.set_result(result)
+
+    async def wait(self, future: asyncio.Future) -> Any:
+        try:
+            # shield so a caller giving up doesn't cancel the future others wait on
+            return await wait_for(asyncio.shield(future))
+        except DeadlineExceeded:
+            return _MISSING
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]],
+                 shareable: Callable[[Any], bool] = _always) -> Any:
+        future, leader = self.claim(key)
+        if not leader:
+            result = await self.wait(future)
+            return await fn() if result is _MISSING else result
+        try:
+            result = await fn()
+        except BaseException:
+            self.release(key, future, _MISSING)
+            raise
+        self.release(key, future, result if shareable(result) else _MISSING)
+        return result
+
+    def revalidate(self, key: str, fn: Callable[[], Awaitable[Any]], shareable: Callable[[Any], bool] = _always):
+        future, leader = self.claim(key)
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._tasks.add(task)
+            task.add_done_callback(functools.partial(self._revalidated, key, future, shareable))
+
+    def _revalidated(self, key: str, future: asyncio.Future, shareable: Callable[[Any], bool], task: asyncio.Future):
+        self._tasks.discard(task)
+        if task.cancelled():
+            self.release(key, future, _MISSING)
+        elif task.exception() is not None:
+            logging.warning(f"Background refresh of {key} failed: {str(task.exception())}")
+            self.release(key, future, _MISSING)
+        else:
+            result = task.result()
+            self.release(key, future, result if shareable(result) else _MISSING)
+
+
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+
+
+def cached(namespace: str, key: Callable[..., str] = make_key,
+           should_cache: Callable[[Any], bool] = bool):
+    """Cache a function's results in ``namespace``, keyed on its arguments.
+
+    Works for plain and ``async`` functions. Only results for which
+    ``should_cache`` is true are stored, so errors and empty scrapes are retried.
+    Concurrent misses for one key share a single call, and its result if it
+    would be cached (with the ``none`` backend each caller runs its own). An entry that expired
+    less than ``stale`` seconds ago is still returned while a background call
+    refreshes it. ``refresh(*args, **kwargs)`` on the wrapper recomputes and
+    stores a result without reading the cache, e.g. to renew an entry before
+    it expires.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            async def async_refresh(*args, **kwargs):
+                value = await func(*args, **kwargs)
+                if should_cache(value):
+                    await default_cache.offload(default_cache.set, namespace, key(*args, **kwargs), value)
+                return value
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key(*args, **kwargs)
+                value, fresh = await default_cache.offload(default_cache.lookup, namespace, cache_key)
+                if value is _MISSING:
+                    if not default_cache.enabled:
+                        return await func(*args, **kwargs)
+                    return await _async_flights.do(f"{namespace}:{cache_key}",
+                                                   lambda: async_refresh(*args, **kwargs), should_cache)
+                if not fresh:
+                    _async_flights.revalidate(f"{namespace}:{cache_key}", lambda: async_refresh(*args, **kwargs),
+                                              should_cache)
+                return value
+            async_wrapper.refresh = async_refresh
+            return async_wrapper
+
+        def refresh(*args, **kwargs):
+            value = func(*args, **kwargs)
+            if should_cache(value):
+                default_cache.set(namespace, key(*args, **kwargs), value)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            value, fresh = default_cache.lookup(namespace, cache_key)
+            if value is _MISSING:
+                if not default_cache.enabled:
+                    return func(*args, **kwargs)
+                return _flights.do(f"{namespace}:{cache_key}", lambda: refresh(*args, **kwargs), should_cache)
+            if not fresh:
+                _flights.revalidate(f"{namespace}:{cache_key}", lambda: refresh(*args, **kwargs), should_cache)
+            return value
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
+
+
+def cached_iter(namespace: str, key: Callable[..., str] = make_key,
+                should_cache: Callable[[Any], bool] = bool):
+    """``cached`` for generators (plain or ``async``).
+
+    A hit replays the cached list; a miss yields items as the generator
+    produces them and caches the full list once it has been exhausted, so a
+    consumer that stops early caches nothing. Concurrent misses for one key
+    run the generator once: the other callers wait for its full list and
+    replay it (or run the generator themselves if the first consumer stopped
+    early or failed, if its list would not be cached, or if their own deadline
+    passes first). Stale entries are replayed while a background refresh
+    runs. Shares entries with a ``cached`` function using the same namespace
+    and key. ``refresh`` runs the generator to the end, stores its items and
+    returns them as a list.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            async def async_refresh(*args, **kwargs):
+                items = [item async for item in func(*args, **kwargs)]
+                if should_cache(items):
+                    await default_cache.offload(default_cache.set, namespace, key(*args, **kwargs), items)
+                return items
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key(*args, **kwargs)
+                flight_key = f"{namespace}:{cache_key}"
+                items, fresh = await default_cache.offload(default_cache.lookup, namespace, cache_key)
+                leader = False
+                if items is _MISSING:
+                    if default_cache.enabled:
+                        future, leader = _async_flights.claim(flight_key)
+                        if not leader:
+                            items = await _async_flights.wait(future)
+                elif not fresh:
+                    _async_flights.revalidate(flight_key, lambda: async_refresh(*args, **kwargs), should_cache)
+                if items is not _MISSING:
+                    for item in items:
+                        yield item
+                    return
+
+                items = []
+                try:
+                    async for item in func(*args, **kwargs):
+                        items.append(item)
+                        yield item
+                except BaseException:
+                    if leader:
+                        _async_flights.release(flight_key, future, _MISSING)
+                    raise
+                cacheable = should_cache(items)
+                if cacheable:
+                    await default_cache.offload(default_cache.set, namespace, cache_key, items)
+                if leader:
+                    _async_flights.release(flight_key, future, items if cacheable else _MISSING)
+            async_wrapper.refresh = async_refresh
+            return async_wrapper
+
+        def refresh(*args, **kwargs):
+            items = list(func(*args, **kwargs))
+            if should_cache(items):
+                default_cache.set(namespace, key(*args, **kwargs), items)
+            return items
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            flight_key = f"{namespace}:{cache_key}"
+            items, fresh = default_cache.lookup(namespace, cache_key)
+            leader = False
+            if items is _MISSING:
+                if default_cache.enabled:
+                    future, leader = _flights.claim(flight_key)
+                    if not leader:
+                        items = _flights.wait(future)
+            elif not fresh:
+                _flights.revalidate(flight_key, lambda: refresh(*args, **kwargs), should_cache)
+            if items is not _MISSING:
+                yield from items
+                return
+
+            items = []
+            try:
+                for item in func(*args, **kwargs):
+                    items.append(item)
+                    yield item
+            except BaseException:
+                if leader:
+                    _flights.release(flight_key, future, _MISSING)
+                raise
+            cacheable = should_cache(items)
+            if cacheable:
+                default_cache.set(namespace, cache_key, items)
+            if leader:
+                _flights.release(flight_key, future, items if cacheable else _MISSING)
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
+
+
+def _build_default_cache() -> Cache:
+    backend_name = os.getenv('SCRAPER_CACHE_BACKEND', 'memory')
+    max_entries = os.getenv('SCRAPER_CACHE_MAX_ENTRIES')
+    max_bytes = os.getenv('SCRAPER_CACHE_MAX_BYTES')
+    limits = {}
+    if max_entries:
+        limits['max_entries'] = int(max_entries)
+    if max_bytes:
+        limits['max_bytes'] = int(max_bytes)
+
+    if backend_name == 'disk':
+        backend = DiskBackend(os.getenv('SCRAPER_CACHE_PATH', 'scraper_cache.sqlite3'), **limits)
+    elif backend_name == 'none':
+        backend = NullBackend()
+    else:
+        backend = MemoryBackend(**limits)
+    return Cache(backend, _parse_ttls(os.getenv('SCRAPER_CACHE_TTLS', '')),
+                 float(os.getenv('SCRAPER_CACHE_STALE', 300)))
+
+
+default_cache = _build_default_cache()
+metrics.register(default_cache.collect_metrics)
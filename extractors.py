@@ -0,0 +1,794 @@
+"""Declarative extractors for every record the scraper reads off a page.
+
+A record type (question summary, question page, answer, owner card,
+collective, ...) is declared once as a ``Record``: named fields, each a
+``Selector`` compiled when the module loads, plus a ``build`` function turning
+what the fields matched into the record. ``Record.extract`` finds all fields
+of a record in a single walk over its element: every descendant is tested
+against the fields still looking for a match, instead of one ``find`` /
+``find_all`` tree walk per field. A field can itself be a record (the owner
+card of an answer, the answers of a page); its fields are then tested, in the
+same walk, only against the matched element's descendants.
+
+Selectors take a small subset of CSS: ``tag``, ``.class`` (every listed class
+token must be present), ``#id``, ``[attr]`` and ``[attr=value]`` (or
+``[attr="quoted value"]``), with ``,`` separating alternatives. An attribute
+value matches like ``find(attr=value)`` does: equal to a single token of a
+multi-valued attribute or to all of it, so ``[class="a b"]`` is
+``find(class_="a b")``.
+
+Both apps run the ``extract_*`` functions below, which take a page's HTML and
+return plain records, through ``parsing.run_parser``. The ``parse_*``
+functions do the same from an already built tree. Every record type is in
+``RECORDS`` by name.
+"""
+import logging
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+from metrics import timed
+from models import Answer, Collective, ExternalLink, Question, ShallowUser, epoch
+from parsing import make_soup, only
+
+# The parts of each page type that the records below read
+COLLECTIVES_PAGE_ONLY = only(classes=["flex--item s-card bs-sm mb12 py16 fc-black-500"])
+COLLECTIVE_TAGS_ONLY = only(classes=["post-tag"])
+EXTERNAL_LINKS_ONLY = only(classes=["s-select"])
+LISTING_PAGE_ONLY = only(classes=["s-post-summary", "s-badge"])
+ACCEPTED_ANSWER_ONLY = only(classes=["answer", "accepted-answer", "js-accepted-answer"])
+QUESTION_DETAILS_ONLY = only(ids=["question"], classes=["answer", "accepted-answer", "js-accepted-answer",
+                                                        "d-flex fw-wrap pb8 mb16 bb bc-black-075"])
+QUESTION_PAGE_ONLY = only(ids=["question-header", "mainbar"], classes=["d-flex fw-wrap pb8 mb16 bb bc-black-075"])
+
+_SELECTOR_PART = re.compile(r'''\.([\w-]+)|\#([\w-]+)|\[([\w-]+)(?:=(?:"([^"]*)"|'([^']*)'|([^\]]*)))?\]''')
+_TAG_NAME = re.compile(r'[\w-]+')
+_ALTERNATIVES = re.compile(r''',\s*(?=(?:[^"']*["'][^"']*["'])*[^"']*$)''')
+
+
+def _attribute_matches(value: Any, wanted: Optional[str]) -> bool:
+    if value is None:
+        return False
+    if wanted is None:
+        return True
+    if isinstance(value, str):
+        return value == wanted
+    return wanted in value or ' '.join(value) == wanted
+
+
+class Selector:
+    """One compiled selector; see the module docstring for the syntax."""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        self.alternatives: List[Tuple[Optional[str], frozenset, Tuple[Tuple[str, Optional[str]], ...]]] = []
+        for alternative in _ALTERNATIVES.split(spec.strip()):
+            name_match = _TAG_NAME.match(alternative)
+            name = name_match.group() if name_match else None
+            position = name_match.end() if name_match else 0
+            classes, attributes = set(), []
+            while position < len(alternative):
+                part = _SELECTOR_PART.match(alternative, position)
+                if part is None:
+                    raise ValueError(f"unsupported selector {spec!r}")
+                class_name, element_id, attribute = part.group(1, 2, 3)
+                if class_name:
+                    classes.add(class_name)
+                elif element_id:
+                    attributes.append(('id', element_id))
+                else:
+                    value = next((group for group in part.group(4, 5, 6) if group is not None), None)
+                    attributes.append((attribute, value))
+                position = part.end()
+            self.alternatives.append((name, frozenset(classes), tuple(attributes)))
+        # tag names this selector can match; None when it matches any tag
+        names = {name for name, _, _ in self.alternatives}
+        self.names = None if None in names else frozenset(names)
+
+    def matches(self, element: Tag) -> bool:
+        for name, classes, attributes in self.alternatives:
+            if name is not None and element.name != name:
+                continue
+            if classes:
+                value = element.get('class')
+                if not value:
+                    continue
+                if isinstance(value, str):
+                    value = value.split()
+                if not classes.issubset(value):
+                    continue
+            if attributes and not all(_attribute_matches(element.get(attribute), wanted)
+                                      for attribute, wanted in attributes):
+                continue
+            return True
+        return False
+
+    def __repr__(self):
+        return f"Selector({self.spec!r})"
+
+
+class Field:
+    """The first element matching ``selector`` (every one with ``many``).
+
+    The field's value is ``read(element)``, or the element itself; when
+    ``read`` is a ``Record`` the value is that record extracted from the
+    element. ``test`` can narrow the match further, e.g. on the element's text.
+    """
+
+    def __init__(self, selector: str, read: Optional[Callable[[Tag], Any]] = None, many: bool = False,
+                 test: Optional[Callable[[Tag], bool]] = None):
+        self.selector = Selector(selector)
+        self.read = read
+        self.many = many
+        self.test = test
+
+    def matches(self, element: Tag) -> bool:
+        return self.selector.matches(element) and (self.test is None or self.test(element))
+
+
+def first(selector: str, read: Optional[Callable[[Tag], Any]] = None,
+          test: Optional[Callable[[Tag], bool]] = None) -> Field:
+    return Field(selector, read, test=test)
+
+
+def each(selector: str, read: Optional[Callable[[Tag], Any]] = None) -> Field:
+    return Field(selector, read, many=True)
+
+
+def text(element: Tag) -> str:
+    return element.text
+
+
+def stripped_text(element: Tag) -> str:
+    return element.text.strip()
+
+
+class Record:
+    """A record type: its fields and how they are built into the record.
+
+    ``build(values, element)`` gets each field's value by name (None, or an
+    empty list for ``many`` fields, when nothing matched) and the element the
+    record was extracted from.
+    """
+
+    def __init__(self, name: str, build: Optional[Callable[[Dict[str, Any], Tag], Any]] = None, /, **fields: Field):
+        self.name = name
+        self.fields = fields
+        self.build = build or (lambda values, element: values)
+        # fields by the tag name they can match, so a descendant is only tested
+        # against the few that could match it
+        self._by_name: Dict[str, List[Tuple[str, Field]]] = {}
+        self._any_name: List[Tuple[str, Field]] = []
+        for field_name, field in fields.items():
+            if field.selector.names is None:
+                self._any_name.append((field_name, field))
+            else:
+                for tag_name in field.selector.names:
+                    self._by_name.setdefault(tag_name, []).append((field_name, field))
+        for candidates in self._by_name.values():
+            candidates.extend(self._any_name)
+
+    def extract(self, element: Tag) -> Any:
+        with timed('extract'):
+            state = _State(self, element)
+            _walk(element, [state])
+            return state.finish()
+
+    def extract_all(self, elements) -> List[Any]:
+        return [self.extract(element) for element in elements]
+
+    def __repr__(self):
+        return f"Record({self.name!r})"
+
+
+class _State:
+    """One record being extracted: the values found so far."""
+
+    __slots__ = ('record', 'element', 'values', 'found')
+
+    def __init__(self, record: Record, element: Tag):
+        self.record = record
+        self.element = element
+        self.values: Dict[str, Any] = {name: [] if field.many else None for name, field in record.fields.items()}
+        self.found = set()
+
+    def candidates(self, element: Tag) -> List[Tuple[str, Field]]:
+        return self.record._by_name.get(element.name, self.record._any_name)
+
+    def put(self, name: str, field: Field, value: Any) -> Optional[int]:
+        """Set the field's value; for ``many`` fields, returns its index in the list."""
+        if field.many:
+            self.values[name].append(value)
+            return len(self.values[name]) - 1
+        self.values[name] = value
+        return None
+
+    def fill(self, name: str, index: Optional[int], value: Any):
+        if index is None:
+            self.values[name] = value
+        else:
+            self.values[name][index] = value
+
+    def finish(self) -> Any:
+        return self.record.build(self.values, self.element)
+
+
+def _walk(node: Tag, active: List[_State]):
+    for child in node.contents:
+        if not isinstance(child, Tag):
+            continue
+        opened = None
+        for state in active:
+            for name, field in state.candidates(child):
+                if name in state.found or not field.matches(child):
+                    continue
+                if not field.many:
+                    state.found.add(name)
+                if isinstance(field.read, Record):
+                    # extracted from the element's descendants in this same walk;
+                    # its place is taken now so records keep document order
+                    # even when one ends up nested in the previous one
+                    if opened is None:
+                        opened = []
+                    opened.append((state, name, state.put(name, field, None), _State(field.read, child)))
+                else:
+                    state.put(name, field, field.read(child) if field.read else child)
+        if opened is None:
+            _walk(child, active)
+        else:
+            _walk(child, active + [nested for _, _, _, nested in opened])
+            for state, name, index, nested in opened:
+                state.fill(name, index, nested.finish())
+
+
+RECORDS: Dict[str, Record] = {}
+
+
+def record(name: str, build: Optional[Callable[[Dict[str, Any], Tag], Any]] = None, /,
+           **fields: Field) -> Record:
+    """Declare the record type ``name`` and add it to ``RECORDS``."""
+    declared = RECORDS[name] = Record(name, build, **fields)
+    return declared
+
+
+def extract(name: str, element: Tag) -> Any:
+    return RECORDS[name].extract(element)
+
+
+def within(field: Field) -> Record:
+    """The record of one ``field``, matched inside the element of the enclosing field."""
+    return Record(field.selector.spec, lambda values, element: values['value'], value=field)
+
+
+def _attribute(element: Optional[Tag], name: str) -> Optional[str]:
+    return element.get(name) if element is not None else None
+
+
+def _user_id(user_link: Optional[str]) -> Optional[int]:
+    parts = user_link.split('/') if user_link else []
+    user_id = parts[-2] if len(parts) > 1 else None
+    return int(user_id) if user_id and user_id.isdigit() else None
+
+
+def _missing_owner() -> ShallowUser:
+    return ShallowUser(user_type="does_not_exist", display_name="User does not exist", link=None, reputation="0")
+
+
+def _card_owner(card: Dict[str, Any], **fields: Any) -> ShallowUser:
+    """The owner read from a post's owner card (see ``OWNER_CARD``)."""
+    href = card['href']
+    return ShallowUser(user_id=_user_id(href),
+                       user_type=card['user_type'],
+                       profile_image=card['profile_image'],
+                       display_name=card['display_name'].strip() if card['display_name'] is not None else None,
+                       link=f"https://stackoverflow.com{href}" if href else None,
+                       reputation=card['reputation'] if card['reputation'] is not None else "1",
+                       **fields)
+
+
+# Collectives: /collectives-all, a collective's tags tab and its external links
+
+def _collective(values: Dict[str, Any], element: Tag) -> Collective:
+    name_elem = values['name']
+    href = _attribute(name_elem, 'href')
+    return Collective(
+        name=name_elem.text.strip() if name_elem is not None else "No name found",
+        link=href if href is not None else "",
+        description=values['description'] if values['description'] is not None else "No description found",
+        slug=href.split('/')[-1] if href is not None else "No slug found",
+        tags=[],
+        external_links=[]
+    )
+
+
+COLLECTIVE = record('collective', _collective,
+                    name=first('a.js-gps-track'),
+                    description=first('span[class="fs-body1 v-truncate2 ow-break-word"]', stripped_text))
+COLLECTIVES_PAGE = record('collectives_page', lambda values, element: values['collectives'],
+                          collectives=each('div[class="flex--item s-card bs-sm mb12 py16 fc-black-500"]', COLLECTIVE))
+COLLECTIVE_TAGS = record('collective_tags', lambda values, element: values['tags'],
+                         tags=each('a[class="s-tag post-tag"]', text))
+# data-url of each option under "External links" in the first s-select; None
+# without that group
+EXTERNAL_LINKS = record('external_links', lambda values, element: values['select'],
+                        select=first('div.s-select', within(first('optgroup[label="External links"]', within(
+                            each('option', lambda option: option.get('data-url')))))))
+
+EXTERNAL_LINK_TYPES = ["website", "support", "twitter", "github", "facebook", "instagram"]
+
+
+def parse_collectives(soup: BeautifulSoup) -> List[Collective]:
+    """Read name/link/description/slug of every collective on /collectives-all."""
+    return COLLECTIVES_PAGE.extract(soup)
+
+
+def parse_collective_tags(soup: BeautifulSoup) -> List[str]:
+    return COLLECTIVE_TAGS.extract(soup)
+
+
+def parse_external_links(soup: BeautifulSoup, url: str) -> List[ExternalLink]:
+    external_links = []
+    # the options are typed by position
+    for link_type, link in zip(EXTERNAL_LINK_TYPES, EXTERNAL_LINKS.extract(soup) or []):
+        external_link = ExternalLink(type=link_type, link=link)
+        if link:
+            external_links.append(external_link)
+            logging.debug(f"External link: {external_link}")
+
+    if not external_links:
+        logging.debug(f"No relevant external links found for {url}")
+
+    return external_links
+
+
+def extract_collectives(html: str) -> List[Collective]:
+    return parse_collectives(make_soup(html, COLLECTIVES_PAGE_ONLY))
+
+
+def extract_collective_tags(html: str) -> List[str]:
+    return parse_collective_tags(make_soup(html, COLLECTIVE_TAGS_ONLY))
+
+
+def extract_external_links(html: str, url: str) -> List[ExternalLink]:
+    return parse_external_links(make_soup(html, EXTERNAL_LINKS_ONLY), url)
+
+
+# Owner cards: the user-info block of a post's signature and the s-user-card
+# of a listing summary
+
+def _owner_card(values: Dict[str, Any], element: Tag) -> Dict[str, Any]:
+    user_type = "registered"
+    if values['new_contributor'] is not None:
+        user_type = "new contributor"
+    elif values['moderator'] is not None:
+        user_type = "moderator"
+    return {
+        "href": _attribute(values['link'], 'href'),
+        "user_type": user_type,
+        "profile_image": _attribute(values['image'], 'src'),
+        "display_name": values['display_name'],
+        "reputation": values['reputation'],
+    }
+
+
+OWNER_CARD = record('owner_card', _owner_card,
+                    link=first('a'),
+                    image=first('img'),
+                    reputation=first('span.reputation-score', stripped_text),
+                    display_name=first('div.user-details', within(first('a', text))),
+                    new_contributor=first('.new-contributor-indicator'),
+                    moderator=first('.mod-flair'))
+# The right-hand column of a post; its owner card is None when it has none
+POST_LAYOUT = Record('post_layout', owner=first('div.user-info', OWNER_CARD))
+
+SUMMARY_OWNER_CARD = record('summary_owner_card', lambda values, element: values,
+                            href=first('div[class="s-user-card--link d-flex gs4"]', within(
+                                first('a', lambda link: link.get('href')))),
+                            profile_image=first('img.s-avatar--image', lambda image: image.get('src')),
+                            reputation=first('span[title="reputation score "]',
+                                             lambda span: span.get_text(strip=True)))
+
+
+# Listing pages: /questions and /questions/tagged/...
+
+def _view_count(value: str) -> int:
+    if 'k' in value.lower():
+        return int(float(value.lower().replace('k', '').strip()) * 1000)
+    return int(re.sub(r'\D', '', value))
+
+
+def _question_summary(values: Dict[str, Any], element: Tag) -> Dict[str, Any]:
+    """A listing entry: the partially filled ``question`` plus what is needed
+    to enrich it (see ``parse_question_summaries``)."""
+    question = Question()
+    user_link = None
+    accepted_url = None
+
+    question.tags = values['tags']
+
+    # Owner information
+    card = values['owner']
+    if card is not None:
+        user_link = card['href']
+        question.owner = ShallowUser(
+            user_id=_user_id(user_link),
+            # set from the page's badge by parse_question_summaries
+            user_type="registered",
+            profile_image=card['profile_image'],
+            display_name=user_link.split('/')[-1] if user_link else "Anonymous",
+            link=f"https://stackoverflow.com{user_link}" if user_link else None,
+            reputation=card['reputation'] if card['reputation'] is not None else "0"
+        )
+    else:
+        question.owner = _missing_owner()
+
+    # Question ID and link
+    summary_date = None
+    question_link = values['title']
+    if question_link is not None and question_link.has_attr('href'):
+        question.question_id = int(question_link['href'].split('/')[2])
+        question.link = f"https://stackoverflow.com{question_link['href']}"
+
+        question.title = question_link.text
+
+        # Fallback if dates are not found in the timeline
+        date_span = values['date']
+        summary_date = date_span["title"] if date_span is not None and "title" in date_span.attrs else None
+
+    else:
+        question.question_id = None
+        question.link = None
+        question.title = None
+        question.creation_date = None
+        question.closed_date = None
+        question.last_edit_date = None
+        question.last_activity_date = None
+
+    # Content license extraction
+    link = values['share_link']
+    if link is not None and "data-se-share-sheet-license-name" in link.attrs:
+        question.content_license = link["data-se-share-sheet-license-name"]
+    else:
+        # Fallback to the summary's meta text
+        license_text = values['meta_text']
+        if license_text is None:
+            question.content_license = "CC BY-SA 4.0"  # Default if not found
+        elif "CC BY-SA 4.0" in license_text:
+            question.content_license = "CC BY-SA 4.0"
+        elif "CC BY-SA 3.0" in license_text:
+            question.content_license = "CC BY-SA 3.0"
+        else:
+            question.content_license = license_text
+
+    # Stats extraction
+    if values['stats'] is not None:
+        # If any stat is missing, it is 0
+        question.score = question.answer_count = question.view_count = 0
+        for title, value in values['stats']:
+            if value is not None:
+                if "Score" in title:
+                    question.score = int(value)
+                elif "answer" in title.lower():
+                    question.answer_count = int(value)
+                elif "view" in title.lower():
+                    question.view_count = _view_count(value)
+    else:
+        logging.debug("Stats container not found")
+
+    question.is_answered = question.get('score', 0) > 0
+
+    if values['accepted'] is not None:
+        if question_link is not None and question_link.has_attr('href'):
+            accepted_url = f"https://stackoverflow.com{question_link['href']}"
+        else:
+            logging.debug("No question link found")
+    else:
+        logging.debug("No accepted answer indicator found in summary")
+
+    return {
+        "question": question,
+        "user_link": user_link,
+        "summary_date": summary_date,
+        "accepted_url": accepted_url,
+    }
+
+
+QUESTION_SUMMARY = record(
+    'question_summary', _question_summary,
+    tags=each('a.post-tag', text),
+    owner=first('div.s-user-card', SUMMARY_OWNER_CARD),
+    title=first('h3.s-post-summary--content-title', within(first('a'))),
+    date=first('span.relativetime'),
+    share_link=first('a.js-share-link, a.js-gps-track'),
+    meta_text=first('div.s-post-summary--meta', within(first('div.s-post-summary--meta-text',
+                                                            lambda meta: meta.get_text(strip=True)))),
+    # (title, number) of each stats item
+    stats=first('div.s-post-summary--stats', within(each('div.s-post-summary--stats-item', Record(
+        'stats_item', lambda values, item: (item.get('title', ''), values['number']),
+        number=first('span.s-post-summary--stats-item-number', stripped_text))))),
+    accepted=first('div[class="s-post-summary--stats-item has-answers has-accepted-answer"]'),
+)
+LISTING_PAGE = record('listing_page',
+                      summaries=each('div.s-post-summary', QUESTION_SUMMARY),
+                      # the user type badge is page-wide
+                      badge=first('div.s-badge', text))
+
+
+def parse_question_summaries(soup: BeautifulSoup, tag_list: List[str]) -> List[Dict[str, Any]]:
+    """Parse every s-post-summary on a listing page.
+
+    Each entry holds the partially filled ``question`` plus what is needed to
+    enrich it: the owner's ``user_link``, the ``summary_date`` used when the
+    timeline has no dates, and ``accepted_url`` when the question has an
+    accepted answer. ``complete_question`` merges the enrichments back in.
+    """
+    listing = LISTING_PAGE.extract(soup)
+    user_status = {"Moderator": "moderator", "Unregistered": "unregistered"}.get(listing['badge'], "registered")
+    wanted_tags = {tag.lower() for tag in tag_list}
+
+    entries = []
+    for entry in listing['summaries']:
+        question = entry['question']
+        # Filter by specified tags
+        if wanted_tags and not wanted_tags.issubset(tag.lower() for tag in question.tags):
+            continue  # Skip this question if it doesn't match all specified tags
+        if question.owner.user_type == "registered":
+            question.owner.user_type = user_status
+        entries.append(entry)
+    return entries
+
+
+def extract_question_summaries(html: str, tag_list: List[str]) -> List[Dict[str, Any]]:
+    return parse_question_summaries(make_soup(html, LISTING_PAGE_ONLY), tag_list)
+
+
+# Question pages: /questions/<id> and, for its answers, /a/<id>
+
+def _datetime_attribute(element: Tag) -> Optional[str]:
+    return element.get('datetime')
+
+
+QUESTION_PAGE = record(
+    'question_page',
+    title=first('h1[class="fs-headline1 ow-break-word mb8 flex--item fl1"]', stripped_text),
+    tags=first('div[class="d-flex ps-relative fw-wrap"]', within(each('a.post-tag', text))),
+    layout=first('div.post-layout--right', POST_LAYOUT),
+    creation_date=first('time[itemprop=dateCreated]', _datetime_attribute),
+    last_activity=first('time[itemprop=dateModified]', _datetime_attribute),
+    license_footer=first('div[class="mt-auto d-flex jc-space-between fs-caption fc-black-400"]',
+                         within(first('a[rel=license]', text))),
+    score=first('div.js-vote-count', text),
+    answers_header=first('h2.mb0', test=lambda h2: h2.string is not None and "Answers" in h2.string),
+    header=first('div[class="d-flex fw-wrap pb8 mb16 bb bc-black-075"]',
+                 within(first('div[class="flex--item ws-nowrap mb8"]', stripped_text))),
+    accepted=first('div[class="answer accepted-answer"]'),
+)
+
+
+def parse_question_page(soup: BeautifulSoup, question_id: int, url: str) -> Question:
+    values = QUESTION_PAGE.extract(soup)
+
+    # Question ID and link
+    question = Question(question_id=question_id, link=url)
+
+    question.title = values['title']
+    question.tags = values['tags'] or []
+
+    # Owner information
+    layout = values['layout']
+    if layout is None:
+        question.owner = None
+    elif layout['owner'] is None:
+        question.owner = _missing_owner()
+    else:
+        question.owner = _card_owner(layout['owner'])
+
+    # Dates
+    question.creation_date = epoch(values['creation_date'])
+    question.last_activity = epoch(values['last_activity'])
+
+    question.last_edit_date = None  # Set default value
+    question.closed_date = None  # Set default value
+
+    # Content license
+    license_footer = values['license_footer']
+    question.content_license = license_footer if license_footer is not None else "CC BY-SA 4.0"
+
+    # Stats
+    question.score = int(values['score']) if values['score'] is not None else 0
+
+    answers_header = values['answers_header']
+    question.answer_count = int(answers_header.find_next("div").text) if answers_header is not None else 0
+
+    # View count
+    view_count_match = re.search(r'(\d+)', values['header'] or '')
+    question.view_count = int(view_count_match.group(1)) if view_count_match else 0
+
+    # Is answered and accepted answer
+    accepted_answer = values['accepted']
+    question.is_answered = accepted_answer is not None or question.answer_count > 0
+    question.has_accepted_answer = accepted_answer is not None
+
+    return question
+
+
+def extract_question_page(html: str, question_id: int, url: str) -> Question:
+    return parse_question_page(make_soup(html, QUESTION_PAGE_ONLY), question_id, url)
+
+
+ANSWER = record(
+    'answer', lambda values, element: dict(values, answer_id=element.get('data-answerid'),
+                                           is_accepted='accepted-answer' in element.get('class', [])),
+    score=first('div.js-vote-count', text),
+    creation_date=first('time[itemprop=dateCreated]', _datetime_attribute),
+    last_activity_date=first('time[itemprop=dateModified]', _datetime_attribute),
+    edit_time=first('div[class="grid--cell ws-nowrap mr16 mb8"]', within(first('time', _datetime_attribute))),
+    layout=first('div.post-layout--right', POST_LAYOUT),
+)
+ANSWERS_PAGE = record('answers_page', lambda values, element: values['answers'],
+                      answers=each('div.answer', ANSWER))
+
+
+def parse_answers(soup: BeautifulSoup) -> List[Tuple[Answer, Optional[str]]]:
+    """Parse the answers on the page behind /a/<id>.
+
+    Returns (answer, user_href) pairs; the owner's account_id is still unset
+    and is filled in from the profile page at ``user_href``.
+    """
+    answers = []
+    for values in ANSWERS_PAGE.extract(soup):
+        user_href = None
+        answer = Answer(answer_id=values['answer_id'],
+                        score=int(values['score']) if values['score'] is not None else 0,
+                        is_accepted=values['is_accepted'],
+                        creation_date=epoch(values['creation_date']),
+                        last_activity_date=epoch(values['last_activity_date']))
+
+        # Owner information
+        layout = values['layout']
+        if layout is not None:
+            card = layout['owner']
+            if card is None:
+                answer.owner = None
+            elif card['href'] is not None:
+                user_href = card['href']
+                answer.owner = _card_owner(card, account_id=None)
+            else:
+                answer.owner = _missing_owner()
+
+        answers.append((answer, user_href))
+
+    return answers
+
+
+def extract_answers(html: str) -> List[Tuple[Answer, Optional[str]]]:
+    return parse_answers(make_soup(html, QUESTION_PAGE_ONLY))
+
+
+def _question_answer(values: Dict[str, Any]) -> Tuple[Answer, Optional[str]]:
+    """One answer for /questions/<id>/answers, as (answer, user_href)."""
+    user_href = None
+    answer = Answer(answer_id=values['answer_id'],
+                    score=int(values['score']) if values['score'] is not None else 0,
+                    is_accepted=values['is_accepted'],
+                    creation_date=epoch(values['creation_date']),
+                    last_activity_date=epoch(values['edit_time']))
+
+    # Owner information
+    layout = values['layout']
+    if layout is None:
+        answer.owner = None
+    elif layout['owner'] is None:
+        answer.owner = _missing_owner()
+    else:
+        user_href = layout['owner']['href']
+        answer.owner = _card_owner(layout['owner'], account_id=None)
+
+    return answer, user_href
+
+
+QUESTION_ANSWERS_PAGE = record(
+    'question_answers_page',
+    # the question's content license, when its post menu shows one
+    question=first('div#question', Record('answers_question', license=first(
+        'div.post-menu', within(first('a.js-license-link', stripped_text))))),
+    answers=each('div.answer', ANSWER),
+)
+
+
+def parse_question_answers(soup: BeautifulSoup, question_id: int
+                           ) -> Optional[Tuple[Question, List[Tuple[Answer, Optional[str]]]]]:
+    """The question (with no answers yet) and its (answer, user_href) pairs; None
+    when the page shows no question. An answer that fails to parse is left out."""
+    values = QUESTION_ANSWERS_PAGE.extract(soup)
+    if values['question'] is None:
+        return None
+
+    question = Question(question_id=question_id, answers=[])
+    if values['question']['license'] is not None:
+        question.content_license = values['question']['license']
+
+    logging.debug(f"Found {len(values['answers'])} answer elements")
+    parsed = []
+    for answer in values['answers']:
+        try:
+            parsed.append(_question_answer(answer))
+        except Exception as e:
+            logging.error(f"Error processing an answer: {str(e)}", exc_info=True)
+    return question, parsed
+
+
+def extract_question_answers(html: str, question_id: int
+                             ) -> Optional[Tuple[Question, List[Tuple[Answer, Optional[str]]]]]:
+    return parse_question_answers(make_soup(html, QUESTION_PAGE_ONLY), question_id)
+
+
+# The accepted answer and the dates a question page shows, read for listing
+# entries (see ``stackoverflow_scraper.fetch_question_details``)
+
+# Tried in this order
+ACCEPTED_ANSWER_FIELDS = {
+    'accepted': first('div.answer.accepted-answer'),
+    'accepted_itemprop': first('div[itemprop=acceptedAnswer]'),
+    'accepted_class': first('div.accepted-answer'),
+    'accepted_js': first('div.js-accepted-answer'),
+}
+
+
+def _accepted_answer_id(values: Dict[str, Any], element: Tag) -> Optional[int]:
+    accepted_answer_div = next((values[name] for name in ACCEPTED_ANSWER_FIELDS if values[name] is not None), None)
+    if accepted_answer_div is not None:
+        answer_id = accepted_answer_div.get('data-answerid') or accepted_answer_div.get('data-answer-id')
+        if answer_id:
+            return int(answer_id)
+        logging.debug("No answer ID attribute found in accepted answer div")
+    elif logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"No accepted answer div found using selectors. HTML Snippet:\n{element.prettify()[:1000]}")
+    return None
+
+
+def _page_dates(values: Dict[str, Any]) -> Dict[str, int]:
+    """Creation and last edit dates (epoch seconds) as shown on the question page itself.
+
+    The same dates the timeline gives for these events; close and lock dates
+    are only on the timeline.
+    """
+    dates: Dict[str, int] = {}
+    for item in values['header_items'] or []:
+        if "Asked" in item.get_text():
+            dates['creation_date'] = epoch(datetime.strptime(item["title"], "%Y-%m-%d %H:%M:%SZ"))
+
+    for action in values['signatures'] or []:
+        if action is None:
+            continue
+        action_element, date = action
+        if date is not None and "title" in date.attrs and "edited" in action_element.get_text():
+            dates['last_edit_date'] = epoch(datetime.strptime(date["title"], "%Y-%m-%d %H:%M:%SZ"))
+    return dates
+
+
+ACCEPTED_ANSWER = record('accepted_answer', _accepted_answer_id, **ACCEPTED_ANSWER_FIELDS)
+QUESTION_DETAILS = record(
+    'question_details', lambda values, element: (_accepted_answer_id(values, element), _page_dates(values)),
+    **ACCEPTED_ANSWER_FIELDS,
+    header_items=first('div[class="d-flex fw-wrap pb8 mb16 bb bc-black-075"]', within(each('div[title]'))),
+    # (user-action-time, its date span) of each signature of the question
+    signatures=first('#question', within(each('div.post-signature', within(first(
+        'div.user-action-time', Record('user_action', lambda values, action: (action, values['date']),
+                                       date=first('span.relativetime'))))))),
+)
+
+
+def parse_question_details(soup: BeautifulSoup) -> Tuple[Optional[int], Dict[str, int]]:
+    return QUESTION_DETAILS.extract(soup)
+
+
+def extract_question_details(html: str) -> Tuple[Optional[int], Dict[str, int]]:
+    """The accepted answer id of a full question page and the dates it shows."""
+    return parse_question_details(make_soup(html, QUESTION_DETAILS_ONLY))
+
+
+def extract_accepted_answer_id(html: str) -> Optional[int]:
+    return ACCEPTED_ANSWER.extract(make_soup(html, ACCEPTED_ANSWER_ONLY))
@@ -0,0 +1,315 @@
+"""Process-wide pooled HTTP client used for every upstream fetch.
+
+All requests to stackoverflow.com go through one ``requests.Session`` so that
+TCP/TLS connections are kept alive and reused instead of re-handshaking on
+every call. Pool sizes can be tuned with environment variables:
+
+- ``SCRAPER_POOL_CONNECTIONS``: number of hosts to keep a pool for
+- ``SCRAPER_POOL_MAXSIZE``: keep-alive connections kept per host
+- ``SCRAPER_MAX_PER_HOST``: concurrent in-flight requests allowed per host
+- ``SCRAPER_UPSTREAM_TIMEOUT``: connect/read timeout of one try, in seconds
+- ``SCRAPER_REVALIDATE_WINDOW``: seconds a cached page whose response had an
+  ``ETag`` or ``Last-Modified`` header is kept past its TTL to be revalidated
+  with a conditional GET (``validators``) instead of downloaded again
+
+Requests are paced and, when they fail, retried by ``rate_limit.upstream_controller``.
+Within an API request with a deadline (see ``budget``) every try is also cut
+short at that deadline, and no new one is started after it.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+from budget import record_request, record_timeout, time_left
+from rate_limit import THROTTLE_STATUSES, upstream_controller
+
+POOL_CONNECTIONS = int(os.getenv('SCRAPER_POOL_CONNECTIONS', 10))
+POOL_MAXSIZE = int(os.getenv('SCRAPER_POOL_MAXSIZE', 20))
+MAX_PER_HOST = int(os.getenv('SCRAPER_MAX_PER_HOST', 8))
+UPSTREAM_TIMEOUT = float(os.getenv('SCRAPER_UPSTREAM_TIMEOUT', 10))
+REVALIDATE_WINDOW = float(os.getenv('SCRAPER_REVALIDATE_WINDOW', 3600))
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+    # requests adds "br" here when a brotli package is installed
+    'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+
+
+class _Stats:
+    """Thread-safe counters for the connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+_stats = _Stats()
+
+
+# The counting hooks of both clients: ``PooledAdapter`` here and the event
+# hooks of the async app's httpx client, so ``/stats`` and the metrics cover
+# the upstream traffic of either app
+
+def count_connection():
+    _stats.incr('connections_opened')
+
+
+def count_request():
+    _stats.incr('requests')
+    record_request()
+
+
+def count_response(url: str, status: int, headers):
+    if headers.get('Content-Encoding'):
+        _stats.incr('compressed_responses')
+    if status in THROTTLE_STATUSES:
+        _stats.incr('throttled_responses')
+    if status == 304:
+        _stats.incr('not_modified_responses')
+    upstream_controller.record(url, status, headers.get('Retry-After'))
+
+
+def count_error(url: str):
+    _stats.incr('errors')
+    upstream_controller.record_error(url)
+
+
+class _CountingConnectionMixin:
+    # connect() runs once per TCP (and TLS) handshake, including reconnects of
+    # pooled connections the server closed; requests on a kept-alive socket skip it
+    def connect(self):
+        count_connection()
+        return super().connect()
+
+
+class _CountingHTTPConnection(_CountingConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CountingHTTPSConnection(_CountingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests and newly opened connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        count_request()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            count_error(request.url)
+            raise
+        count_response(request.url, response.status_code, response.headers)
+        return response
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+session = _build_session()
+
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+
+def acquire(url: str):
+    """Take a rate-limit token for ``url``; raises ``requests.Timeout`` if
+    none is available before the API request's deadline."""
+    if not upstream_controller.acquire(url, time_left()):
+        record_timeout()
+        raise requests.Timeout("deadline exceeded")
+
+
+def request_timeout() -> float:
+    """Timeout for the next try: ``UPSTREAM_TIMEOUT``, or less when the API
+    request's deadline is nearer. Raises ``requests.Timeout`` once it passed."""
+    seconds = time_left()
+    if seconds is None:
+        return UPSTREAM_TIMEOUT
+    if seconds <= 0:
+        record_timeout()
+        raise requests.Timeout("deadline exceeded")
+    return min(seconds, UPSTREAM_TIMEOUT)
+
+
+@contextmanager
+def host_slot(url: str):
+    """Hold one of the ``MAX_PER_HOST`` request slots for the host of ``url``
+    (waiting for one at most until the API request's deadline)."""
+    host = urlsplit(url).netloc
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+    seconds = time_left()
+    if not slot.acquire(timeout=max(seconds, 0) if seconds is not None else None):
+        record_timeout()
+        raise requests.Timeout("deadline exceeded")
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+def validators(headers) -> Dict[str, str]:
+    """The conditional request headers that revalidate a response with
+    ``headers``: ``If-None-Match`` for its ETag, ``If-Modified-Since`` for its
+    Last-Modified date. Empty when it has neither."""
+    conditions = {}
+    if headers.get('ETag'):
+        conditions['If-None-Match'] = headers['ETag']
+    if headers.get('Last-Modified'):
+        conditions['If-Modified-Since'] = headers['Last-Modified']
+    return conditions
+
+
+# Failures worth another try; anything else is the caller's to handle
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+@metrics.timed('fetch')
+def get(url: str, **kwargs) -> requests.Response:
+    """GET ``url`` through the shared session (same arguments as ``requests.get``).
+
+    Every try takes a token from the upstream rate controller first. Connection
+    errors, timeouts and retryable statuses are retried while the controller
+    allows it; after that the last response (or error) is returned (raised).
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        acquire(url)
+        try:
+            with host_slot(url):
+                response = session.get(url, timeout=request_timeout(), **kwargs)
+        except RETRY_ERRORS:
+            delay = upstream_controller.retry_delay(attempt)
+            if delay is None:
+                raise
+        else:
+            delay = upstream_controller.retry_delay(attempt, response.status_code,
+                                                    response.headers.get('Retry-After'))
+            if delay is None:
+                return response
+            response.close()
+        time.sleep(delay)
+
+
+@contextmanager
+def stream(url: str, **kwargs):
+    """GET ``url`` without reading the body up front.
+
+    The caller iterates ``response.iter_content()`` and may stop as soon as it
+    has what it needs; the response is closed on exit, dropping the unread rest
+    of the body (and its connection) instead of downloading it. Failed tries
+    are retried like ``get``.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        acquire(url)
+        with host_slot(url):
+            try:
+                response = session.get(url, stream=True, timeout=request_timeout(), **kwargs)
+            except RETRY_ERRORS:
+                delay = upstream_controller.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = upstream_controller.retry_delay(attempt, response.status_code,
+                                                        response.headers.get('Retry-After'))
+                if delay is None:
+                    try:
+                        yield response
+                    finally:
+                        if not response._content_consumed:
+                            _stats.incr('responses_closed_early')
+                        response.close()
+                    return
+                response.close()
+        time.sleep(delay)
+
+
+def get_stats() -> Dict[str, Any]:
+    counts = _stats.snapshot()
+    sent = counts.get('requests', 0)
+    opened = counts.get('connections_opened', 0)
+    return {
+        "requests": sent,
+        "errors": counts.get('errors', 0),
+        "throttled_responses": counts.get('throttled_responses', 0),
+        "connections_opened": opened,
+        "connections_reused": max(sent - opened, 0),
+        "compressed_responses": counts.get('compressed_responses', 0),
+        "responses_closed_early": counts.get('responses_closed_early', 0),
+        "not_modified_responses": counts.get('not_modified_responses', 0),
+        "pool_connections": POOL_CONNECTIONS,
+        "pool_maxsize": POOL_MAXSIZE,
+        "max_per_host": MAX_PER_HOST,
+    }
+
+
+def collect_metrics() -> List[metrics.Family]:
+    stats = get_stats()
+    return [
+        ('scraper_http_connections_opened_total', 'counter', "Upstream TCP/TLS connections opened",
+         [({}, stats['connections_opened'])]),
+        ('scraper_http_connections_reused_total', 'counter', "Upstream requests sent on a kept-alive connection",
+         [({}, stats['connections_reused'])]),
+        ('scraper_http_not_modified_total', 'counter', "Cached upstream pages revalidated by a 304",
+         [({}, stats['not_modified_responses'])]),
+        ('scraper_http_responses_closed_early_total', 'counter',
+         "Streamed upstream responses closed before the end of their body", [({}, stats['responses_closed_early'])]),
+    ]
+
+
+metrics.register(collect_metrics)
+
+
+def reset_stats():
+    _stats.reset()
@@ -0,0 +1,177 @@
+"""Prometheus metrics, served at ``GET /metrics`` in the text exposition format.
+
+Where the time of an API request goes, per route (the URL rule it matched,
+e.g. ``/questions/<int:question_id>``):
+
+- ``scraper_stage_seconds{stage, route}``: histograms of the time spent
+  fetching upstream pages (``fetch``, rate-limit waits and retries included),
+  building trees (``parse``), reading records out of a tree or out of streamed
+  bytes (``extract``) and writing JSON (``serialize``: a response body, or one
+  line of a stream)
+- ``scraper_upstream_requests_total{url_class, status}``: upstream responses
+  by URL class (see ``rate_limit.url_class``) and status, ``error`` for tries
+  that got no response
+
+The modules keeping counters for ``/stats`` (retries and backoff, cache hits
+and misses, connection reuse) ``register`` a collector that turns them into
+metrics when ``/metrics`` is read.
+
+Pages parsed in the parse pool are timed there and the timings handed back
+with the result, so they count for the route that asked for the page. Work
+done outside an API request, like prefetching, has ``route="background"``.
+Every process keeps its own metrics: under ``serve.py`` each worker reports
+its own share.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The route label of what runs in this context; set per API request
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar('current_route', default='background')
+# Set in a parse worker: timings are kept for the parent process instead
+_collected: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    'collected_timings', default=None)
+
+# (name, type, help, [(labels, value), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]
+
+_metrics: List[Any] = []
+_collectors: List[Callable[[], Iterable[Family]]] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def lines(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in values:
+            yield f"{self.name}{_labels(dict(zip(self.label_names, labels)))} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        # labels -> [observations per bucket (the last one past every bound), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def lines(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in values:
+            named = dict(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels({**named, 'le': _number(bound)})} {cumulative}"
+            yield f"{self.name}_sum{_labels(named)} {_number(total)}"
+            yield f"{self.name}_count{_labels(named)} {cumulative}"
+
+
+STAGE_SECONDS = Histogram('scraper_stage_seconds', "Time spent per stage of the API requests to a route",
+                          ('stage', 'route'))
+UPSTREAM_REQUESTS = Counter('scraper_upstream_requests_total', "Upstream responses by URL class and status",
+                            ('url_class', 'status'))
+
+
+def register(collector: Callable[[], Iterable[Family]]):
+    """Add ``collector``, called on every read of ``/metrics`` for metrics
+    kept elsewhere, as (name, type, help, [(labels, value), ...]) families."""
+    _collectors.append(collector)
+
+
+def observe(stage: str, seconds: float):
+    collected = _collected.get()
+    if collected is not None:
+        collected.append((stage, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, stage, current_route.get())
+
+
+def record(timings: Iterable[Tuple[str, float]]):
+    """Observe timings collected in another process (see ``collecting``)."""
+    for stage, seconds in timings:
+        observe(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Observe the time the block (or decorated function) takes as ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collecting():
+    """Keep the timings observed in the block in the list it yields, for
+    ``record`` to observe in the process that the work was done for."""
+    timings: List[Tuple[str, float]] = []
+    token = _collected.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected.reset(token)
+
+
+def render() -> str:
+    lines = [line for metric in _metrics for line in metric.lines()]
+    for collector in _collectors:
+        for name, kind, help, samples in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,371 @@
+"""Typed records for what the API returns: questions, answers, their owners,
+collectives and external links.
+
+Each model is a slotted dataclass, so a cached page of questions takes about a
+quarter less memory than the equivalent nested dicts and pickles smaller
+(``__reduce__`` stores the field values only, not their names). A field that
+was never set holds ``UNSET`` and is left out of the JSON, as a missing dict
+key was, so responses are unchanged.
+
+Models are also mutable mappings (``question['owner']``, ``get``,
+``setdefault``, ``update``): the enrichment and store code fills them in by
+key, and listing records pickled as dicts by earlier versions keep working.
+
+Dates are stored as the StackExchange API writes them, in seconds since the
+epoch: ``epoch`` converts the page, listing and timeline dates where they are
+read, so no date object is left for the JSON encoder to format.
+
+``ModelJSONProvider`` plugs JSON writing into the Flask and Quart apps. Its
+backend is ``orjson`` when it is installed (writing the models' dict form),
+otherwise ``ModelEncoder``, which writes the models straight to the same bytes
+``json.dumps`` gives for their dict form. ``SCRAPER_JSON_BACKEND`` (``orjson``
+or ``json``) picks one explicitly. With either, a model takes longer to write
+than the dict it replaces, its fields being read in Python;
+``benchmarks/bench_models.py`` measures both forms.
+"""
+import functools
+import json
+import os
+from collections.abc import MutableMapping
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import timed
+
+
+def _default_json_backend() -> str:
+    try:
+        import orjson  # noqa: F401
+        return 'orjson'
+    except ImportError:
+        return 'json'
+
+
+JSON_BACKEND = os.getenv('SCRAPER_JSON_BACKEND') or _default_json_backend()
+if JSON_BACKEND == 'orjson':
+    import orjson
+
+    # Models are passed to ``default`` (their unset fields must be left out)
+    # and datetimes too, so they are written as with the json backend
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+# Date formats found on the pages: listing and timeline titles, and the
+# datetime attribute of <time> elements
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%SZ", "%Y-%m-%dT%H:%M:%S")
+
+
+def epoch(value: Any) -> Optional[int]:
+    """Seconds since the epoch of a scraped date: a datetime (UTC when unzoned),
+    a string in one of ``DATE_FORMATS`` or a number of seconds. None otherwise."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        for fmt in DATE_FORMATS:
+            try:
+                return int(datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp())
+            except ValueError:
+                pass
+    return None
+
+
+class _Unset:
+    """A model field that was never set."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'UNSET'
+
+    def __repr__(self):
+        return 'UNSET'
+
+
+UNSET: Any = _Unset()
+
+
+class Model(MutableMapping):
+    """Base of the slotted result models; see ``model``."""
+    __slots__ = ()
+
+    _fields: Tuple[str, ...] = ()
+    _field_set = frozenset()
+    _values: Callable[['Model'], Tuple[Any, ...]]
+    # field names and values in sorted order, as the JSON writes them
+    _sorted_fields: Tuple[str, ...] = ()
+    _sorted_values: Callable[['Model'], Tuple[Any, ...]]
+
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, key) if key in self._field_set else UNSET
+        if value is UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._field_set:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        setattr(self, key, UNSET)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._field_set and getattr(self, key) is not UNSET
+
+    def __iter__(self):
+        return (name for name, value in zip(self._fields, self._values(self)) if value is not UNSET)
+
+    def __len__(self) -> int:
+        return sum(value is not UNSET for value in self._values(self))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key) if key in self._field_set else UNSET
+        return default if value is UNSET else value
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The set fields, as the dict this model replaces (nested models stay models)."""
+        return {name: value for name, value in zip(self._fields, self._values(self)) if value is not UNSET}
+
+    def __reduce__(self):
+        return type(self), self._values(self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={value!r}' for name, value in self.items())})"
+
+
+# The model classes; ``type(value) in MODEL_TYPES`` is a much cheaper test
+# than ``isinstance(value, Model)``, which goes through ``ABCMeta``
+MODEL_TYPES = set()
+
+
+def model(cls):
+    """Make ``cls`` (a ``Model`` subclass with annotated fields defaulting to
+    ``UNSET``) a slotted dataclass and index its fields."""
+    cls = dataclass(slots=True, repr=False, eq=False)(cls)
+    MODEL_TYPES.add(cls)
+    cls._fields = tuple(field.name for field in fields(cls))
+    cls._field_set = frozenset(cls._fields)
+    cls._values = attrgetter(*cls._fields)
+    cls._sorted_fields = tuple(sorted(cls._fields))
+    cls._sorted_values = attrgetter(*cls._sorted_fields)
+    return cls
+
+
+@model
+class ShallowUser(Model):
+    """The owner of a question or answer (StackExchange ``shallow_user``)."""
+    user_id: Optional[int] = UNSET
+    account_id: Optional[int] = UNSET
+    user_type: str = UNSET
+    display_name: Optional[str] = UNSET
+    profile_image: Optional[str] = UNSET
+    link: Optional[str] = UNSET
+    reputation: str = UNSET
+
+
+@model
+class Answer(Model):
+    answer_id: Optional[str] = UNSET
+    score: int = UNSET
+    is_accepted: bool = UNSET
+    creation_date: Optional[int] = UNSET
+    last_activity_date: Optional[int] = UNSET
+    owner: Optional[ShallowUser] = UNSET
+
+
+@model
+class Question(Model):
+    """A question as listed, as shown on its own page, or as the holder of its
+    ``answers``; each view sets its own subset of the fields."""
+    question_id: Optional[int] = UNSET
+    title: Optional[str] = UNSET
+    link: Optional[str] = UNSET
+    tags: List[str] = UNSET
+    owner: Optional[ShallowUser] = UNSET
+    content_license: str = UNSET
+    score: int = UNSET
+    answer_count: int = UNSET
+    view_count: int = UNSET
+    is_answered: bool = UNSET
+    has_accepted_answer: bool = UNSET
+    accepted_answer_id: int = UNSET
+    # dates in seconds since the epoch (see ``epoch``)
+    creation_date: Optional[int] = UNSET
+    closed_date: Optional[int] = UNSET
+    last_edit_date: Optional[int] = UNSET
+    last_activity: Optional[int] = UNSET
+    last_activity_date: Optional[int] = UNSET
+    locked_date: Optional[int] = UNSET
+    locked: Any = UNSET
+    protected: Any = UNSET
+    answers: List[Answer] = UNSET
+
+
+@model
+class ExternalLink(Model):
+    type: str = UNSET
+    link: str = UNSET
+
+
+@model
+class Collective(Model):
+    name: str = UNSET
+    link: str = UNSET
+    description: str = UNSET
+    slug: str = UNSET
+    tags: List[str] = UNSET
+    external_links: List[ExternalLink] = UNSET
+
+
+# Question and answer dates; the latest one is when a page last changed as far
+# as the scraped fields tell (votes and views change without moving it)
+DATE_FIELDS = ('creation_date', 'closed_date', 'last_edit_date', 'last_activity', 'last_activity_date',
+               'locked_date')
+
+
+def last_modified(question: Question) -> Optional[int]:
+    """The latest date of ``question`` and its answers, in seconds since the epoch."""
+    posts = [question, *(question.get('answers') or ())]
+    dates = [post.get(name) for post in posts for name in DATE_FIELDS]
+    return max((date for date in dates if isinstance(date, int)), default=None)
+
+
+def model_default(default: Optional[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    """A ``json.dumps`` ``default`` writing models as their dict form, and
+    anything else it does not know through ``default``."""
+    def encode_default(value: Any) -> Any:
+        if type(value) in MODEL_TYPES:
+            return value.as_dict()
+        if default is None:
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+        return default(value)
+    return encode_default
+
+
+class ModelEncoder:
+    """Writes models straight to a JSON string.
+
+    Gives the bytes ``json.dumps(value, default=..., ensure_ascii=...,
+    sort_keys=..., separators=...)`` gives for the models' dict form, without
+    building those dicts. Models, lists of models and the strings, ints, None
+    and booleans in their fields are written here; other objects (dates, ...)
+    through ``default``, and everything else (lists of strings, dicts,
+    floats, ...) by the C encoder of ``json``.
+    """
+
+    def __init__(self, default: Optional[Callable[[Any], Any]] = None, ensure_ascii: bool = True,
+                 sort_keys: bool = True, separators: Optional[Tuple[str, str]] = None):
+        self.default = default
+        self.escape = encode_basestring_ascii if ensure_ascii else encode_basestring
+        self.sort_keys = sort_keys
+        self.item_separator, self.key_separator = separators or (', ', ': ')
+        self.fallback = json.JSONEncoder(default=model_default(default), ensure_ascii=ensure_ascii,
+                                         sort_keys=sort_keys, separators=(self.item_separator, self.key_separator))
+        # per model class: its values getter and the '"name": ' written before each value
+        self._layouts: Dict[type, Tuple[Callable[[Model], Tuple[Any, ...]], Tuple[str, ...]]] = {}
+
+    def _layout(self, cls: type) -> Tuple[Callable[[Model], Tuple[Any, ...]], Tuple[str, ...]]:
+        layout = self._layouts.get(cls)
+        if layout is None:
+            names, values = ((cls._sorted_fields, cls._sorted_values) if self.sort_keys
+                             else (cls._fields, cls._values))
+            layout = self._layouts[cls] = values, tuple(self.escape(name) + self.key_separator for name in names)
+        return layout
+
+    def encode(self, value: Any) -> str:
+        kind = type(value)
+        if kind is str:
+            return self.escape(value)
+        if value is None:
+            return 'null'
+        if value is True:
+            return 'true'
+        if value is False:
+            return 'false'
+        if kind is int:
+            return int.__repr__(value)
+        if kind in MODEL_TYPES:
+            return self.encode_model(value)
+        if (kind is list or kind is tuple) and value and type(value[0]) in MODEL_TYPES:
+            return '[' + self.item_separator.join([self.encode_model(item) if type(item) in MODEL_TYPES
+                                                   else self.encode(item) for item in value]) + ']'
+        if self.default is not None and not isinstance(value, (str, int, float, list, tuple, dict)):
+            return self.encode(self.default(value))
+        return self.fallback.encode(value)
+
+    def encode_model(self, value: Model) -> str:
+        values, prefixes = self._layouts.get(type(value)) or self._layout(type(value))
+        escape = self.escape
+        parts = []
+        for prefix, item in zip(prefixes, values(value)):
+            if item is UNSET:
+                continue
+            kind = type(item)
+            # the common leaves (and lists of strings, e.g. tags) inline, the rest through encode
+            if kind is str:
+                parts.append(prefix + escape(item))
+            elif item is None:
+                parts.append(prefix + 'null')
+            elif kind is int:
+                parts.append(prefix + int.__repr__(item))
+            elif kind is bool:
+                parts.append(prefix + ('true' if item else 'false'))
+            elif kind is list and item and type(item[0]) in MODEL_TYPES:
+                parts.append(prefix + '[' + self.item_separator.join(map(self.encode_model, item)) + ']')
+            elif kind is list:
+                try:
+                    parts.append(prefix + '[' + self.item_separator.join(map(escape, item)) + ']')
+                except TypeError:
+                    parts.append(prefix + self.encode(item))
+            else:
+                parts.append(prefix + self.encode(item))
+        return '{' + self.item_separator.join(parts) + '}'
+
+
+@functools.lru_cache(maxsize=None)
+def model_encoder(default: Optional[Callable[[Any], Any]], ensure_ascii: bool, sort_keys: bool,
+                  separators: Optional[Tuple[str, str]]) -> ModelEncoder:
+    return ModelEncoder(default, ensure_ascii, sort_keys, separators)
+
+
+class ModelJSONProvider:
+    """Mixin for Flask's or Quart's ``DefaultJSONProvider`` writing responses
+    with the ``JSON_BACKEND``.
+
+    orjson always writes compact UTF-8 (``ensure_ascii`` and ``separators``
+    do not apply); responses are sent as its bytes. Calls with other options
+    (e.g. the ``indent`` of debug mode) go through ``json.dumps``, with models
+    written as their dict form.
+    """
+
+    @timed('serialize')
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if JSON_BACKEND == 'orjson' and kwargs.keys() <= {'separators'}:
+            return self.dumps_bytes(obj).decode()
+        if kwargs.keys() <= {'separators'}:
+            separators = kwargs.get('separators')
+            encoder = model_encoder(self.default, self.ensure_ascii, self.sort_keys,
+                                    tuple(separators) if separators is not None else None)
+            return encoder.encode(obj)
+        kwargs.setdefault('default', model_default(self.default))
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj: Any, option: int = 0) -> bytes:
+        """``obj`` as JSON by orjson."""
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=model_default(self.default), option=ORJSON_OPTIONS | option)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if JSON_BACKEND != 'orjson' or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        with timed('serialize'):
+            body = self.dumps_bytes(self._prepare_response_obj(args, kwargs), orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
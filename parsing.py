@@ -0,0 +1,223 @@
+"""HTML parser backend and selective parsing.
+
+``make_soup`` builds every BeautifulSoup tree in the scraper. The backend is
+``lxml`` when it is installed (a C parser, several times faster than the
+pure-Python ``html.parser``) and can be forced with ``SCRAPER_HTML_PARSER``.
+
+Call sites pass an ``only(...)`` strainer naming the parts of the page they
+read, so the rest of the document (head scripts, navigation, sidebars, footer)
+is never turned into a tree. Set ``SCRAPER_SELECTIVE_PARSING=0`` to build full
+trees again, e.g. when debugging an extractor.
+
+Lookups that only need a few values out of a page (ids in a script block,
+timeline dates) skip the DOM entirely: ``StreamScanner`` reads the response
+body chunk by chunk and tells the caller when it can stop downloading, and the
+values are pulled out of the raw bytes with precompiled patterns.
+
+Building and walking a tree holds the GIL, so in one process parsing runs on
+one core however many requests are being served. ``run_parser`` (and
+``run_parser_async``) hand a page's extractor to a pool of
+``SCRAPER_PARSE_WORKERS`` processes instead; the extractor takes the page's
+HTML and returns plain records, which is all that crosses the process
+boundary. With 0 workers (the default) it runs inline, or on a thread when
+the event loop of the async app asks.
+"""
+import asyncio
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.context import SpawnContext, SpawnProcess
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+import metrics
+
+
+def _default_parser() -> str:
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+
+PARSER = os.getenv('SCRAPER_HTML_PARSER') or _default_parser()
+SELECTIVE = os.getenv('SCRAPER_SELECTIVE_PARSING', '1') != '0'
+# Parse processes; none by default (pages are parsed inline)
+PARSE_WORKERS = int(os.getenv('SCRAPER_PARSE_WORKERS', 0))
+
+
+@metrics.timed('parse')
+def make_soup(markup, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    return BeautifulSoup(markup, PARSER, parse_only=parse_only if SELECTIVE else None)
+
+
+def only(tags: Iterable[str] = (), ids: Iterable[str] = (), classes: Iterable[str] = ()) -> SoupStrainer:
+    """Strainer keeping elements (with their whole subtree) that match any rule.
+
+    An element is kept if its tag name is in ``tags``, its id is in ``ids``, or
+    it has one of ``classes``. A class containing spaces must match the full
+    class attribute, like ``class_="a b"`` in ``find``; otherwise any single
+    class token matches.
+    """
+    tags = frozenset(tags)
+    ids = frozenset(ids)
+    tokens = frozenset(c for c in classes if ' ' not in c)
+    full_classes = frozenset(c for c in classes if ' ' in c)
+
+    def match(name: str, attrs: Dict[str, Any]) -> bool:
+        if name in tags:
+            return True
+        if ids and attrs.get('id') in ids:
+            return True
+        value = attrs.get('class')
+        if not value:
+            return False
+        if not isinstance(value, str):
+            value = ' '.join(value)
+        return value in full_classes or not tokens.isdisjoint(value.split())
+
+    return SoupStrainer(match)
+
+
+class StreamScanner:
+    """Accumulates a response body until ``markers`` have all been seen, in order.
+
+    ``feed`` returns True once the last marker has arrived, at which point the
+    rest of the body can be left unread. Markers split across chunks are found.
+    """
+
+    def __init__(self, *markers: bytes):
+        self._pending: List[bytes] = list(markers)
+        self._buffer = bytearray()
+        self._position = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        self._buffer += chunk
+        while self._pending:
+            marker = self._pending[0]
+            index = self._buffer.find(marker, self._position)
+            if index < 0:
+                # the marker may still complete with the next chunk
+                self._position = max(self._position, len(self._buffer) - len(marker) + 1)
+                return False
+            self._position = index + len(marker)
+            self._pending.pop(0)
+        return True
+
+    @property
+    def data(self) -> bytes:
+        return bytes(self._buffer)
+
+
+def as_bytes(markup) -> bytes:
+    return markup.encode('utf-8') if isinstance(markup, str) else markup
+
+
+def attribute(attrs: bytes, name: bytes) -> Optional[bytes]:
+    """Value of attribute ``name`` in the raw attribute text of a start tag."""
+    pattern = _ATTRIBUTE_PATTERNS.get(name)
+    if pattern is None:
+        pattern = _ATTRIBUTE_PATTERNS[name] = re.compile(
+            rb'(?:^|\s)' + re.escape(name) + rb'\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+    match = pattern.search(attrs)
+    if match is None:
+        return None
+    return next(group for group in match.groups() if group is not None)
+
+
+def has_class(attrs: bytes, name: bytes) -> bool:
+    value = attribute(attrs, b'class')
+    return value is not None and name in value.split()
+
+
+_ATTRIBUTE_PATTERNS: Dict[bytes, "re.Pattern[bytes]"] = {}
+
+
+PARSE_WORKER_NAME = 'parse-worker'
+
+
+class _ParseWorkerProcess(SpawnProcess):
+    # A spawned process re-imports the parent's main module before it runs
+    # anything else; its name is already set then, so ``in_parse_worker``
+    # lets the app modules skip their start-up work (the prefetch thread)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = PARSE_WORKER_NAME
+
+
+class _ParseWorkerContext(SpawnContext):
+    Process = _ParseWorkerProcess
+
+
+def in_parse_worker() -> bool:
+    return multiprocessing.current_process().name == PARSE_WORKER_NAME
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def parse_pool() -> Optional[ProcessPoolExecutor]:
+    """The process pool extractors run in, started on first use; None when
+    parsing runs inline."""
+    global _pool
+    if PARSE_WORKERS <= 0 or in_parse_worker():
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(PARSE_WORKERS, mp_context=_ParseWorkerContext())
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    # a worker died (e.g. killed for its memory); the next call starts a new pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _timed_extract(extract: Callable[..., Any], *args) -> Tuple[Any, List[Tuple[str, float]]]:
+    # in a parse worker: the result, and the stage timings for the parent to record
+    with metrics.collecting() as timings:
+        result = extract(*args)
+    return result, timings
+
+
+def run_parser(extract: Callable[..., Any], *args) -> Any:
+    """``extract(*args)`` in the parse pool, or inline without one.
+
+    ``extract`` must be a module-level function and its arguments and result
+    picklable. Exceptions it raises are raised here.
+    """
+    pool = parse_pool()
+    if pool is None:
+        return extract(*args)
+    try:
+        result, timings = pool.submit(_timed_extract, extract, *args).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return extract(*args)
+    metrics.record(timings)
+    return result
+
+
+async def run_parser_async(extract: Callable[..., Any], *args) -> Any:
+    """``run_parser`` for the event loop, which keeps serving while the page is
+    parsed: without a pool the extractor runs on a thread rather than inline."""
+    pool = parse_pool()
+    if pool is None:
+        return await asyncio.to_thread(extract, *args)
+    try:
+        result, timings = await asyncio.wrap_future(pool.submit(_timed_extract, extract, *args))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return await asyncio.to_thread(extract, *args)
+    metrics.record(timings)
+    return result
@@ -0,0 +1,204 @@
+"""Background prefetching of popular API results.
+
+A daemon thread re-scrapes a configured set of ``/questions`` pages and
+``/collectives`` shortly before their cache entries expire, so API calls for
+them are answered from the cache instead of waiting on stackoverflow.com.
+
+Targets are written as the API paths they warm, comma-separated::
+
+    SCRAPER_PREFETCH="/questions?tags=python,/questions?tags=javascript&pagesize=50,/collectives"
+
+Targets are refreshed one at a time with a pause between runs. The pause
+doubles (up to ``SCRAPER_PREFETCH_MAX_GAP``) after a run that failed or during
+which stackoverflow.com answered with a throttling status, and halves back
+towards ``SCRAPER_PREFETCH_GAP`` after clean runs, so the crawl slows down as
+soon as the upstream pushes back.
+
+When several processes serve the API (see ``serve.py``) only one of them
+should prefetch: with ``SCRAPER_PREFETCH_LOCK`` set, the process holding an
+exclusive lock on that file is the leader and the others wait to take over
+if it goes away. ``warmed`` is set once the leader has refreshed every target.
+
+Configured from the environment:
+
+- ``SCRAPER_PREFETCH``: targets (default none, which disables prefetching)
+- ``SCRAPER_PREFETCH_INTERVAL``: seconds between refreshes of one target
+  (default 80% of the target's cache TTL)
+- ``SCRAPER_PREFETCH_GAP`` / ``SCRAPER_PREFETCH_MAX_GAP``: shortest and
+  longest pause between two runs, in seconds (defaults 1 and 300)
+- ``SCRAPER_PREFETCH_LOCK``: lock file electing the prefetching process
+  (default none: every process that has targets prefetches)
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import http_client
+from budget import RequestBudget, current_budget
+from cache import default_cache
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): every process leads
+    fcntl = None
+
+PREFETCH_TARGETS = os.getenv('SCRAPER_PREFETCH', '')
+PREFETCH_INTERVAL = float(os.getenv('SCRAPER_PREFETCH_INTERVAL', 0))
+PREFETCH_GAP = float(os.getenv('SCRAPER_PREFETCH_GAP', 1))
+PREFETCH_MAX_GAP = float(os.getenv('SCRAPER_PREFETCH_MAX_GAP', 300))
+PREFETCH_LOCK = os.getenv('SCRAPER_PREFETCH_LOCK', '')
+# Seconds between attempts of a waiting process to take the leader lock
+LOCK_RETRY = 5.0
+# Share of the cache TTL after which a target is refreshed by default
+REFRESH_AT = 0.8
+
+
+def parse_targets(spec: str) -> List[Tuple[str, Dict[str, str]]]:
+    """Split a ``SCRAPER_PREFETCH`` value into (path, query parameters) pairs."""
+    targets = []
+    for item in spec.split(','):
+        item = item.strip()
+        if item:
+            parts = urlsplit(item)
+            targets.append((parts.path, dict(parse_qsl(parts.query))))
+    return targets
+
+
+class Target:
+    """One prefetched API result: ``refresh`` re-scrapes it into cache ``namespace``."""
+
+    def __init__(self, name: str, namespace: str, refresh: Callable[[], Any], interval: Optional[float] = None):
+        self.name = name
+        self.namespace = namespace
+        self.refresh = refresh
+        self.interval = interval or PREFETCH_INTERVAL or default_cache.ttl(namespace) * REFRESH_AT
+        self.next_run = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.last_success: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.upstream_requests: Optional[int] = None
+
+    def state(self, now: float) -> Dict[str, Any]:
+        age = now - self.last_success if self.last_success is not None else None
+        return {
+            "target": self.name,
+            "interval": round(self.interval, 1),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "upstream_requests": self.upstream_requests,
+            "age": round(age, 1) if age is not None else None,
+            "fresh": age is not None and age < default_cache.ttl(self.namespace),
+            "next_run_in": round(max(self.next_run - now, 0), 1),
+        }
+
+
+class Prefetcher:
+    def __init__(self, targets: List[Target], gap: float = PREFETCH_GAP, max_gap: float = PREFETCH_MAX_GAP,
+                 lock_path: str = PREFETCH_LOCK):
+        self.targets = targets
+        self.min_gap = gap
+        self.max_gap = max_gap
+        self.gap = gap
+        self.throttled = 0
+        self.lock_path = lock_path
+        self.leader = False
+        self.warmed = threading.Event()
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the background thread (once, and only if there is anything to prefetch).
+
+        The leader lock is tried here already, so ``leader`` tells right away
+        whether this process will prefetch.
+        """
+        with self._lock:
+            if self._thread is None and self.targets:
+                self._lead()
+                self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+                self._thread.start()
+
+    def _lead(self) -> bool:
+        """Take the leader lock if it is free; it is held until the process exits."""
+        if not self.leader:
+            if not self.lock_path or fcntl is None:
+                self.leader = True
+            else:
+                lock_file = open(self.lock_path, 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    return False
+                self._lock_file = lock_file
+                self.leader = True
+                logging.info(f"Process {os.getpid()} leads prefetching")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._lead():
+            if self._stop.wait(LOCK_RETRY):
+                return
+        while not self._stop.is_set():
+            target = min(self.targets, key=lambda t: t.next_run)
+            if self._stop.wait(max(target.next_run - time.time(), 0)):
+                break
+            throttled = self.run(target)
+            if throttled or target.last_error:
+                self.gap = min(self.gap * 2, self.max_gap)
+            else:
+                self.gap = max(self.gap / 2, self.min_gap)
+            # a failed target is retried after the pause instead of a full interval
+            target.next_run = time.time() + (self.gap if target.last_error else target.interval)
+            if all(t.runs for t in self.targets):
+                self.warmed.set()
+            self._stop.wait(self.gap)
+
+    def run(self, target: Target) -> int:
+        """Refresh ``target`` now; returns how many throttled responses were seen meanwhile."""
+        throttled_before = http_client.get_stats()['throttled_responses']
+        budget = RequestBudget()
+        start = time.time()
+        target.runs += 1
+        try:
+            context = contextvars.copy_context()
+            context.run(current_budget.set, budget)
+            if not context.run(target.refresh):
+                raise ValueError("nothing scraped")
+            target.last_success = time.time()
+            target.last_error = None
+        except Exception as e:
+            target.failures += 1
+            target.last_error = str(e)
+            logging.warning(f"Prefetching {target.name} failed: {str(e)}")
+        target.last_duration = time.time() - start
+        target.upstream_requests = budget.sent
+        throttled = http_client.get_stats()['throttled_responses'] - throttled_before
+        self.throttled += throttled
+        return throttled
+
+    def get_state(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "leader": self.leader,
+            "pid": os.getpid(),
+            "gap": round(self.gap, 2),
+            "throttled_responses": self.throttled,
+            "targets": [target.state(now) for target in sorted(self.targets, key=lambda t: t.next_run)],
+        }
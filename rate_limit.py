@@ -0,0 +1,305 @@
+"""Rate limiting and retries for upstream requests.
+
+One global bucket is shared by every request to stackoverflow.com, sync or
+async, so the total request rate stays bounded no matter how many requests are
+fanned out concurrently. Below it, ``upstream_controller`` keeps one adaptive
+bucket per URL class (user profiles, timelines, question pages, ...), tuned
+AIMD-style from the responses: every success raises the class's rate by a
+small step (up to the global rate), a 429/503 halves it, and a
+``Retry-After`` pauses the whole class for that long.
+
+Failed requests (connection errors, 429 and 5xx) are retried with jittered
+exponential backoff, or after ``Retry-After``, at most ``SCRAPER_MAX_TRIES``
+times and for at most ``SCRAPER_RETRY_BUDGET`` seconds of waiting per API call.
+
+- ``SCRAPER_UPSTREAM_RATE``: sustained requests per second (0 disables the limit)
+- ``SCRAPER_UPSTREAM_BURST``: requests allowed back to back before throttling
+- ``SCRAPER_UPSTREAM_MIN_RATE``: lowest rate a throttled URL class is slowed to
+- ``SCRAPER_UPSTREAM_RATE_STEP``: requests per second a URL class regains per success
+- ``SCRAPER_MAX_TRIES`` / ``SCRAPER_RETRY_BUDGET``: retry limits
+
+The rate and burst are for the whole service: when it runs as
+``SCRAPER_WORKERS`` processes (``serve.py`` sets this), each takes an equal share.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import metrics
+from budget import allow_retry
+
+WORKERS = max(int(os.getenv('SCRAPER_WORKERS', 1)), 1)
+UPSTREAM_RATE = float(os.getenv('SCRAPER_UPSTREAM_RATE', 20)) / WORKERS
+UPSTREAM_BURST = float(os.getenv('SCRAPER_UPSTREAM_BURST', 40)) / WORKERS
+MIN_RATE = float(os.getenv('SCRAPER_UPSTREAM_MIN_RATE', 1))
+RATE_STEP = float(os.getenv('SCRAPER_UPSTREAM_RATE_STEP', 0.2))
+MAX_TRIES = int(os.getenv('SCRAPER_MAX_TRIES', 4))
+# Backoff before retry n is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** n)]
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+# A class's rate is halved at most once per this many seconds, so a burst of
+# throttled responses to requests that were already in flight counts once
+DECREASE_INTERVAL = 1.0
+
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# URL class -> pattern on the path
+URL_CLASSES = [
+    ('user', re.compile(r'/users/(\d+)')),
+    ('timeline', re.compile(r'/posts/(\d+)/timeline')),
+    ('listing', re.compile(r'/questions(?:/tagged/.*)?$')),
+    ('question', re.compile(r'/questions/(\d+)')),
+    ('answer', re.compile(r'/a/(\d+)')),
+    ('collectives', re.compile(r'/collectives-all$')),
+    ('collective', re.compile(r'/collectives/([\w-]+)')),
+]
+
+
+def url_class(url: str) -> str:
+    path = urlsplit(url).path
+    for name, pattern in URL_CLASSES:
+        if pattern.match(path):
+            return name
+    return 'other'
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta seconds or an HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            # the token is borrowed from the future; wait until it has been refilled
+            wait = -self._tokens / self.rate
+            self.waits += 1
+            self.waited_seconds += wait
+            return wait
+
+    def release(self):
+        """Hand back a token taken (by ``acquire``, or ``_reserve``) that will not be used."""
+        if self.rate > 0:
+            with self._lock:
+                self._tokens = min(self.burst, self._tokens + 1)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a token; False, without waiting, if that would take longer
+        than ``timeout`` seconds."""
+        wait = self._reserve()
+        if timeout is not None and wait > timeout:
+            self.release()
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        wait = self._reserve()
+        if timeout is not None and wait > timeout:
+            self.release()
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "waits": self.waits,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+class AdaptiveBucket(TokenBucket):
+    """Token bucket whose rate follows the responses (see the module docstring)."""
+
+    def __init__(self, rate: float, burst: float, min_rate: float, step: float):
+        super().__init__(rate, burst)
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self.step = step
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.pauses = 0
+        self._decreased = 0.0
+
+    def _reserve(self) -> float:
+        wait = super()._reserve()
+        with self._lock:
+            paused = self.blocked_until - time.monotonic()
+            if paused > wait:
+                self.waits += 1
+                self.waited_seconds += paused - wait
+                return paused
+        return wait
+
+    def on_success(self):
+        if self.rate > 0:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.step)
+
+    def on_throttle(self, retry_after: Optional[float]):
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if self.rate > 0 and now - self._decreased >= DECREASE_INTERVAL:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._decreased = now
+            if retry_after:
+                self.pauses += 1
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        with self._lock:
+            stats.update(throttled=self.throttled, retry_after_pauses=self.pauses, rate=round(self.rate, 2))
+        return stats
+
+
+class RateController:
+    """Per-URL-class adaptive buckets under the global ``upstream_limiter``."""
+
+    def __init__(self, limiter: TokenBucket, min_rate: float = MIN_RATE, step: float = RATE_STEP):
+        self.limiter = limiter
+        self.min_rate = min_rate
+        self.step = step
+        self._buckets: Dict[str, AdaptiveBucket] = {}
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.retry_seconds = 0.0
+        self.given_up = 0
+
+    def bucket(self, url: str) -> AdaptiveBucket:
+        name = url_class(url)
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = self._buckets[name] = AdaptiveBucket(self.limiter.rate, self.limiter.burst,
+                                                              self.min_rate, self.step)
+            return bucket
+
+    def acquire(self, url: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a token of ``url``'s class and a global one; False if that
+        would take longer than ``timeout`` seconds."""
+        start = time.monotonic()
+        bucket = self.bucket(url)
+        if not bucket.acquire(timeout):
+            return False
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0)
+        if not self.limiter.acquire(remaining):
+            # the class token goes back unused
+            bucket.release()
+            return False
+        return True
+
+    async def acquire_async(self, url: str, timeout: Optional[float] = None) -> bool:
+        start = time.monotonic()
+        bucket = self.bucket(url)
+        if not await bucket.acquire_async(timeout):
+            return False
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0)
+        if not await self.limiter.acquire_async(remaining):
+            bucket.release()
+            return False
+        return True
+
+    def record(self, url: str, status: int, retry_after: Optional[str] = None):
+        """Feed one upstream response back into its class's rate."""
+        metrics.UPSTREAM_REQUESTS.inc(url_class(url), str(status))
+        bucket = self.bucket(url)
+        if status in THROTTLE_STATUSES:
+            bucket.on_throttle(parse_retry_after(retry_after))
+        elif status < 400:
+            bucket.on_success()
+
+    def record_error(self, url: str):
+        """Count a try of ``url`` that got no response."""
+        metrics.UPSTREAM_REQUESTS.inc(url_class(url), 'error')
+
+    def retry_delay(self, attempt: int, status: Optional[int] = None,
+                    retry_after: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait before retrying a request whose ``attempt``-th try
+        failed (``status`` None for a connection error), or None to give up."""
+        if status is not None and status not in RETRY_STATUSES:
+            return None
+        delay = parse_retry_after(retry_after) if status in THROTTLE_STATUSES else None
+        if delay is None:
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        if attempt >= MAX_TRIES or not allow_retry(delay):
+            with self._lock:
+                self.given_up += 1
+            return None
+        with self._lock:
+            self.retries += 1
+            self.retry_seconds += delay
+        return delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = dict(self._buckets)
+            stats = {"retries": self.retries, "retry_seconds": round(self.retry_seconds, 3),
+                     "retries_given_up": self.given_up}
+        return {**self.limiter.get_stats(), **stats,
+                "classes": {name: bucket.get_stats() for name, bucket in sorted(buckets.items())}}
+
+    def collect_metrics(self) -> List[metrics.Family]:
+        stats = self.get_stats()
+        classes = stats['classes'].items()
+        return [
+            ('scraper_upstream_retries_total', 'counter', "Upstream requests retried after a failure",
+             [({}, stats['retries'])]),
+            ('scraper_upstream_backoff_seconds_total', 'counter', "Seconds waited before retrying upstream requests",
+             [({}, stats['retry_seconds'])]),
+            ('scraper_upstream_retries_given_up_total', 'counter',
+             "Failed upstream requests not retried (out of tries or retry budget)", [({}, stats['retries_given_up'])]),
+            ('scraper_upstream_throttled_total', 'counter', "429 and 503 responses by URL class",
+             [({'url_class': name}, bucket['throttled']) for name, bucket in classes]),
+            ('scraper_upstream_rate', 'gauge', "Current request rate allowed per URL class, per second",
+             [({'url_class': name}, bucket['rate']) for name, bucket in classes]),
+            ('scraper_rate_limit_wait_seconds_total', 'counter',
+             "Seconds waited for a rate-limit token, in the global bucket and per URL class",
+             [({'bucket': 'global'}, stats['waited_seconds'])]
+             + [({'bucket': name}, bucket['waited_seconds']) for name, bucket in classes]),
+        ]
+
+
+upstream_limiter = TokenBucket(UPSTREAM_RATE, UPSTREAM_BURST)
+upstream_controller = RateController(upstream_limiter)
+metrics.register(upstream_controller.collect_metrics)
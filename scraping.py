@@ -0,0 +1,289 @@
+"""Route helpers shared by the Flask app (``stackoverflow_scraper``) and the
+asyncio app (``async_scraper``).
+
+Argument parsing, listing URLs, enrichment planning, the byte-level profile
+and timeline parsers and the cached copies of upstream pages. Importing this
+module starts nothing: the thread pools and the prefetch thread belong to
+``stackoverflow_scraper``, so the async app loads these without them.
+"""
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from werkzeug.routing import BaseConverter
+
+import http_client
+import metrics
+from budget import RequestBudget
+from cache import default_cache
+from models import Question, ShallowUser, epoch
+from parsing import as_bytes, attribute, has_class
+from store import SORT_COLUMNS
+from users import user_key
+
+
+class IdListConverter(BaseConverter):
+    """Two or more ``;``-separated ids, e.g. ``/questions/1;2;3``.
+
+    A single id still matches the ``<int:...>`` routes, which return one object.
+    """
+    regex = r'\d+(?:;\d+)+'
+
+    def to_python(self, value: str) -> List[int]:
+        return [int(item) for item in value.split(';')]
+
+    def to_url(self, value: List[int]) -> str:
+        return ';'.join(str(item) for item in value)
+
+
+# A page expired less than SCRAPER_REVALIDATE_WINDOW seconds ago is kept; when
+# its response had an ETag or Last-Modified header it is fetched again with
+# If-None-Match / If-Modified-Since, and a 304 renews it without a new body
+def cached_page(url: str) -> Tuple[Optional[str], bool, Dict[str, str]]:
+    """(html, fresh, conditional headers to revalidate it with) of the cached
+    copy of ``url``; (None, False, {}) when there is none."""
+    html, fresh = default_cache.lookup('page', url, stale=http_client.REVALIDATE_WINDOW)
+    if not isinstance(html, str):
+        return None, False, {}
+    if fresh:
+        return html, True, {}
+    return html, False, default_cache.get('page_validators', url) or {}
+
+
+def cache_page(url: str, html: str, conditions: Dict[str, str]):
+    default_cache.set('page', url, html)
+    if conditions:
+        default_cache.set('page_validators', url, conditions,
+                          ttl=default_cache.ttl('page') + http_client.REVALIDATE_WINDOW)
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Last line of a stream whose call skipped work or gave up on some at its
+# deadline: the headers went out before that was known
+PARTIAL_LINE = {"partial": True}
+
+
+# Tag pages of one collective requested concurrently
+COLLECTIVE_TAG_PAGE_WINDOW = int(os.getenv('SCRAPER_COLLECTIVE_TAG_PAGE_WINDOW', 4))
+COLLECTIVE_PAGE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+def questions_args(args) -> Tuple[int, int, List[str]]:
+    """page, pagesize and (max 3) tags of a /questions call, in the form the
+    cache keys of ``iter_detailed_questions`` are built from.
+
+    Tags are lowercased, deduplicated and sorted (a listing matches all of
+    them in any order), so ``python;flask`` and ``Flask;python`` share one
+    cache entry and one in-flight scrape. Raises ValueError unless page and
+    pagesize are positive integers.
+    """
+    try:
+        page = int(args.get('page', 1))
+        pagesize = int(args.get('pagesize', 30))
+    except ValueError:
+        raise ValueError("page and pagesize must be integers") from None
+    if page < 1 or pagesize < 1:
+        raise ValueError("page and pagesize must be positive")
+    tags = sorted({tag.strip().lower() for tag in args.get('tags', '').split(';')[:3] if tag.strip()})
+    return page, pagesize, tags
+
+
+QUESTION_QUERY_PARAMS = ('sort', 'order', 'min', 'max', 'fromdate', 'todate')
+
+
+def parse_question_query(args) -> Optional[Dict[str, Any]]:
+    """The StackExchange ``sort``/``order``/``min``/``max``/``fromdate``/``todate``
+    parameters of a /questions call, or None when none are given.
+
+    Dates are Unix timestamps, as in the StackExchange API; ``min``/``max``
+    apply to the sort field. Raises ValueError for unsupported values.
+    """
+    if not any(name in args for name in QUESTION_QUERY_PARAMS):
+        return None
+    query: Dict[str, Any] = {'sort': args.get('sort', 'activity'), 'order': args.get('order', 'desc')}
+    if query['sort'] not in SORT_COLUMNS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+    if query['order'] not in ('desc', 'asc'):
+        raise ValueError("order must be desc or asc")
+    for name in ('min', 'max', 'fromdate', 'todate'):
+        value = args.get(name)
+        if value:
+            try:
+                query[name] = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer") from None
+    return query
+
+
+def questions_listing_url(page: int = 1, pagesize: int = 30, tags: List[str] = None) -> Tuple[str, List[str]]:
+    """Build the listing URL for a page of questions, plus the (max 3) tags it filters on."""
+    if isinstance(tags, str):
+        tag_list = tags.split(';')[:3]  # Split by semicolon and limit to 3 tags
+    elif isinstance(tags, list):
+        tag_list = tags[:3]  # Limit to 3 tags
+    else:
+        tag_list = []
+
+    base_url = "https://stackoverflow.com/questions"
+
+    if tag_list:
+        tags_query = '+'.join(tag_list)  # Join tags with '+' for multi-tag queries
+        url = f"{base_url}/tagged/{tags_query}?sort=RecentActivity&edited=true&page={page}&pagesize={pagesize}"
+    else:
+        url = f"{base_url}?tab=Active&page={page}&pagesize={pagesize}"
+    return url, tag_list
+
+
+# Profile and timeline lookups only need a few values, so they are streamed and
+# matched on the raw bytes: no DOM is built and the download stops at the
+# marker after which nothing more is needed. Dropping the rest of a body also
+# drops its connection; SCRAPER_STREAM_EARLY_STOP=0 reads bodies to the end so
+# connections stay reusable (the DOM is still skipped).
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_EARLY_STOP = os.getenv('SCRAPER_STREAM_EARLY_STOP', '1') != '0'
+USER_IDS_END = (b'accountId', b'</script>')
+TIMELINE_END = (b'event-rows', b'</table>')
+
+
+ACCOUNT_ID_PATTERN = re.compile(rb'accountId:\s*(\d+)')
+USER_ID_PATTERN = re.compile(rb'userId:\s*(\d+)')
+
+
+@metrics.timed('extract')
+def parse_user_ids(html: Union[str, bytes]) -> Tuple[Optional[str], Optional[str]]:
+    data = as_bytes(html)
+    marker = data.find(b'accountId')
+    if marker < 0:
+        return None, None
+
+    # Both ids are read from the script block that mentions accountId
+    script_start = max(data.rfind(b'<script', 0, marker), 0)
+    script_end = data.find(b'</script>', marker)
+    script = data[script_start:script_end if script_end >= 0 else len(data)]
+
+    account_id_match = ACCOUNT_ID_PATTERN.search(script)
+    user_id_match = USER_ID_PATTERN.search(script)
+    return (account_id_match.group(1).decode() if account_id_match else None,
+            user_id_match.group(1).decode() if user_id_match else None)
+
+
+def apply_user_ids(owner: ShallowUser, user_ids: Optional[Tuple[Optional[str], Optional[str]]]):
+    """Fill the account_id/user_id scraped from a profile page into an owner dict."""
+    if user_ids:
+        account_id, user_id = user_ids
+        if account_id:
+            owner["account_id"] = int(account_id)
+        if user_id:
+            owner["user_id"] = int(user_id)
+
+
+TIMELINE_DATE_FIELDS = {
+    b'question': 'creation_date',
+    b'closed': 'closed_date',
+    b'edit': 'last_edit_date',
+    b'locked': 'locked_date',
+    b'protected': 'last_activity_date',
+}
+ROW_START_PATTERN = re.compile(rb'<tr\b([^>]*)>', re.I)
+SPAN_START_PATTERN = re.compile(rb'<span\b([^>]*)>', re.I)
+
+
+@metrics.timed('extract')
+def parse_timeline_dates(html: Union[str, bytes]) -> Dict[str, int]:
+    dates: Dict[str, int] = {}
+    data = as_bytes(html)
+
+    # Extract dates from the timeline's event rows; later rows win
+    rows = list(ROW_START_PATTERN.finditer(data))
+    for i, row in enumerate(rows):
+        if not has_class(row.group(1), b'event-rows'):
+            continue
+        row_end = data.find(b'</tr', row.end())
+        if i + 1 < len(rows) and (row_end < 0 or rows[i + 1].start() < row_end):
+            row_end = rows[i + 1].start()
+        field = TIMELINE_DATE_FIELDS.get(attribute(row.group(1), b'data-eventtype'))
+
+        for span in SPAN_START_PATTERN.finditer(data, row.end(), row_end if row_end >= 0 else len(data)):
+            if has_class(span.group(1), b'relativetime'):
+                date_str = attribute(span.group(1), b'title')
+                if date_str is not None and field:
+                    dates[field] = epoch(datetime.strptime(date_str.decode(), "%Y-%m-%d %H:%M:%SZ"))
+                break
+    return dates
+
+
+CLOSED_TITLE_SUFFIXES = ("[closed]", "[duplicate]")
+
+
+def plan_enrichments(entries: List[Dict[str, Any]], budget: RequestBudget) -> List[Dict[str, bool]]:
+    """Decide which detail pages to fetch for each listing entry, within ``budget``.
+
+    The question page fetched for an accepted answer also shows the creation
+    and edit dates, so that question's timeline is skipped unless it is
+    closed (close dates are only on the timeline). Each owner's profile is
+    planned once however many of their questions are listed. Entries are
+    planned in listing order; once the budget is spent the rest keep what the
+    listing page provides (their plan is then not ``complete``).
+    """
+    plans = []
+    planned_users = set()
+    for entry in entries:
+        question = entry['question']
+        plan = {'user': False, 'timeline': False, 'details': False}
+
+        if entry['accepted_url']:
+            plan['details'] = budget.plan()
+
+        closed = (question.get('title') or '').rstrip().endswith(CLOSED_TITLE_SUFFIXES)
+        if question['question_id'] is not None and (closed or not plan['details']):
+            plan['timeline'] = budget.plan()
+
+        if entry['user_link']:
+            key = user_key(entry['user_link'])
+            if key not in planned_users and budget.plan():
+                planned_users.add(key)
+            plan['user'] = key in planned_users
+
+        # Whether nothing this entry needed was cut by the budget
+        plan['complete'] = ((plan['details'] or not entry['accepted_url'])
+                            and (plan['timeline'] or plan['details'] and not closed)
+                            and (plan['user'] or not entry['user_link']))
+        plans.append(plan)
+    return plans
+
+
+def complete_question(entry: Dict[str, Any], user_ids: Optional[Tuple[Optional[str], Optional[str]]],
+                      dates: Optional[Dict[str, int]], accepted_answer_id: Optional[int]) -> Question:
+    """Merge the enrichment results for one listing entry into its question."""
+    question = entry['question']
+    apply_user_ids(question['owner'], user_ids)
+
+    if question.get('question_id') is not None:
+        question.update(dates or {})
+
+        if 'creation_date' not in question:
+            question['creation_date'] = epoch(entry['summary_date'])
+
+        if 'last_activity' not in question:
+            question['last_activity'] = epoch(entry['summary_date'])
+
+        # Set default values for dates not found
+        question.setdefault('closed_date', None)
+        question.setdefault('last_edit_date', None)
+        question.setdefault('last_activity', None)
+        question.setdefault('locked', None)
+        question.setdefault('protected', None)
+
+    if accepted_answer_id:
+        question['accepted_answer_id'] = accepted_answer_id
+
+    return question
+
+
+# Multi-id routes (/questions/1;2;3): most ids per call, and ids fetched at once
+MAX_IDS = 100
+BATCH_WORKERS = int(os.getenv('SCRAPER_BATCH_WORKERS', 8))
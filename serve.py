@@ -0,0 +1,83 @@
+"""Production launcher: the API served by several worker processes.
+
+    python serve.py                          # asyncio app, one worker per core
+    python serve.py --app sync --workers 4   # the Flask app
+
+Parsing pages is CPU-bound, so one process is limited to one core; this runs
+``--workers`` processes behind one listening socket with uvicorn's process
+supervisor. They act as one service:
+
+- the response cache defaults to the SQLite ``disk`` backend (and the post
+  store is a SQLite file already), so a page scraped by one worker is served
+  by all of them
+- the upstream rate limit is split between the workers (``SCRAPER_WORKERS``)
+- the supervisor imports the scraper before starting any worker and so
+  takes the prefetch lock (``SCRAPER_PREFETCH_LOCK``): it is the only process
+  that prefetches, and workers are started once it has warmed every target
+  (waiting at most ``SCRAPER_WARMUP_TIMEOUT`` seconds)
+
+``kill -HUP`` on the supervisor replaces the workers one at a time: each new
+worker is started and ready before the old one is told to stop, and the old
+one stops accepting connections but finishes its in-flight requests (for at
+most ``--graceful-timeout`` seconds, default no limit) before it exits.
+``SIGTTIN``/``SIGTTOU`` add or remove a worker.
+"""
+import argparse
+import logging
+import os
+
+# app import string and uvicorn interface per --app
+APPS = {
+    'async': ('async_scraper:app', 'asgi3'),
+    'sync': ('stackoverflow_scraper:app', 'wsgi'),
+}
+WARMUP_TIMEOUT = float(os.getenv('SCRAPER_WARMUP_TIMEOUT', 60))
+
+
+def share_environment(workers: int):
+    """Environment for ``workers`` processes serving as one; must be set before
+    the scraper modules are imported. Workers inherit it."""
+    os.environ['SCRAPER_WORKERS'] = str(workers)
+    os.environ.setdefault('SCRAPER_PREFETCH_LOCK', 'scraper_prefetch.lock')
+    if workers > 1:
+        os.environ.setdefault('SCRAPER_CACHE_BACKEND', 'disk')
+        if os.environ['SCRAPER_CACHE_BACKEND'] != 'disk':
+            logging.warning(f"SCRAPER_CACHE_BACKEND={os.environ['SCRAPER_CACHE_BACKEND']}: "
+                            f"the {workers} workers will not share cached results")
+
+
+def warm_up():
+    """Become the prefetch leader and wait for its first pass over the targets."""
+    from stackoverflow_scraper import prefetcher
+
+    if prefetcher.leader:
+        logging.info(f"Warming {len(prefetcher.targets)} prefetch targets")
+        if not prefetcher.warmed.wait(WARMUP_TIMEOUT):
+            logging.warning(f"Prefetch targets not warm after {WARMUP_TIMEOUT:g}s; starting workers anyway")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--app', default=os.getenv('SCRAPER_APP', 'async'),
+                        help='async, sync, or the import string of another app (module:attribute)')
+    parser.add_argument('--interface', choices=['asgi3', 'wsgi'], default='asgi3',
+                        help='interface of an --app given as an import string')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SCRAPER_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.getenv('STACKOVERFLOW_API_PORT', 23467)))
+    parser.add_argument('--graceful-timeout', type=int, help='seconds a stopping worker may take to finish')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    share_environment(args.workers)
+    warm_up()
+
+    import uvicorn
+
+    app, interface = APPS.get(args.app, (args.app, args.interface))
+    uvicorn.run(app, host=args.host, port=args.port, workers=args.workers, interface=interface,
+                timeout_graceful_shutdown=args.graceful_timeout)
+
+
+if __name__ == '__main__':
+    main()
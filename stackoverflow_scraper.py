@@ -1,26 +1,63 @@
+import functools
+import itertools
 import logging
+import os
 import re
-import time
-import backoff
 import requests
-from requests.exceptions import RequestException
-from flask import Flask, jsonify, request
-from bs4 import BeautifulSoup
-import requests
-from typing import List, Dict, Union, Any, Optional
+from flask import Flask, Response, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from datetime import datetime, timedelta, timezone
-from dateutil.parser import *
-from typing import Optional
+
+import http_client
+import metrics
+from budget import (ContextThreadPoolExecutor, DeadlineExceeded, RequestBudget, current_budget, route_deadline,
+                    timed_out, wait_result, within_budget)
+from cache import cached, cached_iter, default_cache
+from prefetch import PREFETCH_TARGETS, Prefetcher, Target, parse_targets
+from store import default_store, filter_questions, reuse_enrichments
+from users import UserResolver
+from models import Answer, Collective, ModelJSONProvider, Question, last_modified
+from rate_limit import upstream_controller
+from parsing import StreamScanner, in_parse_worker, make_soup, run_parser
+from extractors import (COLLECTIVE_TAGS_ONLY, COLLECTIVES_PAGE_ONLY, EXTERNAL_LINKS_ONLY, extract_answers,
+                        extract_question_answers, extract_question_details, extract_question_page,
+                        extract_question_summaries, parse_collective_tags, parse_collectives, parse_external_links)
+from scraping import (BATCH_WORKERS, COLLECTIVE_PAGE_HEADERS, COLLECTIVE_TAG_PAGE_WINDOW, MAX_IDS, NDJSON_MIMETYPE,
+                      PARTIAL_LINE, STREAM_CHUNK_SIZE, STREAM_EARLY_STOP, TIMELINE_END, USER_IDS_END, IdListConverter,
+                      apply_user_ids, cache_page, cached_page, complete_question, parse_question_query,
+                      parse_timeline_dates, parse_user_ids, plan_enrichments, questions_args, questions_listing_url)
+
+
+class JSONProvider(ModelJSONProvider, DefaultJSONProvider):
+    """Flask's JSON provider, writing the scraped models directly."""
 
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
+app.url_map.converters['ids'] = IdListConverter
+
+
+def fetch_html(url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> str:
+    html, fresh, conditions = cached_page(url)
+    if fresh:
+        return html
+    response = http_client.get(url, headers={**(headers or {}), **conditions}, **kwargs, verify = False)
+    if response.status_code == 304 and conditions:
+        conditions = http_client.validators(response.headers) or conditions
+    else:
+        response.raise_for_status()  # Raises an HTTPError if the response was unsuccessful
+        html = response.text
+        conditions = http_client.validators(response.headers)
+    cache_page(url, html, conditions)
+    return html
+
 
-@backoff.on_exception(backoff.expo, RequestException)
-def fetch_page(url: str, **kwargs) -> Optional[BeautifulSoup]:
-    response = requests.get(url, **kwargs, verify = False)
-    response.raise_for_status()  # Raises an HTTPError if the response was unsuccessful
+def fetch_page(url: str, parse_only: Optional[SoupStrainer] = None, **kwargs) -> Optional[BeautifulSoup]:
+    return make_soup(fetch_html(url, **kwargs), parse_only)
 
-    return BeautifulSoup(response.text, 'html.parser')
 
 # Error Handlers
 @app.errorhandler(404)
@@ -33,113 +70,184 @@ def method_not_allowed(e):
     return jsonify(error=str(e)), 405
 
 
-@app.route('/collectives', methods=['GET'])
-def get_collectives():
+# Stage timings are labelled with the route (URL rule) of the API request; see metrics.py
+@app.before_request
+def start_request_metrics():
+    metrics.current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+
+
+# Every API request accounts for the upstream requests it causes and has a
+# deadline (SCRAPER_DEADLINE(S), or ?timeout=<seconds>); see budget.py
+@app.before_request
+def start_request_budget():
     try:
+        deadline = route_deadline(request.path, request.args.get('timeout'))
+    except ValueError as e:
+        current_budget.set(RequestBudget())
+        return jsonify({"error": str(e)}), 400
+    current_budget.set(RequestBudget(deadline=deadline))
+
+
+@app.after_request
+def add_budget_headers(response):
+    budget = current_budget.get()
+    # a streamed body is produced after the headers are sent, so its counts aren't known yet
+    if budget is not None and not response.is_streamed:
+        response.headers.update(budget.headers())
+    return response
 
-        url = "https://stackoverflow.com/collectives-all"
-        soup = fetch_page(url)
-        collectives = []
 
-        # Find all collective divs
-        collective_divs = soup.find_all("div", class_="flex--item s-card bs-sm mb12 py16 fc-black-500")
+def deadline_exceeded():
+    return jsonify({"error": "Deadline exceeded"}), 504
 
-        for collective in collective_divs:
-            # Extract the collective's name (title)
-            name_elem = collective.find("a", class_="js-gps-track")
-            name = name_elem.text.strip() if name_elem else "No name found"
 
-            # Extract the link to the collective
-            link = f"{name_elem['href']}" if name_elem and 'href' in name_elem.attrs else ""
-            full_link = f"https://stackoverflow.com{link}"
-            # Extract the description (if any)
-            description_span = collective.find('span', class_="fs-body1 v-truncate2 ow-break-word")
-            description = description_span.text.strip() if description_span else "No description found"
+def not_found(message: str):
+    """404 with ``message``, or 504 when the deadline passed before anything was scraped."""
+    if timed_out():
+        return deadline_exceeded()
+    return jsonify({"error": message}), 404
 
-            # Extract the slug or type (if applicable)
-            slug = name_elem['href'].split('/')[-1] if name_elem and 'href' in name_elem.attrs else "No slug found"
 
-            tags = get_collective_tags(full_link)
-            external_links = get_external_links(full_link)
+def wants_stream() -> bool:
+    """Streaming mode is asked for with ``?stream=1`` or ``Accept: application/x-ndjson``."""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
 
-            collectives.append({
-                "name": name,
-                "link": link,
-                "description": description,
-                "slug": slug,
-                "tags": tags,
-                "external_links": external_links
-            })
 
-            # Add a small delay to avoid overwhelming the server
-            time.sleep(1)
+def ndjson_response(items: Iterable[Any]) -> Response:
+    """Stream ``items`` as newline-delimited JSON, one line per item as it is
+    produced, and ``PARTIAL_LINE`` last if the results are partial."""
+    def lines():
+        for item in items:
+            yield app.json.dumps(item) + '\n'
+        if not within_budget():
+            yield app.json.dumps(PARTIAL_LINE) + '\n'
 
-        return jsonify(collectives)
+    return Response(stream_with_context(lines()), mimetype=NDJSON_MIMETYPE)
+
+
+def conditional_response(payload: Any, modified: Optional[int] = None) -> Response:
+    """JSON response with an ETag (a hash of the body) and, when known, a
+    Last-Modified date; a request whose If-None-Match (or If-Modified-Since)
+    still matches gets an empty 304 instead."""
+    response = jsonify(payload)
+    response.add_etag()
+    if modified is not None:
+        response.last_modified = modified
+    return response.make_conditional(request)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# Internal counters for dashboards (connection reuse etc.)
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    return jsonify({"http": http_client.get_stats(), "cache": default_cache.get_stats(),
+                    "store": default_store.get_stats(),
+                    "rate_limit": upstream_controller.get_stats()})
+
+
+@app.route('/prefetch', methods=['GET'])
+def get_prefetch_state():
+    return jsonify(prefetcher.get_state())
+
+
+@app.route('/collectives', methods=['GET'])
+def get_collectives():
+    try:
+        if wants_stream():
+            collectives = iter_collectives()
+            # start the crawl here so errors before the first item still get a 500
+            first = next(collectives, None)
+            return ndjson_response(itertools.chain([first], collectives) if first is not None else [])
+        return jsonify(scrape_collectives())
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# Runs one tag crawl and one external-link fetch per collective. Tag pages
+# themselves are fetched on enrichment_pool, so these tasks never wait on
+# their own pool. Upstream pacing comes from the global rate limiter.
+COLLECTIVE_WORKERS = int(os.getenv('SCRAPER_COLLECTIVE_WORKERS', 8))
+collective_pool = ContextThreadPoolExecutor(max_workers=COLLECTIVE_WORKERS, thread_name_prefix='collective')
+
+
+def scrape_collectives() -> List[Collective]:
+    return list(iter_collectives())
+
+
+@cached_iter('collectives', should_cache=lambda collectives: bool(collectives) and within_budget())
+def iter_collectives() -> Iterator[Collective]:
+    """Yield every collective, in page order, once its tags and external links are crawled.
+
+    Past the request's deadline the remaining collectives are yielded with
+    whatever crawls have finished, the others left empty.
+    """
+    url = "https://stackoverflow.com/collectives-all"
+    soup = fetch_page(url, COLLECTIVES_PAGE_ONLY)
+    collectives = parse_collectives(soup)
+
+    crawls = []
+    for collective in collectives:
+        full_link = f"https://stackoverflow.com{collective['link']}"
+        crawls.append((collective_pool.submit(get_collective_tags, full_link),
+                       collective_pool.submit(get_external_links, full_link)))
+
+    try:
+        for collective, crawl in zip(collectives, crawls):
+            for field, future in zip(('tags', 'external_links'), crawl):
+                try:
+                    collective[field] = wait_result(future)
+                except DeadlineExceeded:
+                    pass
+            yield collective
+    finally:
+        for futures in crawls:
+            for future in futures:
+                future.cancel()
+
+
 def get_collective_tags(base_url):
     tags = []
     page = 1
     while True:
-        try:
-            url = f"{base_url}?tab=tags&page={page}&pagesize=30"
-            soup = fetch_page(url)
+        # Request the next few pages at once; the crawl ends at the first empty page
+        window = [enrichment_pool.submit(fetch_collective_tags_page, base_url, page + i)
+                  for i in range(COLLECTIVE_TAG_PAGE_WINDOW)]
+        for future in window:
+            try:
+                page_tags = future.result()
+            except requests.RequestException:
+                page_tags = []
 
-            tag_elements = soup.find_all("a", class_="s-tag post-tag")
+            if not page_tags:
+                for pending in window:
+                    pending.cancel()
+                return tags
 
-            if not tag_elements:
-                break
+            tags.extend(page_tags)
 
-            for tag in tag_elements:
-                tags.append(tag.text)
+        page += COLLECTIVE_TAG_PAGE_WINDOW
 
-            page += 1
-            time.sleep(1)  # Add a small delay between requests
-        except requests.RequestException:
-            break
-
-    return tags
 
+def fetch_collective_tags_page(base_url: str, page: int) -> List[str]:
+    url = f"{base_url}?tab=tags&page={page}&pagesize=30"
+    return parse_collective_tags(fetch_page(url, COLLECTIVE_TAGS_ONLY))
 
-#this was changed: Check and see if it works well or not: update: it works so refine!!!!!!!!!!!!!!!!!!!!
 
 def get_external_links(url):
     external_links = []
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
-                          'Chrome/91.0.4472.124 Safari/537.36'
-        }
-        soup = fetch_page(url, headers=headers)
-
-        header = soup.find("div", class_="s-select")
-        if header:
-            external_div = header.find("optgroup", label="External links")
-            if external_div:
-                externals = external_div.find_all("option")
-                external_website = ["website", "support", "twitter", "github", "facebook", "instagram"]
-
-                for i, external in enumerate(externals):
-                    if i >= len(external_website):
-                        break
-
-                    external_link = {
-                        "type": external_website[i],
-                        "link": external.get("data-url")
-                    }
-
-                    if external_link["link"]:
-                        external_links.append(external_link)
-                        print(external_link)
-
-        if not external_links:
-            print(f"No relevant external links found for {url}")
+        soup = fetch_page(url, EXTERNAL_LINKS_ONLY, headers=COLLECTIVE_PAGE_HEADERS)
+        external_links = parse_external_links(soup, url)
 
     except requests.RequestException as e:
-        print(f"Error fetching external links for {url}: {str(e)}")
+        logging.warning(f"Error fetching external links for {url}: {str(e)}")
 
     return external_links
 
@@ -147,289 +255,179 @@ def get_external_links(url):
 @app.route('/questions', methods=['GET'])
 def get_questions():
     try:
-        page = int(request.args.get('page', 1))
-        pagesize = int(request.args.get('pagesize', 30))
-        tags_param = request.args.get('tags', '')
-        tags = tags_param.split(';')[:3]
-
-        tags = [tag.strip() for tag in tags if tag.strip()]
-
-
+        try:
+            page, pagesize, tags = questions_args(request.args)
+            query = parse_question_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if query is not None:
+            questions = default_store.query_questions(tags, page=page, pagesize=pagesize, **query)
+            if questions is None:
+                # the listing page is not stored: sort and filter it as scraped
+                questions = filter_questions(get_detailed_questions(page, pagesize, tags), **query)
+            if not questions:
+                return not_found("No questions found")
+            return ndjson_response(questions) if wants_stream() else jsonify(questions)
+
+        if wants_stream():
+            questions = iter_detailed_questions(page, pagesize, tags)
+            # the first question decides between a stream and the 404 below
+            first = next(questions, None)
+            if first is None:
+                return not_found("No questions found or error occurred during scraping")
+            return ndjson_response(itertools.chain([first], questions))
 
         questions = get_detailed_questions(page, pagesize, tags)
 
         if not questions:
-            return jsonify({"error": "No questions found or error occurred during scraping"}), 404
+            return not_found("No questions found or error occurred during scraping")
 
         return jsonify(questions)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def get_detailed_questions(page: int = 1, pagesize: int = 30, tags: List[str] = None) -> List[Dict[str, Any]]:
-    questions: List[Dict[str, Any]] = []
+# Bounded pool for the per-question enrichment fetches (user page, timeline,
+# accepted answer). Per-host concurrency is capped separately in http_client.
+ENRICH_WORKERS = int(os.getenv('SCRAPER_ENRICH_WORKERS', 16))
+enrichment_pool = ContextThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix='enrich')
+
+
+def read_stream(response: requests.Response, *markers: bytes) -> bytes:
+    """Read a streamed response until ``markers`` have been seen (or it ends)."""
+    scanner = StreamScanner(*markers)
+    chunks = response.iter_content(STREAM_CHUNK_SIZE)
+    for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    if not STREAM_EARLY_STOP:
+        for _ in chunks:
+            pass
+    return scanner.data
+
+
+def fetch_user_ids(user_link: str) -> Tuple[Optional[str], Optional[str]]:
+    """Scrape a user's profile page for the (accountId, userId) in its script block.
+
+    Callers go through ``user_resolver`` so each user is only scraped once.
+    """
+    url = f"https://stackoverflow.com{user_link}"
+    with metrics.timed('fetch'):
+        with http_client.stream(url, headers={'User-Agent': 'Mozilla/5.0'}) as user_response:
+            body = read_stream(user_response, *USER_IDS_END) if user_response.status_code == 200 else None
+    if body is None:
+        return None, None
+    return parse_user_ids(body)
+
+
+# Shared, memoized user_link -> (account_id, user_id) lookups
+user_resolver = UserResolver(fetch_user_ids, enrichment_pool)
+
+
+def fetch_timeline_dates(question_id: int) -> Dict[str, int]:
+    """Read the question's creation/closed/edit/locked dates from its timeline page."""
+    timeline_url = f"https://stackoverflow.com/posts/{question_id}/timeline"
+    with metrics.timed('fetch'):
+        with http_client.stream(timeline_url, headers={'User-Agent': 'Mozilla/5.0'}) as timeline_response:
+            # an error page has no dates; raising keeps the question from being stored without them
+            timeline_response.raise_for_status()
+            body = read_stream(timeline_response, *TIMELINE_END)
+    return parse_timeline_dates(body)
+
+
+def fetch_question_details(question_url: str) -> Tuple[Optional[int], Dict[str, int]]:
+    """Load the full question page for its accepted answer id and the dates it shows."""
+    question_response = http_client.get(question_url, headers={'User-Agent': 'Mozilla/5.0'})
+    question_response.raise_for_status()
+    return run_parser(extract_question_details, question_response.text)
+
+
+def _enrichment_result(future: Optional[Future], what: str, question_id: Any) -> Any:
+    # A failed enrichment (or one still running at the deadline) only loses
+    # its own fields, never the rest of the page
+    if future is None:
+        return None
     try:
-        if isinstance(tags, str):
-            tag_list = tags.split(';')[:3]  # Split by semicolon and limit to 3 tags
-        elif isinstance(tags, list):
-            tag_list = tags[:3]  # Limit to 3 tags
-        else:
-            tag_list = []
-
-        base_url = "https://stackoverflow.com/questions"
-
-        if tag_list:
-            tags_query = '+'.join(tag_list)  # Join tags with '+' for multi-tag queries
-            url = f"{base_url}/tagged/{tags_query}?sort=RecentActivity&edited=true&page={page}&pagesize={pagesize}"
-        else:
-            url = f"{base_url}?tab=Active&page={page}&pagesize={pagesize}"
-
-        soup = fetch_page(url, headers={'User-Agent': 'Mozilla/5.0'})
-        question_summaries = soup.find_all("div", class_="s-post-summary")
-
-        for summary in question_summaries:
-            question: Dict[str, Any] = {}
-
-            question_tags = [tag.text for tag in summary.find_all("a", class_="post-tag")]
-
-            # Filter by specified tags
-            if tag_list:
-                if not all(tag.lower() in [t.lower() for t in question_tags] for tag in tag_list):
-                    continue  # Skip this question if it doesn't match all specified tags
-
-            question['tags'] = question_tags
-
-            # Owner information
-            owner_div = summary.find("div", class_="s-user-card")
-            if owner_div:
-                user_div = owner_div.find("div", class_="s-user-card--link d-flex gs4")
-                user_link_div = user_div.find("a") if user_div else None
-                user_link = user_link_div.get('href') if user_link_div else None
-                user_id = user_link.split('/')[-2] if user_link else None
-
-                user_type = soup.find("div", class_="s-badge")
-                # normal registered user
-                user_status = "registered"
-                account_id = None
-
-                if user_type:
-                    if user_type.text == "Moderator":
-                        user_status = "moderator"
-                    elif user_type == "Unregistered":
-                        user_status = "unregistered"
-
-                if user_link:
-                    url = f"https://stackoverflow.com{user_link}"
-                    user_response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-                    if user_response.status_code == 200:
-                        user_soup = BeautifulSoup(user_response.text, 'html.parser')
-                        script_tags = user_soup.find_all("script")
-                        for script in script_tags:
-                            script_content = script.string
-                            if script_content and "accountId" in script_content:
-                                account_id_match = re.search(r'accountId:\s*(\d+)', script_content)
-                                if account_id_match:
-                                    account_id = account_id_match.group(1)
-                                user_id_match = re.search(r'userId:\s*(\d+)', script_content)
-                                if user_id_match:
-                                    user_id = user_id_match.group(1)
-                                break
-
-                # Debug print for profile image
-                img_element = owner_div.find("img", class_="s-avatar--image")
-
-                reputation_span = owner_div.find("span", title="reputation score ")
-                reputation = reputation_span.get_text(strip=True) if reputation_span else "0"
-
-                question['owner'] = {
-                    "user_id": int(user_id) if user_id and user_id.isdigit() else None,
-                    "user_type": user_status,
-                    "profile_image": img_element['src'],
-                    "display_name": user_link.split('/')[-1] if user_link else "Anonymous",
-                    "link": f"https://stackoverflow.com{user_link}" if user_link else None,
-                    "reputation": reputation
-
-                }
-                if account_id:
-                    question['owner']["account_id"] = int(account_id)
-                if user_id:
-                    question['owner']["user_id"] = int(user_id)
-
-            else:
-                question['owner'] = {
-                    "user_type": "does_not_exist",
-                    "display_name": "User does not exist",
-                    "link": None,
-                    "reputation": "0"
-                }
-
-            # Question ID and link
-            question_link = summary.find("h3", class_="s-post-summary--content-title").find("a")
-            if question_link and question_link.has_attr('href'):
-                question['question_id'] = int(question_link['href'].split('/')[2])
-                question['link'] = f"https://stackoverflow.com{question_link['href']}"
-
-                question['title'] = question_link.text
+        return wait_result(future)
+    except Exception as e:
+        logging.warning(f"Failed to fetch {what} for question {question_id}: {str(e)}")
+        return None
 
 
-                # Fetch the timeline page for more accurate date information
-                timeline_url = f"https://stackoverflow.com/posts/{question['question_id']}/timeline"
-                timeline_response = requests.get(timeline_url, headers={'User-Agent': 'Mozilla/5.0'})
-                timeline_soup = BeautifulSoup(timeline_response.text, 'html.parser')
-
-                # Extract dates from the timeline
-                timeline_entries = timeline_soup.find_all("tr", class_="event-rows")
-                for entry in timeline_entries:
-                    event_type = entry.get("data-eventtype")
-                    date = entry.find("span", class_="relativetime")
-                    if date and "title" in date.attrs:
-                        date_str = date["title"]
-                        if event_type == "question":
-                            question['creation_date'] = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%SZ")
-                        elif event_type == "closed":
-                            question['closed_date'] = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%SZ")
-                        elif event_type == "edit":
-                            question['last_edit_date'] = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%SZ")
-                        elif event_type == "locked":
-                            question['locked_date'] = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%SZ")
-                        elif event_type == "protected":
-                            question['last_activity_date'] = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%SZ")
-
-
-                # If dates are not found in timeline, try to extract from the question summary
-                if 'creation_date' not in question:
-                    date_span = summary.find('span', class_='relativetime')
-                    question['creation_date'] = date_span["title"] if date_span and "title" in date_span.attrs else None
-
-                if 'last_activity' not in question:
-                    date_span = summary.find('span', class_='relativetime')
-                    question['last_activity'] = date_span["title"] if date_span and "title" in date_span.attrs else None
-
-
-                # Set default values for dates not found
-                question.setdefault('closed_date', None)
-                question.setdefault('last_edit_date', None)
-                question.setdefault('last_activity', None)
-                question.setdefault('locked', None)
-                question.setdefault('protected', None)
-
-            else:
-                question['question_id'] = None
-                question['link'] = None
-                question['title'] = None
-                question['creation_date'] = None
-                question['closed_date'] = None
-                question['last_edit_date'] = None
-                question['last_activity_date'] = None
-
-
-
-            # Content license extraction
-            link = summary.find("a", class_=["js-share-link", "js-gps-track"])
-            if link and "data-se-share-sheet-license-name" in link.attrs:
-                question['content_license'] = link["data-se-share-sheet-license-name"]
-            else:
-                # Fallback to the previous method if this new approach doesn't work
-                license_element = summary.find("div", class_="s-post-summary--meta")
-                if license_element:
-                    license_text = license_element.find("div", class_="s-post-summary--meta-text")
-                    if license_text:
-                        license_text = license_text.get_text(strip=True)
-                        if "CC BY-SA 4.0" in license_text:
-                            question['content_license'] = "CC BY-SA 4.0"
-                        elif "CC BY-SA 3.0" in license_text:
-                            question['content_license'] = "CC BY-SA 3.0"
-                        else:
-                            question['content_license'] = license_text
-                    else:
-                        question['content_license'] = "CC BY-SA 4.0"  # Default if not found
-                else:
-                    question['content_license'] = "CC BY-SA 4.0"  # Default if not found
-
-
-            # Stats extraction
-            stats_container = summary.find("div", class_="s-post-summary--stats")
-            if stats_container:
-                for item in stats_container.find_all("div", class_="s-post-summary--stats-item"):
-                    title = item.get('title', '')
-                    value_span = item.find("span", class_="s-post-summary--stats-item-number")
-                    if value_span:
-                        value = value_span.text.strip()
-                        if "Score" in title:
-                            question['score'] = int(value)
-                        elif "answer" in title.lower():
-                            question['answer_count'] = int(value)
-                        elif "view" in title.lower():
-                            if 'k' in value.lower():
-                                question['view_count'] = int(float(value.lower().replace('k', '').strip()) * 1000)
-                            else:
-                                question['view_count'] = int(re.sub(r'\D', '', value))
-
-                # If any stat is missing, set it to 0
-                question['score'] = question.get('score', 0)
-                question['answer_count'] = question.get('answer_count', 0)
-                question['view_count'] = question.get('view_count', 0)
-            else:
-                print("Debug: Stats container not found")
-
-            accepted_answer = summary.find("div", class_="s-post-summary--stats-item has-answers has-accepted-answer")
-            has_accepted_answer = accepted_answer is not None
-
-            # Determine if the question is answered based on the new logic
-            if question['score'] > 0:
-                question['is_answered'] = True
-            elif question['score'] <= 0:
-                question['is_answered'] = False
-            else:
-                question['is_answered'] = False
-
-
-            if accepted_answer:
-                question_link = summary.find("h3", class_="s-post-summary--content-title").find("a")
-                if question_link and question_link.has_attr('href'):
-                    question_url = f"https://stackoverflow.com{question_link['href']}"
-
-                    question_response = requests.get(question_url, headers={'User-Agent': 'Mozilla/5.0'})
-                    question_response.raise_for_status()
-
-                    question_soup = BeautifulSoup(question_response.text, 'html.parser')
-
-                    # Try multiple selectors to find the accepted answer
-                    selectors = [
-                        "div.answer.accepted-answer",
-                        "div[itemprop='acceptedAnswer']",
-                        "div.accepted-answer",
-                        "div.js-accepted-answer"
-                    ]
-
-                    accepted_answer_div = None
-                    for selector in selectors:
-                        accepted_answer_div = question_soup.select_one(selector)
-                        if accepted_answer_div:
-                            break
-
-                    if accepted_answer_div:
-                        answer_id = accepted_answer_div.get('data-answerid') or accepted_answer_div.get(
-                            'data-answer-id')
-                        if answer_id:
-                            question['accepted_answer_id'] = int(answer_id)
-                        else:
-                            print("Debug: No answer ID attribute found in accepted answer div")
-                    else:
-                        print(
-                            f"Debug: No accepted answer div found using selectors. HTML Snippet:\n{question_soup.prettify()[:1000]}")
-                else:
-                    print("Debug: No question link found")
-            else:
-                print("No accepted answer indicator found in summary")
-
-            questions.append(question)
+def get_detailed_questions(page: int = 1, pagesize: int = 30, tags: List[str] = None) -> List[Question]:
+    return list(iter_detailed_questions(page, pagesize, tags))
 
 
+@cached_iter('questions', should_cache=lambda questions: bool(questions) and within_budget())
+def iter_detailed_questions(page: int = 1, pagesize: int = 30, tags: List[str] = None) -> Iterator[Question]:
+    """Yield the listed questions in listing order, each as soon as its enrichments are in."""
+    budget = current_budget.get() or RequestBudget()
+    # (listing entry, plan, user future, timeline future, question page future) per listed question
+    pending = []
+    # Whether the listing page itself was read (it may list nothing)
+    fetched = False
+    try:
+        url, tag_list = questions_listing_url(page, pagesize, tags)
+        budget.plan()  # the listing page itself is always fetched
+        html = fetch_html(url, headers={'User-Agent': 'Mozilla/5.0'})
+
+        entries = run_parser(extract_question_summaries, html, tag_list)
+        fetched = True
+        # Questions with no activity since they were stored keep their stored enrichments
+        stored = default_store.reuse_questions(entries)
+        plans = iter(plan_enrichments([entry for entry in entries
+                                       if entry['question']['question_id'] not in stored], budget))
+        for entry in entries:
+            question = entry['question']
+            if question['question_id'] in stored:
+                reuse_enrichments(question, stored[question['question_id']])
+                pending.append((entry, None, None, None, None))
+                continue
+            plan = next(plans)
+            user_future = timeline_future = details_future = None
+            if plan['user']:
+                user_future = user_resolver.submit(entry['user_link'])
+            if plan['timeline']:
+                # Fetch the timeline page for more accurate date information
+                timeline_future = enrichment_pool.submit(fetch_timeline_dates, question['question_id'])
+            if plan['details']:
+                details_future = enrichment_pool.submit(fetch_question_details, entry['accepted_url'])
+            pending.append((entry, plan, user_future, timeline_future, details_future))
+
     except requests.RequestException as e:
-        print(f"Error fetching page {page}: {str(e)}")
+        logging.warning(f"Error fetching page {page}: {str(e)}")
 
-    return questions
+    # Fully enriched questions, stored with the activity marker they were listed with
+    to_store = []
+    # Questions stored or reused, and whether that is all of them once the listing is done
+    listed = []
+    complete = False
+    try:
+        for entry, plan, user_future, timeline_future, details_future in pending:
+            question_id = entry['question']['question_id']
+            details = _enrichment_result(details_future, "accepted answer", question_id)
+            accepted_answer_id, page_dates = details or (None, None)
+            dates = _enrichment_result(timeline_future, "timeline", question_id) if timeline_future else page_dates
+            user_ids = _enrichment_result(user_future, "user profile", question_id)
+            question = complete_question(entry, user_ids, dates, accepted_answer_id)
+            if plan is None:
+                listed.append(question)
+            elif plan['complete'] and all(result is not None for future, result in (
+                    (user_future, user_ids), (timeline_future, dates), (details_future, details)) if future):
+                to_store.append((question, entry['summary_date']))
+                listed.append(question)
+            yield question
+        complete = fetched and len(listed) == len(pending)
+    finally:
+        default_store.put_questions(to_store)
+        if complete:
+            default_store.put_listing(tag_list, page, pagesize, listed)
+        # The consumer went away (e.g. a streaming client disconnected): drop
+        # the fetches nobody will read. User lookups may be shared, so they stay.
+        for _, _, _, timeline_future, details_future in pending:
+            for future in (timeline_future, details_future):
+                if future is not None:
+                    future.cancel()
 
 
 def handle_relative_time(time_str):
@@ -486,10 +484,10 @@ def get_question_tags(base_url):
     while True:
         try:
             url = f"{base_url}?tab=tags&page={page}&pagesize=50"
-            response = requests.get(url)
+            response = http_client.get(url)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             tag_elements = soup.find_all("div", class_="s-post-summary--meta-tags d-inline-block tags js-tags")
 
             if not tag_elements:
@@ -499,376 +497,231 @@ def get_question_tags(base_url):
                 tags.append(tag.text)
 
             page += 1
-            time.sleep(1)  # Add a small delay between requests
         except requests.RequestException:
             break
 
     return tags
 
 
-@app.route('/questions/<int:question_id>', methods=['GET'])
-def get_question_by_id(question_id: int) -> Optional[Dict[str, Any]]:
+@cached('question', key=lambda question_id: str(question_id))
+def get_question_by_id(question_id: int) -> Optional[Question]:
+    question = default_store.get_page('question', question_id)
+    if question is not None:
+        return question
     try:
         url = f"https://stackoverflow.com/questions/{question_id}"
-        soup = fetch_page(url, headers={'User-Agent': 'Mozilla/5.0'})
-
-        question: Dict[str, Any] = {}
-
-        # Question ID and link
-        question['question_id'] = question_id
-        question['link'] = url
-
-        # Title
-        title_element = soup.find("h1", class_="fs-headline1 ow-break-word mb8 flex--item fl1")
-        question['title'] = title_element.text.strip() if title_element else None
-
-        # Tags
-        tags_container = soup.find("div", class_="d-flex ps-relative fw-wrap")
-        question['tags'] = [tag.text for tag in
-                            tags_container.find_all("a", class_="post-tag")] if tags_container else []
-
-        # Owner information
-        owner_div = soup.find("div", class_="post-layout--right")
-        if owner_div:
-            user_info = owner_div.find("div", class_="user-info")
-            if user_info:
-                user_link = user_info.find("a")
-                user_id = user_link['href'].split('/')[-2] if user_link else None
-
-                img_element = user_info.find("img")
-                profile_image = img_element["src"] if img_element else None
-
-                reputation_span = user_info.find("span", class_="reputation-score")
-                reputation = reputation_span.text.strip() if reputation_span else "1"
-
-                display_name = user_info.find("div", class_="user-details").find("a").text.strip()
-
-                user_type = "registered"
-                if "new-contributor-indicator" in str(user_info):
-                    user_type = "new contributor"
-                elif "mod-flair" in str(user_info):
-                    user_type = "moderator"
-
-                question['owner'] = {
-                    "user_id": int(user_id) if user_id and user_id.isdigit() else None,
-                    "user_type": user_type,
-                    "profile_image": profile_image,
-                    "display_name": display_name,
-                    "link": f"https://stackoverflow.com{user_link['href']}" if user_link else None,
-                    "reputation": reputation
-                }
-            else:
-                question['owner'] = {
-                    "user_type": "does_not_exist",
-                    "display_name": "User does not exist",
-                    "link": None,
-                    "reputation": "0"
-                }
-        else:
-            question['owner'] = None
-
-        # Dates
-        creation_date = soup.find("time", itemprop="dateCreated")
-        question['creation_date'] = creation_date['datetime'] if creation_date else None
-
-        last_activity_date = soup.find("time", itemprop="dateModified")
-        question['last_activity'] = last_activity_date['datetime'] if last_activity_date else None
-
-
-        question['last_edit_date'] = None  # Set default value
-        question['closed_date'] = None  # Set default value
-
-        # Content license
-        license_element = soup.find("div", class_="mt-auto d-flex jc-space-between fs-caption fc-black-400")
-        if license_element:
-            license_text = license_element.find("a", rel="license")
-            question['content_license'] = license_text.text if license_text else "CC BY-SA 4.0"
-        else:
-            question['content_license'] = "CC BY-SA 4.0"  # Default if not found
-
-        # Stats
-        stats = soup.find("div", class_="js-vote-count")
-        question['score'] = int(stats.text) if stats else 0
-
-        answer_count = soup.find("h2", class_="mb0", text=lambda text: "Answers" in text if text else False)
-        question['answer_count'] = int(answer_count.find_next("div").text) if answer_count else 0
-
-        # View count
-        view_count_div = soup.find("div", class_="d-flex fw-wrap pb8 mb16 bb bc-black-075")
-        if view_count_div:
-            view_count_text = view_count_div.find("div", class_="flex--item ws-nowrap mb8").text.strip()
-            view_count_match = re.search(r'(\d+)', view_count_text)
-            if view_count_match:
-                question['view_count'] = int(view_count_match.group(1))
-            else:
-                question['view_count'] = 0
-        else:
-            question['view_count'] = 0
-
-        # Is answered and accepted answer
-        accepted_answer = soup.find("div", class_="answer accepted-answer")
-        question['is_answered'] = accepted_answer is not None or question['answer_count'] > 0
-        question['has_accepted_answer'] = accepted_answer is not None
-
-        return question
+        html = fetch_html(url, headers={'User-Agent': 'Mozilla/5.0'})
+        question = run_parser(extract_question_page, html, question_id, url)
 
     except requests.RequestException as e:
-        print(f"Error fetching question {question_id}: {str(e)}")
+        logging.warning(f"Error fetching question {question_id}: {str(e)}")
         return None
 
+    default_store.put_page('question', question_id, question)
+    return question
+
+
 # Usage in Flask route
 @app.route('/questions/<int:question_id>', methods=['GET'])
 def get_question_by_id_route(question_id):
     question = get_question_by_id(question_id)
     if question:
-        return jsonify(question), 200
+        return conditional_response(question, last_modified(question))
     else:
-        return jsonify({"error": "Question not found"}), 404
+        return not_found("Question not found")
 
 
-@app.route('/answers/<int:answer_id>', methods=['GET'])
+@cached('answer', key=lambda answer_id: str(answer_id), should_cache=lambda answers: bool(answers) and within_budget())
 def get_answer_by_id(answer_id):
     try:
         answers = []
         # Correct URL to point to the specific answer using the answer_id
         url = f"https://stackoverflow.com/a/{answer_id}"
-        soup = fetch_page(url, headers={'User-Agent': 'Mozilla/5.0'})
-
-        answer_elements = soup.find_all("div", class_="answer")
-
-        for answer_element in answer_elements:
-            answer: Dict[str, Any] = {}
-
-            # Answer ID
-            answer['answer_id'] = answer_element.get('data-answerid')
-
-            # Score
-            score_element = answer_element.find("div", class_="js-vote-count")
-            answer['score'] = int(score_element.text) if score_element else 0
-
-            # Is accepted
-            answer['is_accepted'] = 'accepted-answer' in answer_element.get('class', [])
-
-            # Creation date
-            creation_date = answer_element.find("time", itemprop="dateCreated")
-            answer['creation_date'] = creation_date['datetime'] if creation_date else None
-
-            # Last activity date
-            last_activity_date = answer_element.find("time", itemprop="dateModified")
-            answer['last_activity_date'] = last_activity_date['datetime'] if last_activity_date else None
-
-            # Owner information
-            owner_div = answer_element.find("div", class_="post-layout--right")
-            if owner_div:
-                user_info = owner_div.find("div", class_="user-info")
-                if user_info:
-                    user_link = user_info.find("a")
-                    user_id = user_link['href'].split('/')[-2] if user_link else None
-
-                    img_element = user_info.find("img")
-                    profile_image = img_element["src"] if img_element else None
-
-                    reputation_span = user_info.find("span", class_="reputation-score")
-                    reputation = reputation_span.text.strip() if reputation_span else "1"
-
-                    display_name = user_info.find("div", class_="user-details").find("a").text.strip()
-
-                    user_type = "registered"
-                    account_id = None
-                    if "new-contributor-indicator" in str(user_info):
-                        user_type = "new contributor"
-                    elif "mod-flair" in str(user_info):
-                        user_type = "moderator"
-
-                    if user_link:
-                        user_page_url = f"https://stackoverflow.com{user_link['href']}"
-                        user_response = requests.get(user_page_url, headers={'User-Agent': 'Mozilla/5.0'})
-                        if user_response.status_code == 200:
-                            user_soup = BeautifulSoup(user_response.text, 'html.parser')
-                            script_tags = user_soup.find_all("script")
-                            for script in script_tags:
-                                script_content = script.string
-                                if script_content and "accountId" in script_content:
-                                    account_id_match = re.search(r'accountId:\s*(\d+)', script_content)
-                                    if account_id_match:
-                                        account_id = account_id_match.group(1)
-                                    user_id_match = re.search(r'userId:\s*(\d+)', script_content)
-                                    if user_id_match:
-                                        user_id = user_id_match.group(1)
-                                    break
-
-                        answer['owner'] = {
-                            "user_id": int(user_id) if user_id and user_id.isdigit() else None,
-                            "user_type": user_type,
-                            "account_id": account_id,
-                            "profile_image": profile_image,
-                            "display_name": display_name,
-                            "link": f"https://stackoverflow.com{user_link['href']}" if user_link else None,
-                            "reputation": reputation
-                        }
-                    else:
-                        answer['owner'] = {
-                            "user_type": "does_not_exist",
-                            "display_name": "User does not exist",
-                            "link": None,
-                            "reputation": "0"
-                        }
-                else:
-                    answer['owner'] = None
+        html = fetch_html(url, headers={'User-Agent': 'Mozilla/5.0'})
+
+        parsed = run_parser(extract_answers, html)
+        user_ids = user_resolver.resolve_many(user_href for _, user_href in parsed if user_href)
 
+        for answer, user_href in parsed:
+            if user_href:
+                apply_user_ids(answer['owner'], user_ids[user_href])
             answers.append(answer)
 
+        # /a/<id> of any answer on this page returns the same page
+        for answer in answers:
+            if answer['answer_id'] and answer['answer_id'] != str(answer_id) and within_budget():
+                default_cache.set('answer', answer['answer_id'], answers)
+
         return answers
     except requests.RequestException as e:
         return None
 
+
 @app.route('/answers/<int:answer_id>', methods=['GET'])
 def get_answer_by_id_route(answer_id):
     answer = get_answer_by_id(answer_id)
     if answer:
         return jsonify(answer), 200
     else:
-        return jsonify({"error": "Answer not found"}), 404
+        return not_found("Answer not found")
 
 
 @app.route('/questions/<int:question_id>/answers', methods=['GET'])
 def get_answers_for_question(question_id):
     logging.debug(f"Function called with question_id: {question_id}")
+    payload, status = scrape_answers_for_question(question_id)
+    if status == 500 and timed_out():
+        return deadline_exceeded()
+    if status == 200:
+        return conditional_response(payload, last_modified(payload))
+    return jsonify(payload), status
+
+
+@cached('question_answers', key=lambda question_id: str(question_id),
+        should_cache=lambda result: result[1] == 200 and within_budget())
+def scrape_answers_for_question(question_id: int) -> Tuple[Dict[str, Any], int]:
+    """Scrape the answers of a question, returning (payload, HTTP status)."""
+    stored = default_store.get_page('question_answers', question_id)
+    if stored is not None:
+        return stored, 200
     try:
         url = f"https://stackoverflow.com/questions/{question_id}"
         logging.debug(f"Requesting URL: {url}")
-        soup = fetch_page(url, headers={'User-Agent': 'Mozilla/5.0'})
+        html = fetch_html(url, headers={'User-Agent': 'Mozilla/5.0'})
         try:
-
+            extracted = run_parser(extract_question_answers, html, question_id)
             logging.debug("BeautifulSoup parsing completed")
         except Exception as e:
             logging.error(f"Error parsing HTML: {str(e)}", exc_info=True)
-            return jsonify({"error": "Error parsing the page content"}), 500
+            return {"error": "Error parsing the page content"}, 500
 
-        question_element = soup.find('div', id='question')
-        if not question_element:
+        if extracted is None:
             logging.warning("Question not found")
-            return jsonify({"error": "Question not found"}), 404
+            return {"error": "Question not found"}, 404
+        question, parsed = extracted
 
-        question = {'question_id': question_id, 'answers': []}
-
-        # Extract content license for the question
-        license_element = question_element.find('div', class_='post-menu')
-        if license_element:
-            license_link = license_element.find('a', class_='js-license-link')
-            if license_link:
-                question['content_license'] = license_link.text.strip()
-
-        try:
-            answer_elements = soup.find_all("div", class_="answer")
-            logging.debug(f"Found {len(answer_elements)} answer elements")
-        except Exception as e:
-            logging.error(f"Error finding answer elements: {str(e)}", exc_info=True)
-            return jsonify({"error": "Error processing the page structure"}), 500
-
-        for answer_element in answer_elements:
+        # Look the owners up as one batch; each distinct user is fetched once
+        lookups = {user_href: user_resolver.submit(user_href) for _, user_href in parsed if user_href}
+        for answer, user_href in parsed:
             try:
-                answer: Dict[str, Any] = {}
-
-                # Answer ID
-                answer['answer_id'] = answer_element.get('data-answerid')
-
-                # Score
-                score_element = answer_element.find("div", class_="js-vote-count")
-                answer['score'] = int(score_element.text) if score_element else 0
-
-                # Is accepted
-                answer['is_accepted'] = 'accepted-answer' in answer_element.get('class', [])
-
-                # Creation date
-                creation_date = answer_element.find("time", itemprop="dateCreated")
-                answer['creation_date'] = creation_date['datetime'] if creation_date else None
-
-                edit_date = answer_element.find('div', class_='grid--cell ws-nowrap mr16 mb8')
-                answer['last_activity_date'] = edit_date['datetime'] if edit_date else None
-
-                # Last activity date
-                last_activity_element = answer_element.find('div', class_='grid--cell ws-nowrap mr16 mb8')
-                if last_activity_element:
-                    last_activity_time = last_activity_element.find('time')
-                    if last_activity_time:
-                        answer['last_activity_date'] = last_activity_time['datetime']
-
-                # Owner information
-                owner_div = answer_element.find("div", class_="post-layout--right")
-                if owner_div:
-                    user_info = owner_div.find("div", class_="user-info")
-                    if user_info:
-                        user_link = user_info.find("a")
-                        user_id = user_link['href'].split('/')[-2] if user_link else None
-
-                        img_element = user_info.find("img")
-                        profile_image = img_element["src"] if img_element else None
-
-                        reputation_span = user_info.find("span", class_="reputation-score")
-                        reputation = reputation_span.text.strip() if reputation_span else "1"
-
-                        display_name = user_info.find("div", class_="user-details").find("a")
-
-                        user_type = "registered"
-                        if "new-contributor-indicator" in str(user_info):
-                            user_type = "new contributor"
-                        elif "mod-flair" in str(user_info):
-                            user_type = "moderator"
-
-                        account_id = None
-                        if user_link:
-                            user_page_url = f"https://stackoverflow.com{user_link['href']}"
-                            user_response = requests.get(user_page_url, headers={'User-Agent': 'Mozilla/5.0'})
-                            if user_response.status_code == 200:
-                                user_soup = BeautifulSoup(user_response.text, 'html.parser')
-                                script_tags = user_soup.find_all("script")
-                                for script in script_tags:
-                                    script_content = script.string
-                                    if script_content and "accountId" in script_content:
-                                        account_id_match = re.search(r'accountId:\s*(\d+)', script_content)
-                                        if account_id_match:
-                                            account_id = account_id_match.group(1)
-                                        user_id_match = re.search(r'userId:\s*(\d+)', script_content)
-                                        if user_id_match:
-                                            user_id = user_id_match.group(1)
-                                        break
-
-                        answer['owner'] = {
-                            "user_id": int(user_id) if user_id and user_id.isdigit() else None,
-                            "account_id": int(account_id) if account_id else None,
-                            "user_type": user_type,
-                            "profile_image": profile_image,
-                            "display_name": display_name.text if display_name else None,
-                            "link": f"https://stackoverflow.com{user_link['href']}" if user_link else None,
-                            "reputation": reputation
-                        }
-                    else:
-                        answer['owner'] = {
-                            "user_type": "does_not_exist",
-                            "display_name": "User does not exist",
-                            "link": None,
-                            "reputation": "0"
-                        }
-                else:
-                    answer['owner'] = None
+                if user_href:
+                    apply_user_ids(answer['owner'], wait_result(lookups[user_href]))
 
+                question['answers'].append(answer)
+            except DeadlineExceeded:
+                # past the deadline an answer keeps what its page shows
                 question['answers'].append(answer)
             except Exception as e:
                 logging.error(f"Error processing an answer: {str(e)}", exc_info=True)
 
         logging.debug("All answers processed successfully")
-        return jsonify(question), 200
+        if within_budget():
+            default_store.put_page('question_answers', question_id, question)
+            default_store.put_answers(question_id, question['answers'])
+        return question, 200
 
     except requests.RequestException as e:
         logging.error(f"Request error: {str(e)}", exc_info=True)
-        return jsonify({"error": f"Error fetching answers: {str(e)}"}), 500
+        return {"error": f"Error fetching answers: {str(e)}"}, 500
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}", exc_info=True)
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return {"error": "An unexpected error occurred"}, 500
+
+
+# Multi-id routes, as in the StackExchange API: /questions/1;2;3,
+# /answers/4;5;6 and /questions/1;2;3/answers. Ids are deduplicated and each
+# one goes through the cached single-id function; those run on batch_pool and
+# fetch their user profiles on enrichment_pool, so they never wait on their
+# own pool.
+batch_pool = ContextThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+
+def too_many_ids():
+    return jsonify({"error": f"At most {MAX_IDS} ids can be requested at once"}), 400
+
+
+@app.route('/questions/<ids:question_ids>', methods=['GET'])
+def get_questions_by_ids_route(question_ids):
+    if len(question_ids) > MAX_IDS:
+        return too_many_ids()
+    questions = [question for question in get_questions_by_ids(question_ids) if question]
+    if not questions:
+        return not_found("Questions not found")
+    return jsonify(questions), 200
+
+
+def get_questions_by_ids(question_ids: List[int]) -> List[Optional[Question]]:
+    """``get_question_by_id`` for each distinct id, concurrently, in request order."""
+    return list(batch_pool.map(get_question_by_id, dict.fromkeys(question_ids)))
+
+
+@app.route('/questions/<ids:question_ids>/answers', methods=['GET'])
+def get_answers_for_questions(question_ids):
+    if len(question_ids) > MAX_IDS:
+        return too_many_ids()
+    results = list(batch_pool.map(scrape_answers_for_question, dict.fromkeys(question_ids)))
+    questions = [payload for payload, status in results if status == 200]
+    if not questions:
+        if timed_out():
+            return deadline_exceeded()
+        # nothing to return; report why, using the first failure
+        return jsonify(results[0][0]), results[0][1]
+    return jsonify(questions), 200
+
+
+@app.route('/answers/<ids:answer_ids>', methods=['GET'])
+def get_answers_by_ids_route(answer_ids):
+    if len(answer_ids) > MAX_IDS:
+        return too_many_ids()
+    answers = get_answers_by_ids(answer_ids)
+    if not answers:
+        return not_found("Answers not found")
+    return jsonify(answers), 200
+
+
+def get_answers_by_ids(answer_ids: List[int]) -> List[Answer]:
+    """The requested answers, in request order.
+
+    ``get_answer_by_id`` returns every answer on the answer's question page,
+    so an id found on a page that has already been fetched for another id is
+    not fetched again. Pages are fetched ``BATCH_WORKERS`` at a time so that
+    ids on the same question can be picked up from an earlier page.
+    """
+    found: Dict[str, Answer] = {}
+    waiting = list(dict.fromkeys(str(answer_id) for answer_id in answer_ids))
+    in_flight: Dict[Future, str] = {}
+    while waiting or in_flight:
+        while waiting and len(in_flight) < BATCH_WORKERS:
+            answer_id = waiting.pop(0)
+            if answer_id not in found:
+                in_flight[batch_pool.submit(get_answer_by_id, int(answer_id))] = answer_id
+        if not in_flight:
+            continue
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            in_flight.pop(future)
+            for answer in future.result() or []:
+                found.setdefault(answer['answer_id'], answer)
+
+    return [found[str(answer_id)] for answer_id in dict.fromkeys(answer_ids) if str(answer_id) in found]
+
+
+def prefetch_target(path: str, params: Dict[str, str]) -> Target:
+    """The prefetch target warming the cache entry an API call to ``path`` would read."""
+    if path == '/collectives':
+        return Target(path, 'collectives', iter_collectives.refresh)
+    if path == '/questions':
+        page, pagesize, tags = questions_args(params)
+        name = f"/questions?page={page}&pagesize={pagesize}" + (f"&tags={';'.join(tags)}" if tags else "")
+        return Target(name, 'questions', functools.partial(iter_detailed_questions.refresh, page, pagesize, tags))
+    raise ValueError(f"cannot prefetch {path}")
+
+
+prefetcher = Prefetcher([prefetch_target(path, params) for path, params in parse_targets(PREFETCH_TARGETS)])
+if not in_parse_worker():
+    prefetcher.start()
 
-if __name__ == '__main__':
-    import os
 
+if __name__ == '__main__':
     port = int(os.getenv('STACKOVERFLOW_API_PORT', 23467))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,327 @@
+"""Persistent store of scraped posts.
+
+Unlike the response cache, which keeps whole API responses for a fixed TTL,
+the store keeps one row per post, with indexed columns (ids, tags, dates,
+score), and survives restarts:
+
+- ``questions``: the last listing record of each question, keyed by
+  ``question_id``, together with the listing's last-activity marker.
+- ``question_tags``: (tag, question_id) pairs of those questions.
+- ``pages``: the question page views (``question``, ``question_answers``),
+  keyed by (view, question_id).
+- ``answers``: every answer seen on a question page, keyed by ``answer_id``.
+- ``listings``: the ids of the questions on each listing page (tags, page,
+  pagesize) whose questions were all stored.
+
+``query_questions`` answers the ``/questions`` filter and sort parameters for
+one listing page without scraping it: the questions that page listed, filtered
+and sorted like ``filter_questions`` does with a freshly scraped page. A
+listing page is used for ``max_age`` seconds after it was stored, like a page
+view; an older or unknown one is left to scraping (None).
+
+Refresh is incremental. A listing page shows when each question last had
+activity; a question whose marker matches the stored one keeps the stored
+enrichments (owner ids, timeline dates, accepted answer) instead of fetching
+them again. The same marker confirms or invalidates the stored page views: a
+confirmed view stays fresh for another ``max_age`` seconds, a changed one is
+refetched on its next read.
+
+Configured from the environment:
+
+- ``SCRAPER_STORE_PATH``: SQLite file (default ``scraper_store.sqlite3``;
+  ``:memory:`` keeps the store in-process only, an empty value disables it)
+- ``SCRAPER_STORE_MAX_AGE``: seconds a stored page view is served without
+  a listing confirming it is unchanged, and a stored listing page at all
+  (default 3600)
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models import epoch
+
+# Bumped whenever SCHEMA or the stored records change; a store file of another
+# version is emptied and rebuilt (everything in it can be scraped again).
+# 2: dates stored as epoch seconds
+# 3: listings
+# 4: listings keep their question ids
+SCHEMA_VERSION = 4
+TABLES = ('questions', 'question_tags', 'pages', 'answers', 'listings')
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS questions ("
+    "question_id INTEGER PRIMARY KEY, data BLOB NOT NULL, activity TEXT, "
+    "creation_date REAL, last_activity_date REAL, score INTEGER, answer_count INTEGER, "
+    "view_count INTEGER, stored_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS questions_creation_date ON questions (creation_date)",
+    "CREATE INDEX IF NOT EXISTS questions_last_activity_date ON questions (last_activity_date)",
+    "CREATE INDEX IF NOT EXISTS questions_score ON questions (score)",
+    "CREATE TABLE IF NOT EXISTS question_tags ("
+    "tag TEXT NOT NULL, question_id INTEGER NOT NULL, PRIMARY KEY (tag, question_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS question_tags_question_id ON question_tags (question_id)",
+    "CREATE TABLE IF NOT EXISTS pages ("
+    "view TEXT NOT NULL, question_id INTEGER NOT NULL, data BLOB NOT NULL, activity TEXT, "
+    "stored_at REAL NOT NULL, PRIMARY KEY (view, question_id))",
+    "CREATE INDEX IF NOT EXISTS pages_question_id ON pages (question_id)",
+    "CREATE TABLE IF NOT EXISTS answers ("
+    "answer_id INTEGER PRIMARY KEY, question_id INTEGER NOT NULL, data BLOB NOT NULL, "
+    "creation_date REAL, score INTEGER, stored_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS answers_question_id ON answers (question_id)",
+    "CREATE INDEX IF NOT EXISTS answers_creation_date ON answers (creation_date)",
+    # tags: the listing's sorted, lowercased tags joined by ';' ('' when untagged);
+    # question_ids: the listed ids joined by ',' in listing order
+    "CREATE TABLE IF NOT EXISTS listings ("
+    "tags TEXT NOT NULL, page INTEGER NOT NULL, pagesize INTEGER NOT NULL, question_ids TEXT NOT NULL, "
+    "stored_at REAL NOT NULL, PRIMARY KEY (tags, page, pagesize)) WITHOUT ROWID",
+]
+
+# /questions ``sort`` values and the indexed column each one sorts (and ``min``/``max`` filter) on
+SORT_COLUMNS = {'activity': 'last_activity_date', 'creation': 'creation_date', 'votes': 'score'}
+
+# Fields of a listing record that come from the profile, timeline and question
+# page fetches rather than from the listing itself
+ENRICHED_FIELDS = ('creation_date', 'closed_date', 'last_edit_date', 'last_activity', 'locked', 'protected',
+                   'accepted_answer_id')
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _sort_values(question: Dict[str, Any]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    # (creation_date, last_activity_date, score): the indexed columns of a question
+    return epoch(question.get('creation_date')), epoch(question.get('last_activity')), _int(question.get('score'))
+
+
+def _tags_key(tags: Iterable[str]) -> str:
+    return ';'.join(sorted({tag.lower() for tag in tags}))
+
+
+class PostStore:
+    """SQLite store of questions, page views and answers.
+
+    One connection is shared by all threads (the async app calls it on
+    threads too); statements are short, so it is serialised by a lock.
+    """
+
+    def __init__(self, path: str, max_age: float = 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA analysis_limit = 1000")
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for table in TABLES:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+        self._stats = {"hits": 0, "misses": 0, "refreshed": 0, "reused": 0}
+
+    def _count(self, name: str, n: int = 1):
+        self._stats[name] += n
+
+    # Listing records
+
+    def reuse_questions(self, entries: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Stored records of listing entries whose activity marker is unchanged.
+
+        Also confirms or invalidates the stored page views of every listed
+        question.
+        """
+        markers = {entry['question']['question_id']: entry['summary_date'] for entry in entries
+                   if entry['question'].get('question_id') is not None and entry.get('summary_date')}
+        if not markers:
+            return {}
+        now = time.time()
+        with self._lock, self._conn:
+            for question_id, marker in markers.items():
+                self._conn.execute("UPDATE pages SET stored_at = CASE WHEN activity = ? THEN ? ELSE 0 END "
+                                   "WHERE question_id = ? AND activity IS NOT NULL", (marker, now, question_id))
+            placeholders = ",".join("?" * len(markers))
+            rows = self._conn.execute(f"SELECT question_id, activity, data FROM questions "
+                                      f"WHERE question_id IN ({placeholders})", list(markers)).fetchall()
+            reused = {question_id: pickle.loads(data) for question_id, activity, data in rows
+                      if activity == markers[question_id]}
+            self._count("reused", len(reused))
+            self._count("refreshed", len(markers) - len(reused))
+        return reused
+
+    def put_questions(self, questions: Iterable[Tuple[Dict[str, Any], Optional[str]]]):
+        """Store (listing record, activity marker) pairs and index their tags and dates."""
+        now = time.time()
+        with self._lock, self._conn:
+            for question, marker in questions:
+                question_id = question.get('question_id')
+                if question_id is None:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO questions (question_id, data, activity, creation_date, "
+                    "last_activity_date, score, answer_count, view_count, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (question_id, pickle.dumps(question, protocol=pickle.HIGHEST_PROTOCOL), marker,
+                     *_sort_values(question), _int(question.get('answer_count')), _int(question.get('view_count')), now))
+                self._conn.execute("DELETE FROM question_tags WHERE question_id = ?", (question_id,))
+                self._conn.executemany("INSERT OR IGNORE INTO question_tags (tag, question_id) VALUES (?, ?)",
+                                       [(tag.lower(), question_id) for tag in question.get('tags') or []])
+
+    def put_listing(self, tags: Iterable[str], page: int, pagesize: int, questions: List[Dict[str, Any]]):
+        """Record the questions of a listing page, all of them stored; an
+        empty page is recorded too."""
+        question_ids = ','.join(str(question['question_id']) for question in questions)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO listings (tags, page, pagesize, question_ids, stored_at) "
+                               "VALUES (?, ?, ?, ?, ?)", (_tags_key(tags), page, pagesize, question_ids, time.time()))
+
+    def _listed_ids(self, tags: Iterable[str], page: int, pagesize: int) -> Optional[List[int]]:
+        # the ids of a listing page stored less than max_age ago, or None
+        row = self._conn.execute("SELECT question_ids, stored_at FROM listings WHERE tags = ? AND page = ? "
+                                 "AND pagesize = ?", (_tags_key(tags), page, pagesize)).fetchone()
+        if row is None or row[1] + self.max_age <= time.time():
+            return None
+        return [int(question_id) for question_id in row[0].split(',') if question_id]
+
+    def query_questions(self, tags: Iterable[str] = (), sort: str = 'activity', order: str = 'desc',
+                        min: Optional[float] = None, max: Optional[float] = None,
+                        fromdate: Optional[float] = None, todate: Optional[float] = None,
+                        page: int = 1, pagesize: int = 30) -> Optional[List[Dict[str, Any]]]:
+        """The stored questions of one listing page, filtered and sorted like
+        the StackExchange API, or None when that page is not stored (or older
+        than ``max_age``); ``filter_questions`` does the same with a scraped page.
+
+        ``min``/``max`` bound the ``sort`` field (epoch seconds for dates, score
+        for votes), ``fromdate``/``todate`` the creation date. The filters and
+        the order run on the indexed columns; only the matching records are
+        unpickled.
+        """
+        column = SORT_COLUMNS[sort]
+        with self._lock:
+            ids = self._listed_ids(tags, page, pagesize)
+            if not ids:
+                return ids
+            where, params = [f"question_id IN ({','.join('?' * len(ids))})"], list(ids)
+            for bound, op, value in ((column, '>=', min), (column, '<=', max),
+                                     ('creation_date', '>=', fromdate), ('creation_date', '<=', todate)):
+                if value is not None:
+                    where.append(f"{bound} {op} ?")
+                    params.append(value)
+            direction = 'ASC' if order == 'asc' else 'DESC'
+            rows = self._conn.execute(f"SELECT data FROM questions WHERE {' AND '.join(where)} "
+                                      f"ORDER BY {column} {direction}, question_id {direction}", params).fetchall()
+        return [pickle.loads(data) for data, in rows]
+
+    # Question page views
+
+    def get_page(self, view: str, question_id: int) -> Optional[Any]:
+        """A stored page view that is still fresh, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT data, stored_at FROM pages WHERE view = ? AND question_id = ?",
+                                     (view, question_id)).fetchone()
+            fresh = row is not None and row[1] + self.max_age > time.time()
+            self._count("hits" if fresh else "misses")
+        return pickle.loads(row[0]) if fresh else None
+
+    def put_page(self, view: str, question_id: int, data: Any):
+        """Store a page view under the activity marker last seen for its question."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT activity FROM questions WHERE question_id = ?",
+                                     (question_id,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO pages (view, question_id, data, activity, stored_at) "
+                               "VALUES (?, ?, ?, ?, ?)",
+                               (view, question_id, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL),
+                                row[0] if row else None, time.time()))
+
+    def put_answers(self, question_id: int, answers: Iterable[Dict[str, Any]]):
+        now = time.time()
+        rows = [(_int(answer.get('answer_id')), question_id, pickle.dumps(answer, protocol=pickle.HIGHEST_PROTOCOL),
+                 epoch(answer.get('creation_date')), _int(answer.get('score')), now) for answer in answers]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO answers (answer_id, question_id, data, creation_date, "
+                                   "score, stored_at) VALUES (?, ?, ?, ?, ?, ?)",
+                                   [row for row in rows if row[0] is not None])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ('questions', 'pages', 'answers')}
+            return {"path": self.path, **counts, **self._stats}
+
+
+class NullStore:
+    """Stand-in used when the store is disabled: stores nothing, reuses nothing."""
+
+    def reuse_questions(self, entries: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        return {}
+
+    def put_questions(self, questions: Iterable[Tuple[Dict[str, Any], Optional[str]]]):
+        pass
+
+    def put_listing(self, tags: Iterable[str], page: int, pagesize: int, questions: List[Dict[str, Any]]):
+        pass
+
+    def query_questions(self, *args, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        """None: with nothing stored, queries fall back to scraping the listing."""
+        return None
+
+    def get_page(self, view: str, question_id: int) -> Optional[Any]:
+        return None
+
+    def put_page(self, view: str, question_id: int, data: Any):
+        pass
+
+    def put_answers(self, question_id: int, answers: Iterable[Dict[str, Any]]):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"path": None}
+
+
+def _within(value: Optional[int], low: Optional[float], high: Optional[float]) -> bool:
+    if low is None and high is None:
+        return True
+    return value is not None and (low is None or value >= low) and (high is None or value <= high)
+
+
+def filter_questions(questions: Iterable[Dict[str, Any]], sort: str = 'activity', order: str = 'desc',
+                     min: Optional[float] = None, max: Optional[float] = None,
+                     fromdate: Optional[float] = None, todate: Optional[float] = None) -> List[Dict[str, Any]]:
+    """``PostStore.query_questions`` over questions at hand, e.g. a scraped
+    listing page the store does not have: the same filters and order."""
+    position = ('creation', 'activity', 'votes').index(sort)
+    selected = []
+    for question in questions:
+        values = _sort_values(question)
+        if _within(values[position], min, max) and _within(values[0], fromdate, todate):
+            selected.append((values[position], _int(question.get('question_id')) or 0, question))
+    # missing values sort first in ascending order and last in descending order, as in SQLite
+    selected.sort(key=lambda item: (item[0] is not None, item[0] or 0, item[1]), reverse=order != 'asc')
+    return [question for _, _, question in selected]
+
+
+def reuse_enrichments(question: Dict[str, Any], stored: Dict[str, Any]):
+    """Copy the enriched fields of a stored listing record onto a freshly listed question."""
+    for field in ENRICHED_FIELDS:
+        if field in stored:
+            question[field] = stored[field]
+    for field in ('account_id', 'user_id'):
+        if field in stored.get('owner', {}):
+            question['owner'][field] = stored['owner'][field]
+
+
+def _build_default_store():
+    path = os.getenv('SCRAPER_STORE_PATH', 'scraper_store.sqlite3')
+    if not path:
+        return NullStore()
+    return PostStore(path, float(os.getenv('SCRAPER_STORE_MAX_AGE', 3600)))
+
+
+default_store = _build_default_store()
@@ -0,0 +1,60 @@
+"""Fixtures for the tests: the routes of both apps against ``FakeUpstream``.
+
+The scraper modules read their configuration when they are imported, so it is
+set here first: an in-memory cache and post store, no rate limit, no
+prefetching and inline parsing.
+"""
+import asyncio
+import os
+
+os.environ.update({
+    'SCRAPER_CACHE_BACKEND': 'memory',
+    'SCRAPER_STORE_PATH': ':memory:',
+    'SCRAPER_UPSTREAM_RATE': '0',
+    'SCRAPER_PREFETCH': '',
+    'SCRAPER_PARSE_WORKERS': '0',
+})
+
+import pytest  # noqa: E402
+
+from benchmarks.upstream import FakeUpstream, redirect, redirect_async  # noqa: E402
+from cache import default_cache  # noqa: E402
+from store import TABLES, default_store  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def upstream():
+    with FakeUpstream() as upstream:
+        redirect(upstream.url)
+        redirect_async(upstream.url)
+        yield upstream
+
+
+@pytest.fixture(autouse=True)
+def empty_cache_and_store():
+    default_cache.clear()
+    with default_store._lock, default_store._conn:
+        for table in TABLES:
+            default_store._conn.execute(f"DELETE FROM {table}")
+
+
+@pytest.fixture
+def client(upstream):
+    import stackoverflow_scraper
+
+    upstream.reset()
+    return stackoverflow_scraper.app.test_client()
+
+
+@pytest.fixture
+def async_get(upstream):
+    """``async_get(path)``: the async app's response to one GET, as (status, headers, body)."""
+    import async_scraper
+
+    async def get(path, **kwargs):
+        async with async_scraper.app.test_app() as app:
+            response = await app.test_client().get(path, **kwargs)
+            return response.status_code, response.headers, await response.get_data()
+
+    upstream.reset()
+    return lambda path, **kwargs: asyncio.run(get(path, **kwargs))
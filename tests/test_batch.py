@@ -0,0 +1,53 @@
+import json
+
+import async_scraper
+import stackoverflow_scraper
+from cache import default_cache
+from scraping import MAX_IDS
+
+
+def test_questions_by_ids(client, upstream, async_get):
+    response = client.get('/questions/1003;1002;1003')
+    assert response.status_code == 200
+    assert [question['question_id'] for question in response.json] == [1003, 1002]
+    assert upstream.counts()['question'] == 2
+
+    status, _, body = async_get('/questions/1003;1002;1003')
+    assert status == 200
+    assert json.loads(body) == response.json
+    # a single id is still one object
+    assert client.get('/questions/1002').json['question_id'] == 1002
+
+
+def test_answers_by_ids_fetch_each_question_page_once(client, upstream, async_get, monkeypatch):
+    # one page at a time: every later id on a fetched page is picked up from it
+    monkeypatch.setattr(stackoverflow_scraper, 'BATCH_WORKERS', 1)
+    monkeypatch.setattr(async_scraper, 'BATCH_WORKERS', 1)
+    response = client.get('/answers/10021;10031;10020;10022')
+    assert response.status_code == 200
+    assert [answer['answer_id'] for answer in response.json] == ['10021', '10031', '10020', '10022']
+    assert upstream.counts()['answer'] == 2
+
+    default_cache.clear()
+    upstream.reset()
+    status, _, body = async_get('/answers/10021;10031;10020;10022')
+    assert status == 200
+    assert json.loads(body) == response.json
+    assert upstream.counts()['answer'] == 2
+
+
+def test_answers_of_several_questions(client, async_get):
+    response = client.get('/questions/1002;1003/answers')
+    assert response.status_code == 200
+    assert [(question['question_id'], len(question['answers'])) for question in response.json] == [(1002, 3), (1003, 3)]
+    status, _, body = async_get('/questions/1002;1003/answers')
+    assert status == 200
+    assert json.loads(body) == response.json
+
+
+def test_too_many_ids(client, upstream, async_get):
+    path = '/questions/' + ';'.join(str(question_id) for question_id in range(1, MAX_IDS + 2))
+    assert client.get(path).status_code == 400
+    assert async_get(path)[0] == 400
+    assert client.get('/answers/' + path[len('/questions/'):]).status_code == 400
+    assert upstream.counts().get('question', 0) == 0
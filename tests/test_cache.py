@@ -0,0 +1,201 @@
+import asyncio
+import pickle
+import threading
+import time
+
+import pytest
+
+from budget import RequestBudget, current_budget
+from cache import _MISSING, Cache, DiskBackend, MemoryBackend, NullBackend, cached, cached_iter, default_cache
+
+
+def leader_and_follower(call, follower_deadline=None):
+    """Run ``call`` in a thread that blocks until released (the leader), then
+    once more here (the follower); returns (the follower's result, its budget,
+    the seconds it took, the release event, the leader thread)."""
+    release = threading.Event()
+    leader = threading.Thread(target=call, args=(release,))
+    leader.start()
+    time.sleep(0.1)
+    budget = RequestBudget(deadline=follower_deadline)
+    token = current_budget.set(budget)
+    start = time.monotonic()
+    try:
+        result = call(None)
+    finally:
+        current_budget.reset(token)
+    return result, budget, time.monotonic() - start, release, leader
+
+
+def test_follower_gives_up_waiting_at_its_own_deadline():
+    calls = []
+
+    @cached('test', key=lambda release: 'key')
+    def scrape(release):
+        calls.append(release)
+        if release is not None:
+            release.wait(5)
+        return ['own' if release is None else 'leader']
+
+    result, budget, seconds, release, leader = leader_and_follower(scrape, follower_deadline=0.2)
+    release.set()
+    leader.join()
+    assert result == ['own']
+    assert seconds < 1
+    assert budget.headers()['X-Partial-Results'] == 'true'
+    assert len(calls) == 2
+
+
+def test_a_result_that_is_not_cached_is_not_shared():
+    @cached('test', key=lambda release: 'key', should_cache=lambda items: items != ['partial'])
+    def scrape(release):
+        if release is not None:
+            release.wait(5)
+            return ['partial']
+        return ['full']
+
+    def call(release):
+        if release is not None:
+            threading.Timer(0.2, release.set).start()
+        return scrape(release)
+
+    result, budget, _, _, leader = leader_and_follower(call)
+    leader.join()
+    assert result == ['full']
+    assert 'X-Partial-Results' not in budget.headers()
+
+
+def test_a_partial_stream_is_not_replayed():
+    @cached_iter('test', key=lambda release: 'key', should_cache=lambda items: len(items) > 1)
+    def scrape(release):
+        if release is not None:
+            release.wait(5)
+            yield 'partial'
+            return
+        yield from ('a', 'b')
+
+    def call(release):
+        if release is not None:
+            threading.Timer(0.2, release.set).start()
+        return list(scrape(release))
+
+    result, _, _, _, leader = leader_and_follower(call)
+    leader.join()
+    assert result == ['a', 'b']
+
+
+def test_concurrent_misses_share_one_call_async():
+    calls = []
+
+    @cached('test', key=lambda: 'key')
+    async def scrape():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return ['shared']
+
+    async def main():
+        return await asyncio.gather(scrape(), scrape())
+
+    assert asyncio.run(main()) == [['shared'], ['shared']]
+    assert len(calls) == 1
+
+
+def test_follower_gives_up_waiting_at_its_own_deadline_async():
+    calls = []
+
+    @cached('test', key=lambda slow: 'key')
+    async def scrape(slow):
+        calls.append(slow)
+        await asyncio.sleep(1 if slow else 0)
+        return ['leader' if slow else 'own']
+
+    async def follow():
+        current_budget.set(budget)
+        return await scrape(False)
+
+    async def main():
+        leader = asyncio.ensure_future(scrape(True))
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        result = await asyncio.ensure_future(follow())
+        seconds = time.monotonic() - start
+        await leader
+        return result, seconds
+
+    budget = RequestBudget(deadline=0.2)
+    result, seconds = asyncio.run(main())
+    assert result == ['own']
+    assert seconds < 0.8
+    assert budget.timed_out == 1
+    assert calls == [True, False]
+
+
+def test_a_result_that_is_not_cached_is_not_shared_async():
+    @cached('test', key=lambda slow: 'key', should_cache=lambda items: items != ['partial'])
+    async def scrape(slow):
+        await asyncio.sleep(0.1 if slow else 0)
+        return ['partial' if slow else 'full']
+
+    async def main():
+        return await asyncio.gather(scrape(True), scrape(False))
+
+    assert asyncio.run(main()) == [['partial'], ['full']]
+
+
+def test_no_sharing_without_a_cache(monkeypatch):
+    monkeypatch.setattr(default_cache, 'backend', NullBackend())
+    calls = []
+
+    @cached('test', key=lambda: 'key')
+    async def scrape():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return ['result']
+
+    async def main():
+        return await asyncio.gather(scrape(), scrape())
+
+    assert asyncio.run(main()) == [['result'], ['result']]
+    assert len(calls) == 2
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    cache = Cache(MemoryBackend(), ttls={'short': 10}, stale=5)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    cache.set('short', 'key', ['value'])
+    cache.set('other', 'key', ['value'], ttl=100)
+
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert cache.get('short', 'key') is None
+    assert cache.lookup('short', 'key') == (['value'], False)
+    assert cache.get('other', 'key') == ['value']
+    monkeypatch.setattr(time, 'time', lambda: now + 16)
+    assert cache.lookup('short', 'key') == (_MISSING, False)
+    assert cache.get_stats()['namespaces']['short']['expired'] == 3
+
+
+@pytest.mark.parametrize('backend', ['memory', 'disk'])
+def test_the_least_recently_used_entries_are_evicted(backend, tmp_path):
+    if backend == 'memory':
+        backend = MemoryBackend(max_entries=3, max_bytes=10 ** 6)
+    else:
+        backend = DiskBackend(str(tmp_path / 'cache.sqlite'), max_entries=3, max_bytes=10 ** 6)
+    cache = Cache(backend)
+    for key in 'abc':
+        cache.set('test', key, key)
+        time.sleep(0.01)
+    assert cache.get('test', 'a') == 'a'
+    time.sleep(0.01)
+    cache.set('test', 'd', 'd')
+    assert [cache.get('test', key) for key in 'abcd'] == ['a', None, 'c', 'd']
+    assert cache.get_stats()['namespaces']['test']['evictions'] == 1
+
+
+def test_entries_are_evicted_to_fit_the_size_bound():
+    entry = len(pickle.dumps('x' * 100, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = Cache(MemoryBackend(max_entries=100, max_bytes=entry * 2))
+    for key in 'abc':
+        cache.set('test', key, key * 100)
+    assert [cache.get('test', key) for key in 'abc'] == [None, 'b' * 100, 'c' * 100]
+    assert cache.backend.usage() == {'entries': 2, 'bytes': entry * 2}
@@ -0,0 +1,30 @@
+def test_etag_round_trip(client, upstream):
+    response = client.get('/questions/1002')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    again = client.get('/questions/1002', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+    assert client.get('/questions/1002', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_etag_round_trip_async(client, async_get):
+    status, headers, _ = async_get('/questions/1002')
+    assert status == 200
+    etag = headers['ETag']
+    # both apps tag the same body with the same ETag
+    assert client.get('/questions/1002').headers['ETag'] == etag
+
+    status, headers, body = async_get('/questions/1002', headers={'If-None-Match': etag})
+    assert status == 304
+    assert body == b''
+    assert headers['ETag'] == etag
+
+
+def test_answers_etag_round_trip(client, async_get):
+    etag = client.get('/questions/1002/answers').headers['ETag']
+    assert client.get('/questions/1002/answers', headers={'If-None-Match': etag}).status_code == 304
+    assert async_get('/questions/1002/answers', headers={'If-None-Match': etag})[0] == 304
@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from benchmarks.upstream import FakeUpstream, redirect, redirect_async
+
+
+@pytest.fixture
+def missing_pages(upstream, monkeypatch):
+    """Every upstream page answers 404 for the duration of the test."""
+    import async_scraper
+
+    with FakeUpstream(error_rate=1.0, error_status=404) as failing:
+        monkeypatch.setattr(async_scraper, 'get_client', async_scraper.get_client)
+        redirect(failing.url)
+        redirect_async(failing.url)
+        try:
+            yield failing
+        finally:
+            redirect(upstream.url)
+
+
+def test_a_missing_timeline_is_an_error(missing_pages):
+    import stackoverflow_scraper
+
+    with pytest.raises(requests.HTTPError):
+        stackoverflow_scraper.fetch_timeline_dates(1002)
+
+
+def test_a_missing_timeline_is_an_error_async(missing_pages):
+    import async_scraper
+
+    async def fetch():
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await async_scraper.fetch_timeline_dates(1002)
+        finally:
+            await async_scraper.close_client()
+
+    asyncio.run(fetch())
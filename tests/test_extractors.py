@@ -0,0 +1,42 @@
+from bs4 import BeautifulSoup
+
+from benchmarks import fixtures
+from extractors import (Record, each, extract_answers, extract_collective_tags, extract_collectives,
+                        extract_external_links, extract_question_summaries, text)
+
+
+def in_page_order(html, selector, read):
+    """What a CSS query over the full tree finds, in document order."""
+    return [read(element) for element in BeautifulSoup(html, 'html.parser').select(selector)]
+
+
+def test_alternatives_match_in_document_order():
+    soup = BeautifulSoup('<p><i>1</i><b>2</b><span><i>3</i></span><b>4</b></p>', 'html.parser')
+    assert Record('test', items=each('b, i', text)).extract(soup)['items'] == ['1', '2', '3', '4']
+
+
+def test_listing_summaries_in_page_order():
+    html = fixtures.listing([7, 3, 11, 2, 5])
+    summaries = extract_question_summaries(html, [])
+    assert [summary['question'].question_id for summary in summaries] == [7, 3, 11, 2, 5]
+    assert [str(summary['question'].question_id) for summary in summaries] == in_page_order(
+        html, 'div.s-post-summary', lambda element: element['data-post-id'])
+
+
+def test_answers_in_page_order():
+    html = fixtures.question_page(1002, answers=5)
+    assert [str(answer.answer_id) for answer, _ in extract_answers(html)] == in_page_order(
+        html, 'div.answer', lambda element: element['data-answerid'])
+
+
+def test_collectives_in_page_order():
+    html = fixtures.collectives_page(['google-cloud', 'aws', 'r-language', 'go'])
+    assert [collective.slug for collective in extract_collectives(html)] == ['google-cloud', 'aws', 'r-language', 'go']
+
+
+def test_collective_tags_and_links_in_page_order():
+    html = fixtures.collective_page('go', page=2)
+    assert extract_collective_tags(html) == in_page_order(html, 'a.post-tag', lambda element: element.text)
+    links = extract_external_links(html, 'https://stackoverflow.com/collectives/go')
+    assert [link.link for link in links] == in_page_order(html, 'option[data-url]',
+                                                          lambda element: element['data-url'])
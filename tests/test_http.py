@@ -0,0 +1,19 @@
+import http_client
+
+
+def test_upstream_traffic_is_counted(client, upstream):
+    http_client.reset_stats()
+    assert client.get('/questions?pagesize=3').status_code == 200
+    stats = http_client.get_stats()
+    assert stats['requests'] == sum(upstream.counts().values())
+    assert stats['connections_opened'] >= 1
+
+
+def test_upstream_traffic_is_counted_async(async_get, upstream):
+    http_client.reset_stats()
+    status, _, _ = async_get('/questions?pagesize=3')
+    assert status == 200
+    stats = http_client.get_stats()
+    assert stats['requests'] == sum(upstream.counts().values())
+    assert 1 <= stats['connections_opened'] <= stats['requests']
+    assert stats['connections_reused'] == stats['requests'] - stats['connections_opened']
@@ -0,0 +1,70 @@
+import re
+
+import metrics
+from metrics import CONTENT_TYPE, Counter, Histogram
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*(?:\{[^}]*\})?) (\S+)$')
+QUESTION_FETCHES = 'scraper_stage_seconds_count{stage="fetch",route="/questions/<int:question_id>"}'
+QUESTION_RESPONSES = 'scraper_upstream_requests_total{url_class="question",status="200"}'
+
+
+def samples(text):
+    """The exposition's samples by name and labels; every line must be a comment or a sample."""
+    values = {}
+    for line in text.splitlines():
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        values[match[1]] = float(match[2])
+    return values
+
+
+def test_counter_and_histogram_lines(monkeypatch):
+    monkeypatch.setattr(metrics, '_metrics', [])
+    counter = Counter('test_total', "A counter", ('kind',))
+    counter.inc('a "quoted"\nvalue')
+    counter.inc('b', amount=2.5)
+    histogram = Histogram('test_seconds', "A histogram", ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'fetch')
+    histogram.observe(0.5, 'fetch')
+    histogram.observe(20, 'fetch')
+
+    assert metrics.render().splitlines()[:11] == [
+        '# HELP test_total A counter',
+        '# TYPE test_total counter',
+        'test_total{kind="a \\"quoted\\"\\nvalue"} 1',
+        'test_total{kind="b"} 2.5',
+        '# HELP test_seconds A histogram',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{stage="fetch",le="0.1"} 1',
+        'test_seconds_bucket{stage="fetch",le="1"} 2',
+        'test_seconds_bucket{stage="fetch",le="+Inf"} 3',
+        'test_seconds_sum{stage="fetch"} 20.55',
+        'test_seconds_count{stage="fetch"} 3',
+    ]
+
+
+def test_metrics_route(client):
+    before = samples(client.get('/metrics').get_data(as_text=True))
+    assert client.get('/questions/1002').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == CONTENT_TYPE
+    after = samples(response.get_data(as_text=True))
+    assert after[QUESTION_FETCHES] == before.get(QUESTION_FETCHES, 0) + 1
+    assert after[QUESTION_RESPONSES] == before.get(QUESTION_RESPONSES, 0) + 1
+    assert after['scraper_cache_misses_total{namespace="question"}'] >= 1
+
+
+def test_metrics_route_async(async_get):
+    before = samples(async_get('/metrics')[2].decode())
+    assert async_get('/questions/1002')[0] == 200
+
+    status, headers, body = async_get('/metrics')
+    assert status == 200
+    assert headers['Content-Type'] == CONTENT_TYPE
+    after = samples(body.decode())
+    assert after[QUESTION_FETCHES] == before.get(QUESTION_FETCHES, 0) + 1
+    assert after[QUESTION_RESPONSES] == before.get(QUESTION_RESPONSES, 0) + 1
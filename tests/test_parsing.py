@@ -0,0 +1,46 @@
+import asyncio
+import os
+
+import pytest
+
+import parsing
+from parsing import in_parse_worker, run_parser, run_parser_async
+
+
+def die_in_worker(value):
+    """``value``, unless run in a parse worker, which it kills (as the OOM killer would)."""
+    if in_parse_worker():
+        os._exit(1)
+    return value
+
+
+def worker_name(value):
+    return value, in_parse_worker()
+
+
+@pytest.fixture
+def parse_pool(monkeypatch):
+    """A one-process parse pool, shut down afterwards."""
+    monkeypatch.setattr(parsing, 'PARSE_WORKERS', 1)
+    yield
+    if parsing._pool is not None:
+        parsing._pool.shutdown()
+        parsing._pool = None
+
+
+def test_parsing_runs_inline_after_the_pool_breaks(parse_pool):
+    assert run_parser(worker_name, 'page') == ('page', True)
+    broken = parsing._pool
+
+    assert run_parser(die_in_worker, 'page') == 'page'
+    assert parsing._pool is None
+    # the next call starts a new pool
+    assert run_parser(worker_name, 'page') == ('page', True)
+    assert parsing._pool is not broken
+
+
+def test_parsing_runs_on_a_thread_after_the_pool_breaks_async(parse_pool):
+    async def main():
+        return await run_parser_async(die_in_worker, 'page'), parsing._pool
+
+    assert asyncio.run(main()) == ('page', None)
@@ -0,0 +1,84 @@
+import time
+
+import http_client
+import prefetch
+from prefetch import Prefetcher, Target
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_one_process_leads_and_another_takes_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(prefetch, 'LOCK_RETRY', 0.05)
+    lock_path = str(tmp_path / 'prefetch.lock')
+    runs = {'first': 0, 'second': 0}
+
+    def target(name):
+        def refresh():
+            runs[name] += 1
+            return True
+        return Target(name, 'questions', refresh, interval=0.05)
+
+    first = Prefetcher([target('first')], gap=0.01, lock_path=lock_path)
+    second = Prefetcher([target('second')], gap=0.01, lock_path=lock_path)
+    first.start()
+    second.start()
+    try:
+        assert first.leader and not second.leader
+        assert first.warmed.wait(5)
+        time.sleep(0.2)
+        assert runs['second'] == 0 and not second.warmed.is_set()
+
+        # the leader's process going away releases its lock
+        first.stop()
+        first._lock_file.close()
+        assert second.warmed.wait(5)
+        assert second.leader
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_the_pause_backs_off_on_failures_and_recovers():
+    failing = True
+
+    def refresh():
+        if failing:
+            raise RuntimeError("upstream down")
+        return True
+
+    target = Target('flaky', 'questions', refresh, interval=0.01)
+    prefetcher = Prefetcher([target], gap=0.01, max_gap=0.04, lock_path='')
+    prefetcher.start()
+    try:
+        wait_until(lambda: target.failures >= 4)
+        assert prefetcher.gap == 0.04
+        assert target.last_error == "upstream down"
+
+        failing = False
+        wait_until(lambda: prefetcher.gap == 0.01)
+        assert target.last_error is None and target.last_success is not None
+    finally:
+        prefetcher.stop()
+
+
+def test_throttled_responses_back_off():
+    def refresh():
+        # as if stackoverflow.com had answered one of the run's requests with a 429
+        http_client.count_response('https://stackoverflow.com/questions', 429, {})
+        return True
+
+    target = Target('throttled', 'questions', refresh, interval=0.01)
+    prefetcher = Prefetcher([target], gap=0.01, max_gap=0.04, lock_path='')
+    prefetcher.start()
+    try:
+        wait_until(lambda: target.runs >= 3)
+        assert prefetcher.throttled >= 2
+        assert prefetcher.gap == 0.04
+        assert target.failures == 0
+    finally:
+        prefetcher.stop()
@@ -0,0 +1,64 @@
+import time
+from email.utils import formatdate
+
+import rate_limit
+from rate_limit import AdaptiveBucket, RateController, TokenBucket, parse_retry_after
+
+USER = 'https://stackoverflow.com/users/1/alice'
+QUESTION = 'https://stackoverflow.com/questions/1'
+
+
+def test_throttling_halves_the_rate_down_to_the_minimum(monkeypatch):
+    bucket = AdaptiveBucket(rate=8, burst=1, min_rate=1.5, step=0.5)
+    bucket.on_throttle(None)
+    assert bucket.rate == 4
+    # responses to requests already in flight count once
+    bucket.on_throttle(None)
+    assert bucket.rate == 4
+
+    monkeypatch.setattr(rate_limit, 'DECREASE_INTERVAL', 0)
+    bucket.on_throttle(None)
+    bucket.on_throttle(None)
+    assert bucket.rate == 1.5
+    assert bucket.get_stats()['throttled'] == 4
+
+
+def test_successes_raise_the_rate_back_step_by_step():
+    bucket = AdaptiveBucket(rate=8, burst=1, min_rate=1, step=0.5)
+    bucket.on_throttle(None)
+    bucket.on_success()
+    bucket.on_success()
+    assert bucket.rate == 5
+    for _ in range(10):
+        bucket.on_success()
+    assert bucket.rate == 8
+
+
+def test_retry_after_pauses_the_url_class():
+    controller = RateController(TokenBucket(100, 100), min_rate=1, step=1)
+    controller.record(USER, 429, '0.3')
+    assert controller.bucket(USER).get_stats()['retry_after_pauses'] == 1
+
+    # other classes are not paused
+    assert controller.acquire(QUESTION, timeout=0)
+    assert not controller.acquire(USER, timeout=0.1)
+    start = time.monotonic()
+    assert controller.acquire(USER)
+    assert 0.15 < time.monotonic() - start < 1
+
+
+def test_a_class_token_goes_back_when_the_global_bucket_has_none():
+    limiter = TokenBucket(1, 1)
+    controller = RateController(limiter, min_rate=1, step=1)
+    assert limiter.acquire(timeout=0)
+    assert not controller.acquire(USER, timeout=0)
+    # the user class still has its one token
+    assert controller.bucket(USER).acquire(timeout=0)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2
+    assert parse_retry_after('-1') == 0
+    assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,43 @@
+import logging
+import os
+
+import pytest
+
+from serve import share_environment
+
+SHARED = ('SCRAPER_WORKERS', 'SCRAPER_PREFETCH_LOCK', 'SCRAPER_CACHE_BACKEND')
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    """None of the shared variables set; whatever the test sets is undone afterwards."""
+    for name in SHARED:
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def shared():
+    return {name: os.environ.get(name) for name in SHARED}
+
+
+def test_several_workers_share_the_disk_cache_and_one_prefetcher(environment):
+    share_environment(4)
+    assert shared() == {'SCRAPER_WORKERS': '4', 'SCRAPER_PREFETCH_LOCK': 'scraper_prefetch.lock',
+                        'SCRAPER_CACHE_BACKEND': 'disk'}
+
+
+def test_one_worker_keeps_the_default_cache(environment):
+    share_environment(1)
+    assert shared() == {'SCRAPER_WORKERS': '1', 'SCRAPER_PREFETCH_LOCK': 'scraper_prefetch.lock',
+                        'SCRAPER_CACHE_BACKEND': None}
+
+
+def test_explicit_settings_are_kept(environment, caplog):
+    environment.setenv('SCRAPER_WORKERS', '8')
+    environment.setenv('SCRAPER_PREFETCH_LOCK', '/tmp/other.lock')
+    environment.setenv('SCRAPER_CACHE_BACKEND', 'memory')
+    with caplog.at_level(logging.WARNING):
+        share_environment(2)
+    assert shared() == {'SCRAPER_WORKERS': '2', 'SCRAPER_PREFETCH_LOCK': '/tmp/other.lock',
+                        'SCRAPER_CACHE_BACKEND': 'memory'}
+    assert "the 2 workers will not share cached results" in caplog.text
@@ -0,0 +1,98 @@
+import json
+
+from store import PostStore, filter_questions
+
+
+def listed(question_id, activity, score, tags=('python',)):
+    return {'question_id': question_id, 'tags': list(tags), 'score': score,
+            'creation_date': activity - 100, 'last_activity': activity}
+
+
+def test_query_on_an_empty_store_is_not_covered():
+    store = PostStore(':memory:')
+    assert store.query_questions(sort='votes') is None
+
+
+def test_query_answers_the_stored_listing_page():
+    store = PostStore(':memory:')
+    questions = [listed(question_id, 2000 - question_id, question_id % 3) for question_id in range(1, 11)]
+    store.put_questions((question, None) for question in questions)
+    store.put_listing(['python'], 2, 5, questions[5:])
+
+    top = store.query_questions(['Python'], sort='votes', page=2, pagesize=5)
+    assert [question['question_id'] for question in top] == [8, 10, 7, 9, 6]
+    assert top == filter_questions(questions[5:], sort='votes')
+    assert store.query_questions(['python'], sort='votes', min=2, page=2, pagesize=5) == \
+        filter_questions(questions[5:], sort='votes', min=2)
+    # other pages, page sizes and tag sets are not stored
+    assert store.query_questions(['python'], sort='votes', page=1, pagesize=5) is None
+    assert store.query_questions(['python'], sort='votes', page=2, pagesize=10) is None
+    assert store.query_questions(['flask'], sort='votes', page=2, pagesize=5) is None
+
+
+def test_stored_listing_pages_expire():
+    store = PostStore(':memory:', max_age=60)
+    questions = [listed(1, 1000, 1)]
+    store.put_questions((question, None) for question in questions)
+    store.put_listing([], 1, 30, questions)
+    assert len(store.query_questions(sort='votes')) == 1
+    store._conn.execute("UPDATE listings SET stored_at = stored_at - 61")
+    assert store.query_questions(sort='votes') is None
+
+
+def test_only_an_empty_listing_page_is_empty():
+    store = PostStore(':memory:')
+    questions = [listed(question_id, 1000, 1) for question_id in range(1, 4)]
+    store.put_questions((question, None) for question in questions)
+    # a short page (upstream caps pagesize, or the tag filter dropped some)
+    # says nothing about the pages after it
+    store.put_listing([], 1, 60, questions)
+    assert len(store.query_questions(sort='votes', pagesize=60)) == 3
+    assert store.query_questions(sort='votes', page=2, pagesize=60) is None
+    store.put_listing([], 3, 60, [])
+    assert store.query_questions(sort='votes', page=3, pagesize=60) == []
+
+
+def test_filter_questions_orders_like_the_store():
+    questions = [listed(1, 1000, 5), listed(2, 1100, None), listed(3, 1200, 7)]
+    assert [q['question_id'] for q in filter_questions(questions, sort='votes')] == [3, 1, 2]
+    assert [q['question_id'] for q in filter_questions(questions, sort='votes', order='asc')] == [2, 1, 3]
+    assert [q['question_id'] for q in filter_questions(questions, sort='votes', min=6)] == [3]
+    assert [q['question_id'] for q in filter_questions(questions, fromdate=950, todate=1050)] == [2]
+
+
+def test_cold_store_query_scrapes_the_listing(client, upstream):
+    response = client.get('/questions?sort=votes&pagesize=5')
+    assert response.status_code == 200
+    assert len(response.json) == 5
+    assert upstream.counts()['listing'] == 1
+
+    # the scraped page is now stored, so the same query is answered without scraping
+    upstream.reset()
+    response = client.get('/questions?sort=votes&pagesize=5')
+    assert response.status_code == 200
+    assert len(response.json) == 5
+    assert 'listing' not in upstream.counts()
+
+
+def test_cold_store_query_scrapes_the_listing_async(async_get, upstream):
+    status, _, body = async_get('/questions?sort=creation&order=asc&pagesize=4')
+    assert status == 200
+    assert len(json.loads(body)) == 4
+    assert upstream.counts()['listing'] == 1
+
+
+def test_stored_and_scraped_queries_agree(client, async_get, upstream):
+    path = '/questions?sort=votes&order=asc&pagesize=6&page=2&fromdate=1'
+    scraped = client.get(path).json
+    assert upstream.counts()['listing'] == 1
+    upstream.reset()
+    assert client.get(path).json == scraped
+    assert json.loads(async_get(path)[2]) == scraped
+    assert 'listing' not in upstream.counts()
+
+
+def test_bad_page_and_pagesize_are_bad_requests(client, async_get):
+    for path in ('/questions?page=x&sort=votes', '/questions?pagesize=0', '/questions?page=-1'):
+        assert client.get(path).status_code == 400
+        assert async_get(path)[0] == 400
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import budget
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    # one upstream request: the listing page, and none left for the details
+    monkeypatch.setattr(budget, 'REQUEST_BUDGET', 1)
+
+
+def lines(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_complete_stream_has_no_partial_line(client, async_get):
+    body = client.get('/questions?stream=1&pagesize=3').data
+    assert len(lines(body)) == 3
+    assert lines(async_get('/questions?stream=1&pagesize=3')[2]) == lines(body)
+
+
+def test_partial_stream_ends_with_a_partial_line(client, small_budget):
+    response = client.get('/questions?stream=1&pagesize=3')
+    assert response.status_code == 200
+    items = lines(response.data)
+    assert len(items) == 4
+    assert items[-1] == {'partial': True}
+
+
+def test_partial_stream_ends_with_a_partial_line_async(async_get, small_budget):
+    status, _, body = async_get('/questions?stream=1&pagesize=3')
+    assert status == 200
+    items = lines(body)
+    assert len(items) == 4
+    assert items[-1] == {'partial': True}
+
+
+def test_partial_json_response_has_the_header(client, small_budget):
+    response = client.get('/questions?pagesize=3')
+    assert response.headers['X-Partial-Results'] == 'true'
+    assert len(response.json) == 3
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from budget import RequestBudget, current_budget
+from cache import Cache, MemoryBackend
+from users import AsyncUserResolver, UserResolver
+
+LINKS = ['/users/1/alice', '/users/1/alice-renamed', '/users/2/bob', '/users/2/bob', '/users/3/carol']
+
+
+def test_one_lookup_per_user():
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(link):
+        with lock:
+            calls.append(link)
+        time.sleep(0.1)
+        user_id = link.split('/')[2]
+        return f"account-{user_id}", user_id
+
+    with ThreadPoolExecutor(4) as executor:
+        resolver = UserResolver(fetch, executor, Cache(MemoryBackend()))
+        results = resolver.resolve_many(LINKS)
+        assert results == {link: (f"account-{link.split('/')[2]}", link.split('/')[2]) for link in LINKS}
+        assert sorted(link.split('/')[2] for link in calls) == ['1', '2', '3']
+
+        assert resolver.resolve('/users/3/carol-again') == ('account-3', '3')
+        assert len(calls) == 3
+
+
+def test_one_lookup_per_user_async():
+    calls = []
+
+    async def fetch(link):
+        calls.append(link)
+        await asyncio.sleep(0.1)
+        user_id = link.split('/')[2]
+        return f"account-{user_id}", user_id
+
+    async def main():
+        resolver = AsyncUserResolver(fetch, Cache(MemoryBackend()))
+        results = await resolver.resolve_many(LINKS)
+        again = await resolver.resolve('/users/3/carol-again')
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert results == {link: (f"account-{link.split('/')[2]}", link.split('/')[2]) for link in LINKS}
+    assert again == ('account-3', '3')
+    assert sorted(link.split('/')[2] for link in calls) == ['1', '2', '3']
+
+
+def test_a_failed_lookup_is_not_cached():
+    calls = []
+
+    def fetch(link):
+        calls.append(link)
+        return None, None
+
+    with ThreadPoolExecutor(2) as executor:
+        resolver = UserResolver(fetch, executor, Cache(MemoryBackend()))
+        assert resolver.resolve('/users/1/alice') == (None, None)
+        assert resolver.resolve('/users/1/alice') == (None, None)
+    assert len(calls) == 2
+
+
+def test_lookups_past_the_deadline_resolve_to_none():
+    def fetch(link):
+        time.sleep(0.5 if link.endswith('slow') else 0)
+        return 'account', link.split('/')[2]
+
+    token = current_budget.set(RequestBudget(deadline=0.2))
+    try:
+        with ThreadPoolExecutor(2) as executor:
+            resolver = UserResolver(fetch, executor, Cache(MemoryBackend()))
+            results = resolver.resolve_many(['/users/1/fast', '/users/2/slow'])
+    finally:
+        current_budget.reset(token)
+    assert results == {'/users/1/fast': ('account', '1'), '/users/2/slow': None}
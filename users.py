@@ -0,0 +1,122 @@
+"""Resolution of user profile links to (account_id, user_id).
+
+The account id is only available by scraping the user's profile page, and the
+same user often owns several posts on one page. The resolvers here memoize
+results in the ``user`` cache namespace (long TTL) and share one in-flight
+lookup between every caller asking for the same user at the same time.
+"""
+import asyncio
+import re
+import threading
+from concurrent.futures import Executor, Future
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from budget import DeadlineExceeded, wait_for, wait_result
+from cache import Cache, default_cache
+
+UserIds = Tuple[Optional[str], Optional[str]]
+
+_USER_ID_RE = re.compile(r'/users/(\d+)')
+
+
+def user_key(user_link: str) -> str:
+    """Cache key for a profile link: the numeric user id when there is one."""
+    match = _USER_ID_RE.search(user_link)
+    return match.group(1) if match else user_link
+
+
+class UserResolver:
+    """Thread-pool based resolver used by the Flask app."""
+
+    def __init__(self, fetch: Callable[[str], UserIds], executor: Executor, cache: Cache = default_cache):
+        self.fetch = fetch
+        self.executor = executor
+        self.cache = cache
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_link: str) -> Future:
+        """Return a future for the user's ids, reusing a cached or in-flight lookup."""
+        key = user_key(user_link)
+        ids = self.cache.get('user', key)
+        if ids is not None:
+            future = Future()
+            future.set_result(ids)
+            return future
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self.executor.submit(self._lookup, key, user_link)
+                self._in_flight[key] = future
+            return future
+
+    def _lookup(self, key: str, user_link: str) -> UserIds:
+        try:
+            ids = self.fetch(user_link)
+            if ids and ids[0]:
+                self.cache.set('user', key, ids)
+            return ids
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def resolve(self, user_link: str) -> UserIds:
+        return self.submit(user_link).result()
+
+    def resolve_many(self, user_links: Iterable[str]) -> Dict[str, Optional[UserIds]]:
+        """Resolve a batch of profile links concurrently, one lookup per distinct user.
+
+        Lookups still running at the API request's deadline resolve to None.
+        """
+        futures = {link: self.submit(link) for link in set(user_links)}
+        results = {}
+        for link, future in futures.items():
+            try:
+                results[link] = wait_result(future)
+            except DeadlineExceeded:
+                results[link] = None
+        return results
+
+
+class AsyncUserResolver:
+    """asyncio counterpart of ``UserResolver`` used by the ASGI app."""
+
+    def __init__(self, fetch: Callable[[str], Awaitable[UserIds]], cache: Cache = default_cache):
+        self.fetch = fetch
+        self.cache = cache
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def resolve(self, user_link: str) -> UserIds:
+        key = user_key(user_link)
+        # the disk backend reads files: off the event loop
+        ids = await self.cache.offload(self.cache.get, 'user', key)
+        if ids is not None:
+            return ids
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(key, user_link))
+            self._in_flight[key] = task
+        # shield so one cancelled caller doesn't cancel the lookup others wait on
+        return await asyncio.shield(task)
+
+    async def _lookup(self, key: str, user_link: str) -> UserIds:
+        try:
+            ids = await self.fetch(user_link)
+            if ids and ids[0]:
+                await self.cache.offload(self.cache.set, 'user', key, ids)
+            return ids
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def resolve_many(self, user_links: Iterable[str]) -> Dict[str, Optional[UserIds]]:
+        links = list(set(user_links))
+        results = await asyncio.gather(*(self._resolve_by_deadline(link) for link in links))
+        return dict(zip(links, results))
+
+    async def _resolve_by_deadline(self, user_link: str) -> Optional[UserIds]:
+        try:
+            return await wait_for(self.resolve(user_link))
+        except DeadlineExceeded:
+            return None